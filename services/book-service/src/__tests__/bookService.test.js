@@ -133,6 +133,47 @@ describe('BookService', () => {
     });
   });
 
+  // Test GetBooksByIds
+  describe('GetBooksByIds', () => {
+    it('should return the found books for deduplicated ids', async () => {
+      const mockRows = [
+        { id: 1, title: 'Book 1', author: 'Author 1', isbn: '123', user_id: 100 },
+        { id: 3, title: 'Book 3', author: 'Author 3', isbn: '789', user_id: 300 },
+      ];
+      db.query.mockResolvedValue([mockRows]);
+
+      await bookService.GetBooksByIds({ request: { ids: [1, 2, 3, 1] } }, mockCallback);
+
+      expect(db.query).toHaveBeenCalledWith('SELECT * FROM books WHERE id IN (?)', [[1, 2, 3]]);
+      expect(logger.info).toHaveBeenCalledWith('Retrieved 2 of 3 books by id');
+      expect(mockCallback).toHaveBeenCalledWith(null, {
+        books: [
+          { id: 1, title: 'Book 1', author: 'Author 1', isbn: '123', userId: 100 },
+          { id: 3, title: 'Book 3', author: 'Author 3', isbn: '789', userId: 300 },
+        ],
+      });
+    });
+
+    it('should return an empty list without querying for no ids', async () => {
+      await bookService.GetBooksByIds({ request: { ids: [] } }, mockCallback);
+
+      expect(db.query).not.toHaveBeenCalled();
+      expect(mockCallback).toHaveBeenCalledWith(null, { books: [] });
+    });
+
+    it('should handle database errors', async () => {
+      db.query.mockRejectedValue(new Error('DB error'));
+
+      await bookService.GetBooksByIds({ request: { ids: [1] } }, mockCallback);
+
+      expect(logger.error).toHaveBeenCalledWith('GetBooksByIds error', { error: 'DB error' });
+      expect(mockCallback).toHaveBeenCalledWith({
+        code: grpc.status.INTERNAL,
+        message: 'Server error',
+      });
+    });
+  });
+
   // Test CreateBook
   describe('CreateBook', () => {
     it('should create a book successfully', async () => {
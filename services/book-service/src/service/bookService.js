@@ -68,6 +68,31 @@ const bookService = {
         }
     },
 
+    GetBooksByIds: async (call, callback) => {
+        const ids = [...new Set(call.request.ids)];
+        logger.info('GetBooksByIds request received', { count: ids.length });
+        if (ids.length === 0) {
+            return callback(null, { books: [] });
+        }
+        try {
+            // Ids with no book are simply absent from the result
+            const [rows] = await db.query('SELECT * FROM books WHERE id IN (?)', [ids]);
+            const books = rows.map(row => ({
+                ...row,
+                userId: Number(row.user_id),
+                user_id: undefined
+            }));
+            logger.info(`Retrieved ${books.length} of ${ids.length} books by id`);
+            callback(null, { books });
+        } catch (error) {
+            logger.error('GetBooksByIds error', { error: error.message });
+            callback({
+                code: grpc.status.INTERNAL,
+                message: 'Server error'
+            });
+        }
+    },
+
     CreateBook: async (call, callback) => {
         const { title, author, isbn, userId } = call.request;
         logger.info('CreateBook request received', { title, userId });
@@ -1,6 +1,11 @@
+import asyncio
+import json
 import logging
 import os
-from fastapi import FastAPI, HTTPException, Request
+import time
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel
 import grpc
 import httpx
@@ -12,8 +17,7 @@ import jwt
 from typing import Optional
 import uvicorn
 from google.protobuf.json_format import MessageToDict
-
-app = FastAPI(title="Mobile API Gateway")
+from cache import BookCache, TokenCache
 
 # Configure logging
 logging.basicConfig(
@@ -33,9 +37,153 @@ BOOK_SERVICE_URL = os.getenv("BOOK_SERVICE_URL", "book-service-ita:50051")
 JWT_SECRET_ENCODED = os.getenv("JWT_SECRET", "GD01pc7/7BmRWmWtY71dIUjR1G+we3N5d9EKYWmzuFI6o6eRCsetl/9KruFclnFwmb7B9I62hhDfjUAl3IUDUw==")
 JWT_SECRET = b64decode(JWT_SECRET_ENCODED)
 
-# gRPC client for book-service
-book_channel = grpc.insecure_channel(BOOK_SERVICE_URL)
-book_client = book_pb2_grpc.BookServiceStub(book_channel)
+# Upstream HTTP clients: one pooled client per service for the life of the app
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))  # Per upstream
+UPSTREAM_MAX_KEEPALIVE = int(os.getenv("UPSTREAM_MAX_KEEPALIVE", "20"))  # Idle connections kept open
+UPSTREAM_KEEPALIVE_EXPIRY = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", "30"))  # Seconds
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "2"))  # Seconds
+USER_SERVICE_TIMEOUT = float(os.getenv("USER_SERVICE_TIMEOUT", "10"))  # Seconds; password hashing is slow
+TRANSACTION_SERVICE_TIMEOUT = float(os.getenv("TRANSACTION_SERVICE_TIMEOUT", "5"))  # Seconds
+
+# Async gRPC channel to book-service, shared for the life of the app
+BOOK_SERVICE_TIMEOUT = float(os.getenv("BOOK_SERVICE_TIMEOUT", "5"))  # Seconds; deadline of every call
+BOOK_CHANNEL_OPTIONS = [
+    # Ping idle connections so a silently dropped one is noticed before the next call
+    ("grpc.keepalive_time_ms", int(os.getenv("BOOK_SERVICE_KEEPALIVE_MS", "30000"))),
+    ("grpc.keepalive_timeout_ms", int(os.getenv("BOOK_SERVICE_KEEPALIVE_TIMEOUT_MS", "10000"))),
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.max_pings_without_data", 0),
+]
+
+# Cache of GET /api/mobile/books and /api/mobile/books/{id} responses
+BOOK_CACHE_ENABLED = os.getenv("BOOK_CACHE_ENABLED", "true").lower() == "true"
+BOOK_CACHE_TTL = float(os.getenv("BOOK_CACHE_TTL", "30"))  # Seconds an entry is fresh
+BOOK_CACHE_STALE_TTL = float(os.getenv("BOOK_CACHE_STALE_TTL", "60"))  # Seconds it is then served while refreshing
+BOOK_CACHE_MAX_ENTRIES = int(os.getenv("BOOK_CACHE_MAX_ENTRIES", "10000"))
+BOOK_CACHE_MAX_BYTES = int(os.getenv("BOOK_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CATALOG_KEY = "books"
+
+# GET /api/mobile/books?ids=...
+BOOK_BATCH_MAX_IDS = int(os.getenv("BOOK_BATCH_MAX_IDS", "100"))
+BOOK_BATCH_CONCURRENCY = int(os.getenv("BOOK_BATCH_CONCURRENCY", "10"))  # GetBook calls in flight when GetBooksByIds is missing
+BOOK_BATCH_RETRY = float(os.getenv("BOOK_BATCH_RETRY", "60"))  # Seconds before GetBooksByIds is tried again after UNIMPLEMENTED
+
+# Cache of verified JWT claims, so a token's signature is checked once rather than on every request
+JWT_CACHE_ENABLED = os.getenv("JWT_CACHE_ENABLED", "true").lower() == "true"
+JWT_CACHE_MAX_ENTRIES = int(os.getenv("JWT_CACHE_MAX_ENTRIES", "10000"))
+JWT_CACHE_MAX_TTL = float(os.getenv("JWT_CACHE_MAX_TTL", "300"))  # Seconds, even if the token's exp is later
+
+def create_upstream_client(base_url: str, timeout: float) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        base_url=base_url,
+        timeout=httpx.Timeout(timeout, connect=UPSTREAM_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=UPSTREAM_MAX_CONNECTIONS,
+            max_keepalive_connections=UPSTREAM_MAX_KEEPALIVE,
+            keepalive_expiry=UPSTREAM_KEEPALIVE_EXPIRY
+        )
+    )
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.user_service = create_upstream_client(USER_SERVICE_URL, USER_SERVICE_TIMEOUT)
+    app.state.transaction_service = create_upstream_client(TRANSACTION_SERVICE_URL, TRANSACTION_SERVICE_TIMEOUT)
+    # grpc.aio channels are bound to the event loop, so this one is created here rather than at import
+    app.state.book_channel = grpc.aio.insecure_channel(BOOK_SERVICE_URL, options=BOOK_CHANNEL_OPTIONS)
+    app.state.book_service = book_pb2_grpc.BookServiceStub(app.state.book_channel)
+    app.state.book_cache = BookCache(
+        BOOK_CACHE_TTL, BOOK_CACHE_STALE_TTL, BOOK_CACHE_MAX_ENTRIES, BOOK_CACHE_MAX_BYTES
+    ) if BOOK_CACHE_ENABLED else None
+    app.state.book_batch_retry_at = 0.0  # GetBooksByIds is not tried again before this monotonic time
+    app.state.token_cache = TokenCache(JWT_CACHE_MAX_ENTRIES, JWT_CACHE_MAX_TTL) if JWT_CACHE_ENABLED else None
+    logger.info("Upstream clients created")
+    try:
+        yield
+    finally:
+        if app.state.book_cache:
+            await app.state.book_cache.close()
+        # Close pooled connections once in-flight requests have finished
+        await asyncio.gather(
+            app.state.user_service.aclose(),
+            app.state.transaction_service.aclose(),
+            app.state.book_channel.close()
+        )
+        logger.info("Upstream clients closed")
+
+app = FastAPI(title="Mobile API Gateway", lifespan=lifespan)
+
+# Dependencies handing routes the shared upstream clients
+def user_service(request: Request) -> httpx.AsyncClient:
+    return request.app.state.user_service
+
+def transaction_service(request: Request) -> httpx.AsyncClient:
+    return request.app.state.transaction_service
+
+def book_service(request: Request) -> book_pb2_grpc.BookServiceStub:
+    return request.app.state.book_service
+
+def book_cache(request: Request) -> Optional[BookCache]:
+    return request.app.state.book_cache
+
+def token_cache(request: Request) -> Optional[TokenCache]:
+    return request.app.state.token_cache
+
+def book_key(book_id: int) -> str:
+    return f"book:{book_id}"
+
+# Serialize like JSONResponse does, so cached and uncached bodies are identical
+def json_body(content) -> bytes:
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+# Serve a JSON body from the cache, loading it with load(request) on a miss.
+# Cached loads are shared between callers, so they are not cancelled when one
+# caller disconnects; uncached ones are.
+async def cached_json(cache: Optional[BookCache], key: str, request: Request, load) -> Response:
+    if cache:
+        body = await cache.get_or_load(key, lambda: load(None))
+    else:
+        body = await load(request)
+    return Response(content=body, media_type="application/json")
+
+# Drop cached reads a book write may have changed. Called even when the write
+# failed, since a timed-out write may still have been applied.
+def invalidate_books(cache: Optional[BookCache], book_id: Optional[int] = None):
+    if cache:
+        cache.invalidate(CATALOG_KEY, *([book_key(book_id)] if book_id is not None else []))
+
+# Call a book-service method with the BOOK_SERVICE_TIMEOUT deadline. If a request
+# is given and its HTTP client disconnects first, the RPC is cancelled so
+# book-service can stop too.
+async def book_rpc(request: Optional[Request], method, message):
+    call = method(message, timeout=BOOK_SERVICE_TIMEOUT)
+    watcher = asyncio.create_task(cancel_on_disconnect(request, call)) if request else None
+    try:
+        return await call
+    except asyncio.CancelledError:
+        # Only a disconnect is turned into a response; other cancellations propagate
+        if watcher is None or not watcher.done():
+            raise
+        logger.info(f"Client disconnected, cancelled {request.method} {request.url.path}")
+        raise HTTPException(status_code=499, detail="Client closed request")
+    except grpc.aio.AioRpcError as e:
+        if e.code() == grpc.StatusCode.DEADLINE_EXCEEDED:
+            logger.error(f"Book service deadline exceeded for {type(message).__name__}")
+            raise HTTPException(status_code=504, detail="Book service timed out")
+        if e.code() == grpc.StatusCode.UNAVAILABLE:
+            logger.error(f"Book service unavailable: {e.details()}")
+            raise HTTPException(status_code=503, detail="Book service unavailable")
+        raise
+    finally:
+        if watcher:
+            watcher.cancel()
+
+async def cancel_on_disconnect(request: Request, call):
+    # The request body has already been read, so the next message is the disconnect
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            call.cancel()
+            return
 
 # Pydantic models
 class LoginRequest(BaseModel):
@@ -52,15 +200,17 @@ class BookRequest(BaseModel):
     title: str
     author: str
     isbn: Optional[str] = None
-    userId: str
+    userId: int
 
 class TransactionRequest(BaseModel):
     userId: int
     bookId: int
     transactionType: str
 
-# Middleware for JWT validation
-async def authenticate_jwt(request: Request):
+# JWT validation, used as a route dependency; returns the token's claims.
+# Async so it runs on the event loop rather than in the threadpool. A token
+# already verified is answered from the token cache until it expires.
+async def authenticate_jwt(request: Request, cache: Optional[TokenCache] = Depends(token_cache)) -> dict:
     auth_header = request.headers.get("Authorization")
     if not auth_header:
         logger.warning("Missing Authorization header")
@@ -68,9 +218,15 @@ async def authenticate_jwt(request: Request):
 
     try:
         token = auth_header.split(" ")[1]
+        if cache:
+            claims = cache.get(token)
+            if claims is not None:
+                return claims
         logger.debug(f"Validating token: {token[:10]}...")
         decoded = jwt.decode(token, JWT_SECRET, algorithms=["HS512"])
         logger.info(f"Token validated successfully for user: {decoded.get('sub')}")
+        if cache:
+            cache.set(token, decoded)
         return decoded
     except jwt.ExpiredSignatureError:
         logger.warning("JWT token expired")
@@ -84,57 +240,68 @@ async def authenticate_jwt(request: Request):
 
 # User login
 @app.post("/api/mobile/users/login")
-async def login(request: LoginRequest):
+async def login(request: LoginRequest, client: httpx.AsyncClient = Depends(user_service)):
     logger.info(f"User login attempt: {request.username}")
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                f"{USER_SERVICE_URL}/users/login",
-                json={"username": request.username, "password": request.password}
-            )
-            response.raise_for_status()
-            logger.debug(f"User service response: {response.text}")
-            token = response.text
-            return {"token": token}
-        except httpx.HTTPStatusError as e:
-            logger.error(f"Login failed for {request.username}: status={e.response.status_code}, response={e.response.text}")
-            detail = e.response.text if e.response.text else "Unknown error from user service"
-            raise HTTPException(status_code=e.response.status_code, detail=detail)
-        except Exception as e:
-            logger.error(f"Server error during login for {request.username}: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Server error: {str(e)}")
+    try:
+        response = await client.post(
+            "/users/login",
+            json={"username": request.username, "password": request.password}
+        )
+        response.raise_for_status()
+        logger.debug(f"User service response: {response.text}")
+        token = response.text
+        return {"token": token}
+    except httpx.HTTPStatusError as e:
+        logger.error(f"Login failed for {request.username}: status={e.response.status_code}, response={e.response.text}")
+        detail = e.response.text if e.response.text else "Unknown error from user service"
+        raise HTTPException(status_code=e.response.status_code, detail=detail)
+    except httpx.TimeoutException:
+        logger.error(f"User service timed out during login for {request.username}")
+        raise HTTPException(status_code=504, detail="User service timed out")
+    except Exception as e:
+        logger.error(f"Server error during login for {request.username}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Server error: {str(e)}")
 
 # User registration
 @app.post("/api/mobile/users/register")
-async def register(request: RegisterRequest):
+async def register(request: RegisterRequest, client: httpx.AsyncClient = Depends(user_service)):
     logger.info(f"User registration attempt: {request.username}")
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                f"{USER_SERVICE_URL}/users/register",
-                json={"username": request.username, "email": request.email, "password": request.password},
-                params={"role": request.role} if request.role else {}
-            )
-            response.raise_for_status()
-            logger.debug(f"User service response: {response.text}")
-            return {"message": response.text}
-        except httpx.HTTPStatusError as e:
-            logger.error(f"Registration failed for {request.username}: status={e.response.status_code}, response={e.response.text}")
-            detail = e.response.text if e.response.text else "Unknown error from user service"
-            raise HTTPException(status_code=e.response.status_code, detail=detail)
-        except Exception as e:
-            logger.error(f"Server error during registration for {request.username}: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Server error: {str(e)}")
-
-# Get all books (unprotected)
+    try:
+        response = await client.post(
+            "/users/register",
+            json={"username": request.username, "email": request.email, "password": request.password},
+            params={"role": request.role} if request.role else {}
+        )
+        response.raise_for_status()
+        logger.debug(f"User service response: {response.text}")
+        return {"message": response.text}
+    except httpx.HTTPStatusError as e:
+        logger.error(f"Registration failed for {request.username}: status={e.response.status_code}, response={e.response.text}")
+        detail = e.response.text if e.response.text else "Unknown error from user service"
+        raise HTTPException(status_code=e.response.status_code, detail=detail)
+    except httpx.TimeoutException:
+        logger.error(f"User service timed out during registration for {request.username}")
+        raise HTTPException(status_code=504, detail="User service timed out")
+    except Exception as e:
+        logger.error(f"Server error during registration for {request.username}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Server error: {str(e)}")
+
+# Get all books, or the books listed in ?ids=1,2,3 (unprotected)
 @app.get("/api/mobile/books")
-async def get_all_books():
+async def get_all_books(http_request: Request, ids: Optional[str] = None,
+                        book_client: book_pb2_grpc.BookServiceStub = Depends(book_service),
+                        cache: Optional[BookCache] = Depends(book_cache)):
+    if ids is not None:
+        return await get_books_by_ids(parse_book_ids(ids), http_request, book_client, cache)
     logger.info("Fetching all books")
-    try:
-        response = book_client.GetAllBooks(book_pb2.Empty())
+
+    async def load(request):
+        response = await book_rpc(request, book_client.GetAllBooks, book_pb2.Empty())
         # Convert protobuf books to list of dictionaries
-        books = [MessageToDict(book, preserving_proto_field_name=True) for book in response.books]
-        return books
+        return json_body([MessageToDict(book, preserving_proto_field_name=True) for book in response.books])
+
+    try:
+        return await cached_json(cache, CATALOG_KEY, http_request, load)
     except RpcError as e:
         logger.error(f"Error fetching books: {str(e)}")
         status_code = 500
@@ -142,26 +309,150 @@ async def get_all_books():
             status_code = 404
         raise HTTPException(status_code=status_code, detail=f"Error: {str(e)}")
 
+def parse_book_ids(ids: str) -> list:
+    # Comma separated, deduplicated in order of first appearance
+    try:
+        book_ids = list(dict.fromkeys(int(part) for part in ids.split(",") if part.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma separated integers")
+    if not book_ids:
+        raise HTTPException(status_code=400, detail="ids must list at least one book id")
+    if len(book_ids) > BOOK_BATCH_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {BOOK_BATCH_MAX_IDS} ids per request")
+    return book_ids
+
+# Look up many books in one response: a JSON array with, in request order,
+# {"id": ..., "book": {...}} or {"id": ..., "error": {"status": ..., "detail": ...}}.
+# Fresh cache entries are served as they are. Every other id is read when the
+# cache asks for it, including stale entries refreshed in the background, and
+# the ids asked for together go out in one GetBooksByIds call. Those reads
+# feed the cache through the same single-flight loads as
+# GET /api/mobile/books/{id}. A book-service without GetBooksByIds is asked
+# with concurrent GetBook calls, at most BOOK_BATCH_CONCURRENCY at a time.
+async def get_books_by_ids(book_ids: list, http_request: Request,
+                           book_client: book_pb2_grpc.BookServiceStub, cache: Optional[BookCache]) -> Response:
+    logger.info(f"Fetching {len(book_ids)} books by id")
+    # Cached loads are shared with other requests, so they must not follow this client's disconnect
+    request = None if cache else http_request
+    state = http_request.app.state
+    batch = BookBatch(lambda ids: fetch_books(book_client, ids, request, state))
+
+    async def load(book_id):
+        result = await batch.get(book_id)
+        if result is None:
+            raise HTTPException(status_code=404, detail="Book not found")
+        if isinstance(result, BaseException):
+            raise result
+        return json_body(MessageToDict(result, preserving_proto_field_name=True))
+
+    async def one(book_id):
+        if cache:
+            return await cache.get_or_load(book_key(book_id), lambda: load(book_id))
+        return await load(book_id)
+
+    try:
+        results = await asyncio.gather(*(one(book_id) for book_id in book_ids), return_exceptions=True)
+    finally:
+        # Uncached reads are this request's alone; cached loads finish for whoever else awaits them
+        if not cache:
+            batch.cancel()
+    items = []
+    for book_id, result in zip(book_ids, results):
+        if isinstance(result, bytes):
+            items.append(b'{"id":%d,"book":%s}' % (book_id, result))
+        else:
+            items.append(json_body({"id": book_id, "error": book_error(book_id, result)}))
+    return Response(content=b"[" + b",".join(items) + b"]", media_type="application/json")
+
+# Collects the ids asked for in one pass of the event loop and reads them with
+# a single fetch(ids) call; an id asked for once that call has started goes
+# into the next one. get() returns the Book, the exception reading it, or None
+# if there is no such book.
+class BookBatch:
+    def __init__(self, fetch):
+        self._fetch = fetch
+        self._ids = None  # ids of the batch still collecting
+        self._task = None
+        self._tasks = []
+
+    async def get(self, book_id):
+        if self._ids is None:
+            self._ids = []
+            self._task = asyncio.ensure_future(self._run(self._ids))
+            # Failures reach callers through get(); this keeps asyncio from warning if none is left
+            self._task.add_done_callback(lambda task: task.cancelled() or task.exception())
+            self._tasks.append(self._task)
+        self._ids.append(book_id)
+        # Shielded: one caller going away does not cancel the read the others wait on
+        return (await asyncio.shield(self._task)).get(book_id)
+
+    def cancel(self):
+        for task in self._tasks:
+            task.cancel()
+
+    async def _run(self, ids):
+        # Let the other loads started in this pass join before closing the batch
+        await asyncio.sleep(0)
+        self._ids = None
+        return await self._fetch(list(dict.fromkeys(ids)))
+
+# Returns {book id: Book, or the exception reading it}; ids without a book are left out
+async def fetch_books(book_client: book_pb2_grpc.BookServiceStub, book_ids: list,
+                      request: Optional[Request], state) -> dict:
+    if time.monotonic() >= state.book_batch_retry_at:
+        try:
+            response = await book_rpc(request, book_client.GetBooksByIds, book_pb2.BookIds(ids=book_ids))
+            return {book.id: book for book in response.books}
+        except grpc.aio.AioRpcError as e:
+            if e.code() != grpc.StatusCode.UNIMPLEMENTED:
+                raise
+            logger.warning(f"Book service has no GetBooksByIds, using GetBook for the next {BOOK_BATCH_RETRY:.0f}s")
+            state.book_batch_retry_at = time.monotonic() + BOOK_BATCH_RETRY
+
+    semaphore = asyncio.Semaphore(BOOK_BATCH_CONCURRENCY)
+
+    async def get_book(book_id):
+        async with semaphore:
+            return await book_rpc(request, book_client.GetBook, book_pb2.BookId(id=book_id))
+
+    results = await asyncio.gather(*(get_book(book_id) for book_id in book_ids), return_exceptions=True)
+    return {
+        book_id: result for book_id, result in zip(book_ids, results)
+        if not (isinstance(result, RpcError) and result.code() == grpc.StatusCode.NOT_FOUND)
+    }
+
+def book_error(book_id: int, error: BaseException) -> dict:
+    if isinstance(error, HTTPException):
+        return {"status": error.status_code, "detail": error.detail}
+    logger.error(f"Error fetching book {book_id}: {str(error)}")
+    return {"status": 500, "detail": f"Error: {str(error)}"}
+
 # Get book by ID (unprotected)
 @app.get("/api/mobile/books/{book_id}")
-async def get_book(book_id: int):
+async def get_book(book_id: int, http_request: Request,
+                   book_client: book_pb2_grpc.BookServiceStub = Depends(book_service),
+                   cache: Optional[BookCache] = Depends(book_cache)):
     logger.info(f"Fetching book with ID: {book_id}")
-    try:
-        response = book_client.GetBook(book_pb2.BookRequest(id=book_id))
+
+    async def load(request):
+        response = await book_rpc(request, book_client.GetBook, book_pb2.BookId(id=book_id))
         # Convert single book to dictionary
-        return MessageToDict(response, preserving_proto_field_name=True)
+        return json_body(MessageToDict(response, preserving_proto_field_name=True))
+
+    try:
+        return await cached_json(cache, book_key(book_id), http_request, load)
     except RpcError as e:
         logger.error(f"Error fetching book {book_id}: {str(e)}")
         status_code = 404 if e.code() == grpc.StatusCode.NOT_FOUND else 500
         raise HTTPException(status_code=status_code, detail=f"Error: {str(e)}")
 
 # Get books by user (protected)
-@app.get("/api/mobile/users/{user_id}/books")
-async def get_books_by_user(user_id: str, request: Request):
-    await authenticate_jwt(request)
+@app.get("/api/mobile/users/{user_id}/books", dependencies=[Depends(authenticate_jwt)])
+async def get_books_by_user(user_id: int, request: Request,
+                            book_client: book_pb2_grpc.BookServiceStub = Depends(book_service)):
     logger.info(f"Fetching books for user: {user_id}")
     try:
-        response = book_client.GetBooksByUser(book_pb2.UserRequest(userId=user_id))
+        response = await book_rpc(request, book_client.GetBooksByUser, book_pb2.BookUserId(userId=user_id))
         # Convert protobuf books to list of dictionaries
         books = [MessageToDict(book, preserving_proto_field_name=True) for book in response.books]
         return books
@@ -171,97 +462,124 @@ async def get_books_by_user(user_id: str, request: Request):
         raise HTTPException(status_code=status_code, detail=f"Error: {str(e)}")
 
 # Create book (protected)
-@app.post("/api/mobile/books")
-async def create_book(request: BookRequest, auth_request: Request):
-    await authenticate_jwt(auth_request)
+@app.post("/api/mobile/books", dependencies=[Depends(authenticate_jwt)])
+async def create_book(request: BookRequest, auth_request: Request,
+                      book_client: book_pb2_grpc.BookServiceStub = Depends(book_service),
+                      cache: Optional[BookCache] = Depends(book_cache)):
     logger.info(f"Creating book: {request.title} for user: {request.userId}")
     if not request.title or not request.author or not request.userId:
         logger.warning("Missing required fields for creating book")
         raise HTTPException(status_code=400, detail="Title, author, and userId are required")
     try:
-        response = book_client.CreateBook(
-            book_pb2.Book(title=request.title, author=request.author, isbn=request.isbn or "", userId=request.userId)
-        )
+        response = await book_rpc(auth_request, book_client.CreateBook, book_pb2.BookRequest(
+            title=request.title, author=request.author, isbn=request.isbn or "", userId=request.userId
+        ))
         return MessageToDict(response, preserving_proto_field_name=True)
     except RpcError as e:
         logger.error(f"Error creating book: {str(e)}")
         status_code = 400 if e.code() == grpc.StatusCode.INVALID_ARGUMENT else 500
         raise HTTPException(status_code=status_code, detail=f"Error: {str(e)}")
+    finally:
+        invalidate_books(cache)
 
 # Update book (protected)
-@app.put("/api/mobile/books/{book_id}")
-async def update_book(book_id: int, request: BookRequest, auth_request: Request):
-    await authenticate_jwt(auth_request)
+@app.put("/api/mobile/books/{book_id}", dependencies=[Depends(authenticate_jwt)])
+async def update_book(book_id: int, request: BookRequest, auth_request: Request,
+                      book_client: book_pb2_grpc.BookServiceStub = Depends(book_service),
+                      cache: Optional[BookCache] = Depends(book_cache)):
     logger.info(f"Updating book with ID: {book_id}")
     if not request.title or not request.author or not request.userId:
         logger.warning("Missing required fields for updating book")
         raise HTTPException(status_code=400, detail="Title, author, and userId are required")
     try:
-        response = book_client.UpdateBook(
-            book_pb2.Book(id=book_id, title=request.title, author=request.author, isbn=request.isbn or "", userId=request.userId)
-        )
+        response = await book_rpc(auth_request, book_client.UpdateBook, book_pb2.Book(
+            id=book_id, title=request.title, author=request.author, isbn=request.isbn or "", userId=request.userId
+        ))
         return {"message": response.message}
     except RpcError as e:
         logger.error(f"Error updating book {book_id}: {str(e)}")
         status_code = 404 if e.code() == grpc.StatusCode.NOT_FOUND else 500
         raise HTTPException(status_code=status_code, detail=f"Error: {str(e)}")
+    finally:
+        invalidate_books(cache, book_id)
 
 # Delete book (protected)
-@app.delete("/api/mobile/books/{book_id}")
-async def delete_book(book_id: int, request: Request):
-    await authenticate_jwt(request)
+@app.delete("/api/mobile/books/{book_id}", dependencies=[Depends(authenticate_jwt)])
+async def delete_book(book_id: int, request: Request,
+                      book_client: book_pb2_grpc.BookServiceStub = Depends(book_service),
+                      cache: Optional[BookCache] = Depends(book_cache)):
     logger.info(f"Deleting book with ID: {book_id}")
     try:
-        response = book_client.DeleteBook(book_pb2.BookRequest(id=book_id))
+        response = await book_rpc(request, book_client.DeleteBook, book_pb2.BookId(id=book_id))
         return {"message": response.message}
     except RpcError as e:
         logger.error(f"Error deleting book {book_id}: {str(e)}")
         status_code = 404 if e.code() == grpc.StatusCode.NOT_FOUND else 500
         raise HTTPException(status_code=status_code, detail=f"Error: {str(e)}")
+    finally:
+        invalidate_books(cache, book_id)
 
-# Get transactions (unprotected)
+# Get transactions (unprotected, keyset paginated)
 @app.get("/api/mobile/transactions")
-async def get_transactions(page: int = 1, limit: int = 10):
-    logger.info(f"Fetching transactions: page={page}, limit={limit}")
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(
-                f"{TRANSACTION_SERVICE_URL}/transactions",
-                params={"page": page, "limit": limit}
-            )
-            response.raise_for_status()
-            #send_book_purchase_event(str(request.userId), request.bookId, request.transactionType)
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            logger.error(f"Error fetching transactions: status={e.response.status_code}, response={e.response.text}")
-            raise HTTPException(status_code=e.response.status_code, detail=e.response.text or "Unknown error")
-        except Exception as e:
-            logger.error(f"Server error while fetching transactions: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Server error: {str(e)}")
+async def get_transactions(limit: int = 10, cursor: Optional[str] = None,
+                           client: httpx.AsyncClient = Depends(transaction_service)):
+    logger.info(f"Fetching transactions: limit={limit}, cursor={cursor}")
+    params = {"limit": limit}
+    if cursor:
+        params["cursor"] = cursor
+    try:
+        response = await client.get("/transactions", params=params)
+        response.raise_for_status()
+        headers = {}
+        if "X-Next-Cursor" in response.headers:
+            headers["X-Next-Cursor"] = response.headers["X-Next-Cursor"]
+        return JSONResponse(content=response.json(), headers=headers)
+    except httpx.HTTPStatusError as e:
+        logger.error(f"Error fetching transactions: status={e.response.status_code}, response={e.response.text}")
+        raise HTTPException(status_code=e.response.status_code, detail=e.response.text or "Unknown error")
+    except httpx.TimeoutException:
+        logger.error("Transaction service timed out while fetching transactions")
+        raise HTTPException(status_code=504, detail="Transaction service timed out")
+    except Exception as e:
+        logger.error(f"Server error while fetching transactions: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Server error: {str(e)}")
 
 # Create transaction (protected)
-@app.post("/api/mobile/transactions")
-async def create_transaction(request: TransactionRequest, auth_request: Request):
-    await authenticate_jwt(auth_request)
+@app.post("/api/mobile/transactions", dependencies=[Depends(authenticate_jwt)])
+async def create_transaction(request: TransactionRequest,
+                             client: httpx.AsyncClient = Depends(transaction_service)):
     logger.info(f"Creating transaction: userId={request.userId}, bookId={request.bookId}, transactionType={request.transactionType}")
     if not request.userId or not request.bookId or not request.transactionType:
         logger.warning("Missing required fields for creating transaction")
         raise HTTPException(status_code=400, detail="userId, bookId, and transactionType are required")
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{TRANSACTION_SERVICE_URL}/transactions",
-                json={"userId": request.userId, "bookId": request.bookId, "transactionType": request.transactionType}
-            )
-            response.raise_for_status()
-            return response.json()
+        response = await client.post(
+            "/transactions",
+            json={"userId": request.userId, "bookId": request.bookId, "transactionType": request.transactionType}
+        )
+        response.raise_for_status()
+        return response.json()
     except httpx.HTTPStatusError as e:
         logger.error(f"Error creating transaction: status={e.response.status_code}, response={e.response.text}")
         raise HTTPException(status_code=e.response.status_code, detail=e.response.text or "Unknown error")
+    except httpx.TimeoutException:
+        logger.error("Transaction service timed out while creating a transaction")
+        raise HTTPException(status_code=504, detail="Transaction service timed out")
     except Exception as e:
         logger.error(f"Server error while creating transaction: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Server error: {str(e)}")
 
+# Runtime metrics
+@app.get("/metrics")
+async def get_metrics(cache: Optional[BookCache] = Depends(book_cache),
+                      tokens: Optional[TokenCache] = Depends(token_cache)):
+    metrics = {}
+    if cache:
+        metrics["book_cache"] = cache.stats()
+    if tokens:
+        metrics["token_cache"] = tokens.stats()
+    return metrics
+
 if __name__ == "__main__":
     logger.info("Starting Mobile API Gateway on port 4000")
     uvicorn.run(app, host="0.0.0.0", port=4000)
\ No newline at end of file
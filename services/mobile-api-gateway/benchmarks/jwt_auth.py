@@ -0,0 +1,76 @@
+"""Per-request cost of JWT authentication with and without the token cache.
+
+Times authenticate_jwt on its own, then a protected route that does nothing
+else, driven in-process. Run from the gateway directory:
+    python benchmarks/jwt_auth.py [requests]
+"""
+import asyncio
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import jwt
+from fastapi import Depends, FastAPI
+from starlette.requests import Request
+
+import app as gateway_module
+from cache import TokenCache
+
+def make_token():
+    claims = {'sub': 'bench-user', 'exp': int(time.time()) + 3600}
+    return jwt.encode(claims, gateway_module.JWT_SECRET, algorithm='HS512')
+
+def make_request(token):
+    scope = {'type': 'http', 'headers': [(b'authorization', f'Bearer {token}'.encode())]}
+    return Request(scope)
+
+async def time_dependency(count, cache):
+    request = make_request(make_token())
+    await gateway_module.authenticate_jwt(request, cache)  # Warm up (and fill the cache)
+    started = time.perf_counter()
+    for _ in range(count):
+        await gateway_module.authenticate_jwt(request, cache)
+    return (time.perf_counter() - started) / count * 1e6
+
+async def time_route(count, cache):
+    bench = FastAPI()
+    bench.state.token_cache = cache
+
+    @bench.get('/protected', dependencies=[Depends(gateway_module.authenticate_jwt)])
+    async def protected():
+        return {}
+
+    headers = {'Authorization': f'Bearer {make_token()}'}
+    transport = httpx.ASGITransport(app=bench)
+    async with httpx.AsyncClient(transport=transport, base_url='http://gateway') as client:
+        (await client.get('/protected', headers=headers)).raise_for_status()  # Warm up
+        started = time.perf_counter()
+        for _ in range(count):
+            (await client.get('/protected', headers=headers)).raise_for_status()
+        return (time.perf_counter() - started) / count * 1e6
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    # Per-validation log lines would dominate the uncached timings
+    gateway_module.logger.disabled = True
+    logging.getLogger('httpx').disabled = True
+    results = {}
+    for label, make_cache in (('decode every request', lambda: None),
+                              ('token cache', lambda: TokenCache(1000, 300))):
+        results[label] = (
+            asyncio.run(time_dependency(count, make_cache())),
+            asyncio.run(time_route(count // 10, make_cache()))
+        )
+
+    print(f'requests: {count} (route: {count // 10})')
+    for label, (dependency, route) in results.items():
+        print(f'{label:22} authenticate_jwt {dependency:8.2f} us   protected route {route:8.1f} us')
+    uncached, cached = results['decode every request'], results['token cache']
+    print(f'saved per request: {uncached[0] - cached[0]:.2f} us ({uncached[0] / cached[0]:.0f}x faster auth)')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Requests/sec of GET /api/mobile/transactions with a client per request versus the shared pooled client.
+
+Starts a stub transaction service on a local port and drives the gateway in-process.
+Run from the gateway directory:
+    python benchmarks/proxy_clients.py [requests] [concurrency]
+"""
+import asyncio
+import multiprocessing
+import os
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import uvicorn
+
+PAGE = b'[{"id": 1, "userId": 1, "bookId": 1, "transactionType": "PURCHASE"}]'
+
+async def stub_transaction_service(scope, receive, send):
+    # Bare ASGI app so the upstream itself costs as little as possible
+    if scope['type'] != 'http':
+        return
+    await send({'type': 'http.response.start', 'status': 200, 'headers': [(b'content-type', b'application/json')]})
+    await send({'type': 'http.response.body', 'body': PAGE})
+
+def serve_stub(port):
+    uvicorn.run(stub_transaction_service, host='127.0.0.1', port=port, log_level='error')
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def wait_for(port, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError('stub transaction service did not start')
+
+async def run(gateway, count, concurrency):
+    # Drive the gateway through ASGI so only the upstream leg uses the network
+    transport = httpx.ASGITransport(app=gateway)
+    async with httpx.AsyncClient(transport=transport, base_url='http://gateway') as client:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one():
+            async with semaphore:
+                response = await client.get('/api/mobile/transactions?limit=10')
+                response.raise_for_status()
+
+        await one()  # Warm up
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(count)))
+        return count / (time.perf_counter() - started)
+
+async def measure(count, concurrency):
+    import app as gateway_module
+    gateway = gateway_module.app
+
+    async def client_per_request():
+        # What every handler did before: a new pool, handshake and teardown per call
+        async with gateway_module.create_upstream_client(
+            gateway_module.TRANSACTION_SERVICE_URL, gateway_module.TRANSACTION_SERVICE_TIMEOUT
+        ) as client:
+            yield client
+
+    async with gateway_module.lifespan(gateway):
+        gateway.dependency_overrides[gateway_module.transaction_service] = client_per_request
+        legacy = await run(gateway, count, concurrency)
+        gateway.dependency_overrides.clear()
+        shared = await run(gateway, count, concurrency)
+    return legacy, shared
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    port = free_port()
+    os.environ['TRANSACTION_SERVICE_URL'] = f'http://127.0.0.1:{port}'
+    stub = multiprocessing.Process(target=serve_stub, args=(port,), daemon=True)
+    stub.start()
+    try:
+        wait_for(port)
+        legacy, shared = asyncio.run(measure(count, concurrency))
+    finally:
+        stub.terminate()
+
+    print(f'requests: {count}, concurrency: {concurrency}')
+    print(f'client per request: {legacy:10,.0f} req/sec')
+    print(f'shared client:      {shared:10,.0f} req/sec')
+    print(f'speedup: {shared / legacy:.1f}x')
+
+if __name__ == '__main__':
+    main()
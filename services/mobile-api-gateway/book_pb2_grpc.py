@@ -49,6 +49,11 @@ class BookServiceStub(object):
                 request_serializer=book__pb2.BookUserId.SerializeToString,
                 response_deserializer=book__pb2.BookList.FromString,
                 _registered_method=True)
+        self.GetBooksByIds = channel.unary_unary(
+                '/book.BookService/GetBooksByIds',
+                request_serializer=book__pb2.BookIds.SerializeToString,
+                response_deserializer=book__pb2.BookList.FromString,
+                _registered_method=True)
         self.CreateBook = channel.unary_unary(
                 '/book.BookService/CreateBook',
                 request_serializer=book__pb2.BookRequest.SerializeToString,
@@ -87,6 +92,12 @@ class BookServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def GetBooksByIds(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def CreateBook(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
@@ -123,6 +134,11 @@ def add_BookServiceServicer_to_server(servicer, server):
                     request_deserializer=book__pb2.BookUserId.FromString,
                     response_serializer=book__pb2.BookList.SerializeToString,
             ),
+            'GetBooksByIds': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetBooksByIds,
+                    request_deserializer=book__pb2.BookIds.FromString,
+                    response_serializer=book__pb2.BookList.SerializeToString,
+            ),
             'CreateBook': grpc.unary_unary_rpc_method_handler(
                     servicer.CreateBook,
                     request_deserializer=book__pb2.BookRequest.FromString,
@@ -230,6 +246,33 @@ class BookService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def GetBooksByIds(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/book.BookService/GetBooksByIds',
+            book__pb2.BookIds.SerializeToString,
+            book__pb2.BookList.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def CreateBook(request,
             target,
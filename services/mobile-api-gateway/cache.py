@@ -0,0 +1,208 @@
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Read-through cache of serialized book-service responses for one event loop.
+#
+# Entries are fresh for `ttl` seconds, then stale for another `stale_ttl`: a
+# stale entry is still served while a single background load refreshes it.
+# Concurrent misses for the same key share one load (single-flight), so N
+# callers cost one upstream call. The cache is bounded by entry count and by
+# total bytes, evicting the least recently used entries.
+#
+# invalidate() drops an entry and detaches any load in flight for it, so a
+# response fetched before a write is never stored after it.
+class BookCache:
+    def __init__(self, ttl, stale_ttl, max_entries, max_bytes, clock=time.monotonic):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self._entries = OrderedDict()  # key -> (body, fresh_until, stale_until)
+        self._bytes = 0
+        self._loads = {}  # key -> task loading it
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.upstream_calls = 0
+        self.upstream_failures = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    async def get_or_load(self, key, loader):
+        # loader() is awaited at most once per key at a time and returns bytes
+        entry = self._entries.get(key)
+        now = self.clock()
+        if entry is not None:
+            body, fresh_until, stale_until = entry
+            if now < fresh_until:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return body
+            if now < stale_until:
+                self._entries.move_to_end(key)
+                self.stale_hits += 1
+                self._load(key, loader)
+                return body
+            self._remove(key)
+        self.misses += 1
+        if key in self._loads:
+            self.coalesced += 1
+        # Shielded: a caller that goes away does not cancel the load the others wait on
+        return await asyncio.shield(self._load(key, loader))
+
+    def is_fresh(self, key):
+        # Peek without counting a lookup or touching the LRU order
+        entry = self._entries.get(key)
+        return entry is not None and self.clock() < entry[1]
+
+    def invalidate(self, *keys):
+        for key in keys:
+            if key in self._entries:
+                self._remove(key)
+            # The load keeps running for whoever awaits it, but will not store its result
+            self._loads.pop(key, None)
+            self.invalidations += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+        self._loads.clear()
+
+    async def close(self):
+        loads = list(self._loads.values())
+        for task in loads:
+            task.cancel()
+        await asyncio.gather(*loads, return_exceptions=True)
+        self.clear()
+
+    def stats(self):
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'hit_ratio': (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+            'upstream_calls': self.upstream_calls,
+            'upstream_failures': self.upstream_failures,
+            'loads_in_flight': len(self._loads),
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'entries': len(self._entries),
+            'bytes': self._bytes
+        }
+
+    def _load(self, key, loader):
+        task = self._loads.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._run_load(key, loader))
+            self._loads[key] = task
+            task.add_done_callback(self._log_refresh_failure)
+        return task
+
+    async def _run_load(self, key, loader):
+        task = asyncio.current_task()
+        self.upstream_calls += 1
+        try:
+            body = await loader()
+        except BaseException:
+            self.upstream_failures += 1
+            raise
+        finally:
+            # Only the load still registered for the key may store; an
+            # invalidated one has been detached
+            current = self._loads.get(key) is task
+            if current:
+                del self._loads[key]
+        if current:
+            self._store(key, body)
+        return body
+
+    def _store(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        now = self.clock()
+        self._entries[key] = (body, now + self.ttl, now + self.ttl + self.stale_ttl)
+        self._bytes += len(body)
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, key):
+        body, _, _ = self._entries.pop(key)
+        self._bytes -= len(body)
+
+    @staticmethod
+    def _log_refresh_failure(task):
+        # Background refreshes have no caller to raise to; retrieving the
+        # exception also keeps asyncio from warning about it
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Book cache load failed: {task.exception()}")
+
+# Verified JWT claims keyed by the SHA-256 digest of the token, so raw tokens
+# are never held. An entry is served until the token's exp, and for at most
+# max_ttl seconds, which also bounds how long a rotated secret keeps old
+# tokens valid. Only successfully verified tokens are cached.
+class TokenCache:
+    def __init__(self, max_entries, max_ttl, clock=time.time):
+        self.max_entries = max_entries
+        self.max_ttl = max_ttl
+        self.clock = clock  # Wall clock, since exp is epoch seconds
+        self._entries = OrderedDict()  # digest -> (claims, expires_at)
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+
+    def get(self, token):
+        key = self._key(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        claims, expires_at = entry
+        if self.clock() >= expires_at:
+            # Same boundary as jwt.decode: a token is expired from its exp second on
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return claims
+
+    def set(self, token, claims):
+        expires_at = self.clock() + self.max_ttl
+        exp = claims.get('exp')
+        if isinstance(exp, (int, float)):
+            expires_at = min(expires_at, exp)
+        key = self._key(token)
+        self._entries[key] = (claims, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+            'expirations': self.expirations,
+            'evictions': self.evictions,
+            'entries': len(self._entries)
+        }
+
+    @staticmethod
+    def _key(token):
+        return hashlib.sha256(token.encode()).digest()
@@ -0,0 +1,117 @@
+import asyncio
+import json
+import time
+import unittest
+from types import SimpleNamespace
+import jwt
+from fastapi import HTTPException
+from starlette.requests import Request
+import app as gateway
+import book_pb2
+from cache import BookCache, TokenCache
+from test_cache import FakeClock
+
+def request_with(token):
+    return Request({'type': 'http', 'headers': [(b'authorization', f'Bearer {token}'.encode())]})
+
+class AuthenticateJwtTestCase(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.now = time.time()
+        self.cache = TokenCache(max_entries=10, max_ttl=300, clock=lambda: self.now)
+
+    def token(self, exp):
+        return jwt.encode({'sub': 'alice', 'exp': int(exp)}, gateway.JWT_SECRET, algorithm='HS512')
+
+    async def test_verified_token_is_served_from_cache(self):
+        token = self.token(time.time() + 60)
+
+        first = await gateway.authenticate_jwt(request_with(token), self.cache)
+        second = await gateway.authenticate_jwt(request_with(token), self.cache)
+
+        self.assertEqual(first['sub'], 'alice')
+        self.assertIs(second, first)
+        self.assertEqual(self.cache.stats()['hits'], 1)
+
+    async def test_expired_token_is_verified_again_and_rejected(self):
+        # Cached while valid; its exp has passed by the next request
+        exp = time.time() - 1
+        self.now = exp - 10
+        self.cache.set(self.token(exp), {'sub': 'alice', 'exp': int(exp)})
+        self.now = time.time()
+
+        with self.assertRaises(HTTPException) as raised:
+            await gateway.authenticate_jwt(request_with(self.token(exp)), self.cache)
+        self.assertEqual(raised.exception.status_code, 401)
+        self.assertEqual(self.cache.stats()['expirations'], 1)
+
+    async def test_invalid_token_is_not_cached(self):
+        token = self.token(time.time() + 60) + 'x'
+
+        for _ in range(2):
+            with self.assertRaises(HTTPException) as raised:
+                await gateway.authenticate_jwt(request_with(token), self.cache)
+            self.assertEqual(raised.exception.status_code, 403)
+        self.assertEqual(self.cache.stats()['entries'], 0)
+
+class FakeBookClient:
+    def __init__(self, books):
+        self.books = books
+        self.batches = []
+
+    async def GetBooksByIds(self, message, timeout=None):
+        self.batches.append(list(message.ids))
+        return book_pb2.BookList(books=[self.books[book_id] for book_id in message.ids if book_id in self.books])
+
+# Simulates a write landing between the freshness check and the load
+class RacingCache(BookCache):
+    async def get_or_load(self, key, load):
+        self.invalidate(key)
+        return await super().get_or_load(key, load)
+
+class GetBooksByIdsTestCase(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.client = FakeBookClient({
+            book_id: book_pb2.Book(id=book_id, title=f'Book {book_id}') for book_id in (1, 2, 3)
+        })
+        self.http_request = SimpleNamespace(app=SimpleNamespace(state=SimpleNamespace(book_batch_retry_at=0.0)))
+
+    async def get_books(self, book_ids, cache):
+        response = await gateway.get_books_by_ids(book_ids, self.http_request, self.client, cache)
+        return json.loads(response.body)
+
+    async def fill(self, cache, book_ids):
+        for book_id in book_ids:
+            await cache.get_or_load(gateway.book_key(book_id), self.cached_body(book_id, 'cached'))
+
+    def cached_body(self, book_id, title):
+        async def load():
+            return gateway.json_body({'id': book_id, 'title': title})
+        return load
+
+    async def test_entries_invalidated_after_the_check_are_loaded(self):
+        cache = RacingCache(ttl=30, stale_ttl=60, max_entries=100, max_bytes=4096, clock=self.clock)
+        await self.fill(cache, (1, 2, 3))
+
+        items = await self.get_books([1, 2, 3, 4], cache)
+
+        self.assertEqual([item['book']['title'] for item in items[:3]], ['Book 1', 'Book 2', 'Book 3'])
+        self.assertEqual(items[3], {'id': 4, 'error': {'status': 404, 'detail': 'Book not found'}})
+        self.assertEqual(self.client.batches, [[1, 2, 3, 4]])
+
+    async def test_stale_entries_are_refreshed_in_one_batch(self):
+        cache = BookCache(ttl=30, stale_ttl=60, max_entries=100, max_bytes=4096, clock=self.clock)
+        await self.fill(cache, (1, 2))
+        self.clock.now += 31
+
+        items = await self.get_books([1, 2, 3], cache)
+
+        # The stale bodies are served at once; their refreshes and the read of book 3 share one call
+        self.assertEqual([item['book']['title'] for item in items], ['cached', 'cached', 'Book 3'])
+        await asyncio.sleep(0)
+        self.assertEqual(self.client.batches, [[1, 2, 3]])
+        self.assertEqual([item['book']['title'] for item in await self.get_books([1, 2], cache)], ['Book 1', 'Book 2'])
+        self.assertEqual(cache.stats()['upstream_failures'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
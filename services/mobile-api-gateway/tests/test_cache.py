@@ -0,0 +1,168 @@
+import asyncio
+import unittest
+from cache import BookCache, TokenCache
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+class BookCacheTestCase(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = BookCache(ttl=30, stale_ttl=60, max_entries=100, max_bytes=1024, clock=self.clock)
+        self.calls = 0
+
+    def loader(self, body=b'book', gate=None):
+        async def load():
+            self.calls += 1
+            if gate:
+                await gate.wait()
+            return body
+        return load
+
+    async def test_concurrent_misses_make_one_call(self):
+        gate = asyncio.Event()
+        waiters = [asyncio.ensure_future(self.cache.get_or_load('book:1', self.loader(gate=gate))) for _ in range(50)]
+        await asyncio.sleep(0)
+        gate.set()
+
+        self.assertEqual(await asyncio.gather(*waiters), [b'book'] * 50)
+        self.assertEqual(self.calls, 1)
+        stats = self.cache.stats()
+        self.assertEqual((stats['misses'], stats['coalesced'], stats['upstream_calls']), (50, 49, 1))
+
+    async def test_fresh_entry_is_served_without_a_call(self):
+        await self.cache.get_or_load('book:1', self.loader())
+        self.clock.now += 29
+
+        self.assertEqual(await self.cache.get_or_load('book:1', self.loader(b'new')), b'book')
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(self.cache.stats()['hits'], 1)
+
+    async def test_invalidate_during_a_load_does_not_store(self):
+        gate = asyncio.Event()
+        waiter = asyncio.ensure_future(self.cache.get_or_load('book:1', self.loader(b'before write', gate)))
+        await asyncio.sleep(0)
+
+        # A write lands while the read is in flight
+        self.cache.invalidate('book:1')
+        gate.set()
+
+        # The caller still gets its answer, but it is not cached past the write
+        self.assertEqual(await waiter, b'before write')
+        self.assertFalse(self.cache.is_fresh('book:1'))
+        self.assertEqual(await self.cache.get_or_load('book:1', self.loader(b'after write')), b'after write')
+        self.assertEqual(self.calls, 2)
+
+    async def test_stale_entry_is_served_while_one_refresh_runs(self):
+        await self.cache.get_or_load('book:1', self.loader(b'old'))
+        self.clock.now += 31
+        gate = asyncio.Event()
+
+        # Both callers get the stale body at once; only one refresh starts
+        self.assertEqual(await self.cache.get_or_load('book:1', self.loader(b'new', gate)), b'old')
+        self.assertEqual(await self.cache.get_or_load('book:1', self.loader(b'new', gate)), b'old')
+        self.assertEqual(self.cache.stats()['loads_in_flight'], 1)
+        gate.set()
+        await asyncio.sleep(0)
+
+        self.assertEqual(await self.cache.get_or_load('book:1', self.loader(b'newer')), b'new')
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(self.cache.stats()['stale_hits'], 2)
+
+    async def test_entry_past_its_stale_window_is_loaded_again(self):
+        await self.cache.get_or_load('book:1', self.loader(b'old'))
+        self.clock.now += 91
+
+        self.assertEqual(await self.cache.get_or_load('book:1', self.loader(b'new')), b'new')
+        self.assertEqual(self.cache.stats()['stale_hits'], 0)
+
+    async def test_least_recently_used_entries_are_evicted_by_bytes(self):
+        cache = BookCache(ttl=30, stale_ttl=60, max_entries=100, max_bytes=10, clock=self.clock)
+        await cache.get_or_load('a', self.loader(b'aaaa'))
+        await cache.get_or_load('b', self.loader(b'bbbb'))
+        await cache.get_or_load('a', self.loader())  # Touch a, so b is now the oldest
+        await cache.get_or_load('c', self.loader(b'cccc'))
+
+        self.assertTrue(cache.is_fresh('a'))
+        self.assertFalse(cache.is_fresh('b'))
+        self.assertTrue(cache.is_fresh('c'))
+        stats = cache.stats()
+        self.assertEqual((stats['entries'], stats['bytes'], stats['evictions']), (2, 8, 1))
+
+    async def test_body_larger_than_the_cache_is_not_stored(self):
+        cache = BookCache(ttl=30, stale_ttl=60, max_entries=100, max_bytes=3, clock=self.clock)
+
+        self.assertEqual(await cache.get_or_load('a', self.loader(b'aaaa')), b'aaaa')
+        self.assertEqual(cache.stats()['entries'], 0)
+
+    async def test_failed_load_is_raised_and_not_cached(self):
+        async def failing():
+            raise RuntimeError('book service down')
+
+        with self.assertRaises(RuntimeError):
+            await self.cache.get_or_load('book:1', failing)
+        self.assertEqual(self.cache.stats()['upstream_failures'], 1)
+        self.assertEqual(await self.cache.get_or_load('book:1', self.loader()), b'book')
+
+    async def test_caller_going_away_does_not_cancel_the_shared_load(self):
+        gate = asyncio.Event()
+        first = asyncio.ensure_future(self.cache.get_or_load('book:1', self.loader(gate=gate)))
+        second = asyncio.ensure_future(self.cache.get_or_load('book:1', self.loader(gate=gate)))
+        await asyncio.sleep(0)
+
+        first.cancel()
+        gate.set()
+
+        self.assertEqual(await second, b'book')
+        self.assertTrue(self.cache.is_fresh('book:1'))
+
+class TokenCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock(now=1000.0)
+        self.cache = TokenCache(max_entries=2, max_ttl=300, clock=self.clock)
+
+    def test_claims_are_served_until_exp(self):
+        claims = {'sub': 'alice', 'exp': 1060}
+        self.cache.set('token', claims)
+
+        self.clock.now = 1059.9
+        self.assertIs(self.cache.get('token'), claims)
+        # jwt.decode rejects a token from its exp second on, and so does the cache
+        self.clock.now = 1060
+        self.assertIsNone(self.cache.get('token'))
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['expirations'], stats['entries']), (1, 1, 0))
+
+    def test_max_ttl_caps_long_lived_and_exp_less_tokens(self):
+        self.cache.set('long', {'sub': 'alice', 'exp': 10 ** 10})
+        self.cache.set('no-exp', {'sub': 'bob'})
+
+        self.clock.now = 1299
+        self.assertIsNotNone(self.cache.get('long'))
+        self.assertIsNotNone(self.cache.get('no-exp'))
+        self.clock.now = 1300
+        self.assertIsNone(self.cache.get('long'))
+        self.assertIsNone(self.cache.get('no-exp'))
+
+    def test_least_recently_used_tokens_are_evicted(self):
+        self.cache.set('a', {'sub': 'a'})
+        self.cache.set('b', {'sub': 'b'})
+        self.cache.get('a')
+        self.cache.set('c', {'sub': 'c'})
+
+        self.assertIsNotNone(self.cache.get('a'))
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(self.cache.stats()['evictions'], 1)
+
+    def test_tokens_are_keyed_by_digest(self):
+        self.cache.set('secret-token', {'sub': 'alice'})
+
+        self.assertNotIn('secret-token', self.cache._entries)
+        self.assertIsNone(self.cache.get('secret-token-2'))
+
+if __name__ == '__main__':
+    unittest.main()
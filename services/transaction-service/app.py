@@ -1,13 +1,17 @@
 import logging
-import os
-import json
 import time
 import threading
-from typing import Optional, Callable
-import stomp
-from flask import Flask, request, jsonify
-from db import get_db_connection
-from queue import Queue
+from flask import Flask, Response, request, jsonify, url_for, stream_with_context
+from db import get_db_connection, get_pool, reset_pool
+from group_commit import GroupCommitter
+from stats import ORDERINGS
+from migrations import migrate
+from cache import TransactionCache
+import messaging
+from serializers import serialize_transaction, serialize_transactions, serialize_ndjson
+from config import Config
+from pagination import PaginationError, parse_limit, encode_cursor, decode_cursor, split_page
+import queries
 
 # Configure logging
 logging.basicConfig(
@@ -22,216 +26,38 @@ logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 
-# ActiveMQ configuration
-BROKER_HOST = os.getenv("ACTIVEMQ_BROKER", "shared-activemq")
-BROKER_PORT = int(os.getenv("ACTIVEMQ_BROKER_PORT", "61616"))
-USERNAME = os.getenv("ACTIVEMQ_USERNAME", "admin")
-PASSWORD = os.getenv("ACTIVEMQ_PASSWORD", "admin")
-CONNECTION_TIMEOUT = 5  # Seconds
-MAX_RECONNECT_ATTEMPTS = 3
-
-# Message queue for async sending
-message_queue = Queue()
-
-# ActiveMQ Connection Manager
-class ActiveMQConnection:
-    def __init__(self, host: str, port: int, username: str, password: str, timeout: int):
-        self.host = host
-        self.port = port
-        self.username = username
-        self.password = password
-        self.timeout = timeout
-        self.conn = None
-        self.lock = threading.Lock()
-        self.is_enabled = True
-
-    def connect(self):
-        if not self.is_enabled:
-            logger.warning("ActiveMQ connection disabled")
-            raise Exception("ActiveMQ connection disabled")
-        with self.lock:
-            if not self.conn or not self.conn.is_connected():
-                try:
-                    self.conn = stomp.Connection(
-                        [(self.host, self.port)],
-                        timeout=self.timeout,
-                        heartbeats=(10000, 10000),
-                        vhost=None
-                    )
-                    self.conn.set_listener('', ConnectionListener())
-                    self.conn.connect(
-                        self.username,
-                        self.password,
-                        wait=True,
-                        headers={'client-id': 'transaction-service'}
-                    )
-                    logger.info(f"Connected to ActiveMQ at {self.host}:{self.port}")
-                except Exception as e:
-                    logger.error(f"Failed to connect to ActiveMQ at {self.host}:{self.port}: {str(e)}")
-                    raise
-
-    def disconnect(self):
-        with self.lock:
-            if self.conn and self.conn.is_connected():
-                try:
-                    self.conn.disconnect()
-                    logger.info("Disconnected from ActiveMQ")
-                except Exception as e:
-                    logger.error(f"Failed to disconnect from ActiveMQ: {str(e)}")
-                finally:
-                    self.conn = None
-
-    def send_message(self, destination: str, message: str):
-        try:
-            self.connect()
-            self.conn.send(
-                body=message,
-                destination=destination,
-                headers={'persistent': 'true'}
-            )
-            logger.info(f"Sent to {destination}: {message}")
-        except Exception as e:
-            logger.error(f"Failed to send message to {destination}: {str(e)}")
-            self.disconnect()
-            raise
-        finally:
-            self.disconnect()
-
-    def subscribe(self, destination: str, listener: 'MessageListener'):
-        try:
-            self.connect()
-            self.conn.set_listener("msg_listener", listener)
-            self.conn.subscribe(
-                destination=destination,
-                id='transaction-service-sub-1',
-                ack='client-individual',
-                headers={'activemq.prefetchSize': '1'}
-            )
-            logger.info(f"Subscribed to {destination}")
-        except Exception as e:
-            logger.error(f"Failed to subscribe to {destination}: {str(e)}")
-            self.disconnect()
-            raise
-
-    def disable(self):
-        self.is_enabled = False
-        self.disconnect()
-        logger.warning("ActiveMQ connection disabled due to repeated failures")
-
-# Connection Listener
-class ConnectionListener(stomp.ConnectionListener):
-    def on_connected(self, frame):
-        logger.info(f"ActiveMQ connected: {frame.headers}")
-
-    def on_disconnected(self):
-        logger.warning("Disconnected from ActiveMQ")
-
-    def on_error(self, frame):
-        logger.error(f"ActiveMQ error: {frame.body}")
-
-    def on_heartbeat_timeout(self):
-        logger.error("ActiveMQ heartbeat timeout")
-
-# Message Listener
-class MessageListener(stomp.ConnectionListener):
-    def __init__(self, callback: Optional[Callable[[str], None]] = None):
-        self.callback = callback
-
-    def on_error(self, frame):
-        logger.error(f"ActiveMQ error: {frame.body}")
-
-    def on_message(self, frame):
-        body = frame.body
-        logger.info(f"Received message: {body}")
-        if self.callback:
-            try:
-                self.callback(body)
-            except Exception as e:
-                logger.error(f"Error processing message: {str(e)}")
-        try:
-            self.ack(frame)
-        except Exception as e:
-            logger.error(f"Failed to ack message: {str(e)}")
-
-    def on_disconnected(self):
-        logger.warning("Disconnected from ActiveMQ")
-
-    def on_connected(self, frame):
-        logger.info(f"Message listener connected: {frame.headers}")
+# Coalesces concurrent single inserts when GROUP_COMMIT_ENABLED is set
+group_committer = GroupCommitter(
+    queries.INSERT_TRANSACTION,
+    on_flush=messaging.write_outbox if messaging.outbox_relay else None
+) if Config.GROUP_COMMIT_ENABLED else None
 
-# Global ActiveMQ connection
-mq_conn = ActiveMQConnection(BROKER_HOST, BROKER_PORT, USERNAME, PASSWORD, CONNECTION_TIMEOUT)
+# Read-through cache for transaction lookups when CACHE_ENABLED is set
+transaction_cache = TransactionCache() if Config.CACHE_ENABLED else None
 
-# Background message sender
-def message_sender():
-    while True:
-        destination, message = message_queue.get()
-        attempts = 0
-        while attempts < MAX_RECONNECT_ATTEMPTS:
-            try:
-                mq_conn.send_message(destination, message)
-                break
-            except Exception as e:
-                attempts += 1
-                logger.error(f"Background send attempt {attempts} failed for {destination}: {str(e)}")
-                if attempts == MAX_RECONNECT_ATTEMPTS:
-                    logger.error(f"Max attempts reached for {destination}. Disabling ActiveMQ.")
-                    mq_conn.disable()
-                    break
-                time.sleep(2)
-        message_queue.task_done()
-
-# Start message sender thread
-threading.Thread(target=message_sender, daemon=True).start()
-
-# Send book purchase event (async)
-def send_book_purchase_event(user_id: str, book_id: int, transaction_type: str):
-    if not mq_conn.is_enabled:
-        logger.warning("Skipping book purchase event: ActiveMQ disabled")
+# Drop cached reads affected by a write
+def invalidate_cache(transaction_id=None, user_ids=()):
+    if not transaction_cache:
         return
-    message = json.dumps({
-        "event": "book_purchase",
-        "userId": user_id,
-        "bookId": book_id,
-        "transactionType": transaction_type,
-        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
-    })
-    message_queue.put(("/topic/book-purchases", message))
-    logger.info(f"Queued book purchase event: {message}")
-
-# Subscribe to book purchases
-def subscribe_to_topic(topic: str, callback: Optional[Callable[[str], None]] = None):
-    def run_subscription():
-        attempts = 0
-        while attempts < MAX_RECONNECT_ATTEMPTS:
-            try:
-                listener = MessageListener(callback)
-                mq_conn.subscribe(topic, listener)
-                while mq_conn.conn and mq_conn.conn.is_connected():
-                    time.sleep(1)
-                logger.warning("Subscription loop exited, reconnecting...")
-            except Exception as e:
-                attempts += 1
-                logger.error(f"Subscription error for {topic}, attempt {attempts}: {str(e)}")
-                if attempts == MAX_RECONNECT_ATTEMPTS:
-                    logger.error(f"Max subscription attempts reached for {topic}. Disabling ActiveMQ.")
-                    mq_conn.disable()
-                    break
-                time.sleep(5)
-
-    threading.Thread(target=run_subscription, daemon=True).start()
-
-# Handle book purchase messages
-def handle_book_purchase_message(message: str):
-    try:
-        data = json.loads(message)
-        if data.get("event") == "book_purchase":
-            logger.info(f"Processed book purchase: userId={data['userId']}, bookId={data['bookId']}")
-    except json.JSONDecodeError:
-        logger.error(f"Invalid JSON message: {message}")
-
-# Start subscription
-subscribe_to_topic("/topic/book-purchases", handle_book_purchase_message)
+    if transaction_id is not None:
+        transaction_cache.invalidate_transaction(transaction_id)
+    for user_id in set(str(u) for u in user_ids if u is not None):
+        transaction_cache.invalidate_user(user_id)
+
+# Validate a transaction payload; returns an error message or None
+def validate_transaction(data):
+    if not isinstance(data, dict):
+        return 'Each transaction must be a JSON object'
+    if not all([data.get('userId'), data.get('bookId'), data.get('transactionType')]):
+        return 'userId, bookId, and transactionType are required'
+    for field in ('userId', 'bookId'):
+        # bool is an int subclass, and the column would take True as 1
+        value = data[field]
+        if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+            return f'{field} must be a positive integer'
+    if data.get('transactionType') not in ['BORROW', 'PURCHASE']:
+        return 'transactionType must be BORROW or PURCHASE'
+    return None
 
 # Create a new transaction
 @app.route('/transactions', methods=['POST'])
@@ -240,28 +66,35 @@ def create_transaction():
     try:
         data = request.get_json()
         logger.debug(f'Request data: {data}')
+        error = validate_transaction(data)
+        if error:
+            logger.warning(f'Invalid transaction request: {error}')
+            return jsonify({'error': error}), 400
         user_id = data.get('userId')
         book_id = data.get('bookId')
         transaction_type = data.get('transactionType')
 
-        if not all([user_id, book_id, transaction_type]):
-            logger.warning('Missing required fields in request')
-            return jsonify({'error': 'userId, bookId, and transactionType are required'}), 400
-
-        if transaction_type not in ['BORROW', 'PURCHASE']:
-            logger.warning(f'Invalid transactionType: {transaction_type}')
-            return jsonify({'error': 'transactionType must be BORROW or PURCHASE'}), 400
-
-        db = get_db_connection()
-        query = """
-            INSERT INTO transactions (user_id, book_id, transaction_type)
-            VALUES (%s, %s, %s)
-        """
-        transaction_id = db.insert(query, (user_id, book_id, transaction_type))
+        if group_committer:
+            try:
+                transaction_id = group_committer.submit((user_id, book_id, transaction_type), timeout=Config.GROUP_COMMIT_TIMEOUT)
+            except TimeoutError:
+                # The row may still be committed by a late flush; the client cannot know, so it must not assume either
+                logger.error(f'Group commit did not finish within {Config.GROUP_COMMIT_TIMEOUT}s')
+                return jsonify({'error': 'Timed out waiting for the database'}), 503
+        else:
+            db = get_db_connection()
+            try:
+                with db.transaction():
+                    transaction_id = db.insert(queries.INSERT_TRANSACTION, (user_id, book_id, transaction_type))
+                    if messaging.outbox_relay:
+                        messaging.write_outbox(db, [(user_id, book_id, transaction_type)])
+            finally:
+                db.close()
         logger.info(f'Transaction created with ID: {transaction_id}')
-        db.close()
+        invalidate_cache(user_ids=[user_id])
 
-        send_book_purchase_event(str(user_id), book_id, transaction_type)
+        if not messaging.outbox_relay:
+            messaging.send_book_purchase_event(str(user_id), book_id, transaction_type)
 
         logger.debug("Preparing response")
         response = jsonify({
@@ -278,74 +111,254 @@ def create_transaction():
         logger.error(f'Server error while creating transaction: {str(e)}')
         return jsonify({'error': f'Server error: {str(e)}'}), 500
 
-# Get all transactions
+# Create many transactions in one database transaction
+@app.route('/transactions/batch', methods=['POST'])
+def create_transactions_batch():
+    logger.info('Received POST request to create a batch of transactions')
+    try:
+        data = request.get_json()
+        if not isinstance(data, list) or not data:
+            logger.warning('Batch request body is not a non-empty array')
+            return jsonify({'error': 'Request body must be a non-empty array of transactions'}), 400
+        if len(data) > Config.BATCH_MAX_ITEMS:
+            logger.warning(f'Batch of {len(data)} exceeds limit of {Config.BATCH_MAX_ITEMS}')
+            return jsonify({'error': f'At most {Config.BATCH_MAX_ITEMS} transactions per batch'}), 400
+
+        results = [None] * len(data)
+        valid = []
+        for index, item in enumerate(data):
+            error = validate_transaction(item)
+            if error:
+                results[index] = {'index': index, 'status': 400, 'error': error}
+            else:
+                valid.append((index, (item['userId'], item['bookId'], item['transactionType'])))
+
+        if valid:
+            rows = [row for _, row in valid]
+            db = get_db_connection()
+            try:
+                with db.transaction():
+                    ids = db.insert_many(queries.INSERT_TRANSACTION, rows)
+                    if messaging.outbox_relay:
+                        messaging.write_outbox(db, rows)
+            finally:
+                db.close()
+
+            for (index, (user_id, book_id, transaction_type)), transaction_id in zip(valid, ids):
+                results[index] = {
+                    'index': index,
+                    'status': 201,
+                    'id': transaction_id,
+                    'userId': user_id,
+                    'bookId': book_id,
+                    'transactionType': transaction_type
+                }
+            invalidate_cache(user_ids=[row[0] for row in rows])
+            if not messaging.outbox_relay:
+                messaging.send_book_purchase_events([(str(user_id), book_id, transaction_type) for user_id, book_id, transaction_type in rows])
+
+        created = len(valid)
+        failed = len(data) - created
+        logger.info(f'Batch processed: {created} created, {failed} rejected')
+        status = 201 if failed == 0 else 207 if created else 400
+        return jsonify({'created': created, 'failed': failed, 'results': results}), status
+
+    except Exception as e:
+        logger.error(f'Server error while creating transaction batch: {str(e)}')
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
+# Build a response from an already serialized JSON body
+def json_response(body, next_cursor=None, limit=None, etag=None):
+    response = Response(body, mimetype='application/json')
+    if next_cursor:
+        set_next_cursor(response, next_cursor, limit)
+    if etag:
+        response.set_etag(etag)
+    return response
+
+# Strong ETags derived from row versions rather than from the response body
+def transaction_etag(transaction_id, updated_at):
+    if updated_at is None:
+        return None
+    return f"t{transaction_id}-{updated_at.strftime('%Y%m%d%H%M%S%f')}"
+
+def user_etag(user_id, version):
+    # Row count catches deletes, max id catches inserts, max updated_at catches updates
+    max_updated = version['max_updated'].strftime('%Y%m%d%H%M%S%f') if version['max_updated'] else '0'
+    return f"u{user_id}-{version['row_count']}-{version['max_id'] or 0}-{max_updated}"
+
+def not_modified(etag):
+    response = Response(status=304)
+    response.set_etag(etag)
+    return response
+
+# Attach the next-page cursor to a listing response
+def set_next_cursor(response, cursor, limit):
+    response.headers['X-Next-Cursor'] = cursor
+    next_url = url_for(request.endpoint, **request.view_args, cursor=cursor, limit=limit)
+    response.headers['Link'] = f'<{next_url}>; rel="next"'
+    return response
+
+# Get all transactions (keyset paginated on id)
 @app.route('/transactions', methods=['GET'])
 def get_all_transactions():
     logger.info('Received GET request to fetch all transactions')
+    try:
+        limit = parse_limit(request.args.get('limit'))
+        cursor = request.args.get('cursor')
+        after_id = decode_cursor(cursor)[0] if cursor else None
+    except PaginationError as e:
+        logger.warning(f'Invalid pagination parameters: {str(e)}')
+        return jsonify({'error': str(e)}), 400
+
     try:
         db = get_db_connection()
-        transactions = db.select('SELECT * FROM transactions')
+        try:
+            if after_id is None:
+                transactions = db.select_rows(queries.LIST_TRANSACTIONS, (limit + 1,))
+            else:
+                transactions = db.select_rows(queries.LIST_TRANSACTIONS_AFTER, (after_id, limit + 1))
+        finally:
+            db.close()
+        transactions, has_more = split_page(transactions, limit)
         logger.info(f'Fetched {len(transactions)} transactions')
-        db.close()
-
-        for transaction in transactions:
-            transaction['userId'] = transaction.pop('user_id')
-            transaction['bookId'] = transaction.pop('book_id')
-            transaction['transactionType'] = transaction.pop('transaction_type')
-            transaction['transactionDate'] = transaction['transaction_date'].isoformat()
 
-        return jsonify(transactions), 200
+        next_cursor = encode_cursor(transactions[-1][0]) if has_more else None
+        return json_response(serialize_transactions(transactions), next_cursor, limit), 200
 
     except Exception as e:
         logger.error(f'Server error while fetching transactions: {str(e)}')
         return jsonify({'error': f'Server error: {str(e)}'}), 500
 
+# Export all transactions as newline-delimited JSON
+@app.route('/transactions/export', methods=['GET'])
+def export_transactions():
+    logger.info('Received GET request to export all transactions')
+    try:
+        db = get_db_connection()
+    except Exception as e:
+        logger.error(f'Server error while exporting transactions: {str(e)}')
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
+    def generate():
+        exported = 0
+        try:
+            for rows in db.stream(queries.EXPORT_TRANSACTIONS, chunk_size=Config.EXPORT_CHUNK_SIZE):
+                exported += len(rows)
+                yield serialize_ndjson(rows)
+            logger.info(f'Exported {exported} transactions')
+        except Exception as e:
+            logger.error(f'Export aborted after {exported} transactions: {str(e)}')
+            raise
+
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    response.headers['X-Accel-Buffering'] = 'no'
+    # Runs even if the client disconnects before the first chunk
+    response.call_on_close(db.close)
+    return response
+
 # Get a transaction by ID
 @app.route('/transactions/<int:id>', methods=['GET'])
 def get_transaction(id):
     logger.info(f'Received GET request to fetch transaction with ID: {id}')
     try:
+        cache_key = transaction_cache.transaction_key(id) if transaction_cache else None
+        cached = transaction_cache.get(cache_key) if cache_key else None
+
         db = get_db_connection()
-        transaction = db.select_one('SELECT * FROM transactions WHERE id = %s', (id,))
-        db.close()
+        try:
+            if cached:
+                # Every worker has its own cache and only sees its own writes, so
+                # a cached copy is served only while the row version still matches
+                body, _, etag = cached
+                version = db.select_one(queries.GET_TRANSACTION_VERSION, (id,))
+                if etag and version and transaction_etag(id, version['updated_at']) == etag:
+                    if etag in request.if_none_match:
+                        logger.info(f'Transaction with ID {id} not modified')
+                        return not_modified(etag)
+                    logger.info(f'Transaction with ID {id} served from cache')
+                    return json_response(body, etag=etag), 200
+            transaction = db.select_row(queries.GET_TRANSACTION, (id,))
+        finally:
+            db.close()
 
         if not transaction:
             logger.warning(f'Transaction with ID {id} not found')
             return jsonify({'error': 'Transaction not found'}), 404
 
-        transaction['userId'] = transaction.pop('user_id')
-        transaction['bookId'] = transaction.pop('book_id')
-        transaction['transactionType'] = transaction.pop('transaction_type')
-        transaction['transactionDate'] = transaction['transaction_date'].isoformat()
+        # The row carries its own version, so an unchanged poll skips serialization
+        etag = transaction_etag(id, transaction[5])
+        if etag and etag in request.if_none_match:
+            logger.info(f'Transaction with ID {id} not modified')
+            return not_modified(etag)
 
         logger.info(f'Transaction with ID {id} fetched successfully')
-        return jsonify(transaction), 200
+        body = serialize_transaction(transaction)
+        if cache_key:
+            transaction_cache.set(cache_key, body, etag=etag)
+        return json_response(body, etag=etag), 200
 
     except Exception as e:
         logger.error(f'Server error while fetching transaction {id}: {str(e)}')
         return jsonify({'error': f'Server error: {str(e)}'}), 500
 
-# Get transactions by user ID
+# Get transactions by user ID (keyset paginated on transaction_date, id)
 @app.route('/transactions/user/<int:user_id>', methods=['GET'])
 def get_transactions_by_user(user_id):
     logger.info(f'Received GET request to fetch transactions for user ID: {user_id}')
     try:
-        db = get_db_connection()
-        transactions = db.select('SELECT * FROM transactions WHERE user_id = %s', (user_id,))
-        db.close()
+        limit = parse_limit(request.args.get('limit'))
+        cursor = request.args.get('cursor')
+        after_id, after_date = decode_cursor(cursor) if cursor else (None, None)
+        if cursor and after_date is None:
+            raise PaginationError('Invalid cursor')
+    except PaginationError as e:
+        logger.warning(f'Invalid pagination parameters: {str(e)}')
+        return jsonify({'error': str(e)}), 400
 
-        if not transactions:
-            logger.info(f'No transactions found for user ID: {user_id}')
-            return jsonify([]), 200
+    try:
+        cache_key = transaction_cache.user_page_key(user_id, cursor, limit) if transaction_cache else None
+        cached = transaction_cache.get(cache_key) if cache_key else None
+
+        db = get_db_connection()
+        try:
+            # Read the version before the rows: a write in between can only make
+            # the ETag older than the body, which costs one extra download at most
+            version = db.select_one(queries.USER_TRANSACTIONS_VERSION, (user_id,))
+            etag = user_etag(user_id, version)
+            if etag in request.if_none_match:
+                logger.info(f'Transactions for user ID {user_id} not modified')
+                return not_modified(etag)
+            # Writes handled by other workers do not invalidate this worker's
+            # cache, so a cached page is only served under the current version
+            if cached and cached[2] == etag:
+                logger.info(f'Transactions for user ID {user_id} served from cache')
+                return json_response(cached[0], cached[1], limit, etag), 200
+
+            if after_id is None:
+                transactions = db.select_rows(queries.LIST_USER_TRANSACTIONS, (user_id, limit + 1))
+            else:
+                transactions = db.select_rows(
+                    queries.LIST_USER_TRANSACTIONS_AFTER,
+                    (user_id, after_date, after_date, after_id, limit + 1)
+                )
+        finally:
+            db.close()
 
-        for transaction in transactions:
-            transaction['userId'] = transaction.pop('user_id')
-            transaction['bookId'] = transaction.pop('book_id')
-            transaction['transactionType'] = transaction.pop('transaction_type')
-            transaction['transactionDate'] = transaction['transaction_date'].isoformat()
+        transactions, has_more = split_page(transactions, limit)
+        next_cursor = None
+        if has_more:
+            last = transactions[-1]
+            next_cursor = encode_cursor(last[0], last[4])
 
-        logger.info(f'Fetched {len(transactions)} transactions for user ID: {user_id}')
-        return jsonify(transactions), 200
+        if transactions:
+            logger.info(f'Fetched {len(transactions)} transactions for user ID: {user_id}')
+        else:
+            logger.info(f'No transactions found for user ID: {user_id}')
+        body = serialize_transactions(transactions)
+        if cache_key:
+            transaction_cache.set(cache_key, body, next_cursor, etag)
+        return json_response(body, next_cursor, limit, etag), 200
 
     except Exception as e:
         logger.error(f'Server error while fetching transactions for user {user_id}: {str(e)}')
@@ -358,32 +371,32 @@ def update_transaction(id):
     try:
         data = request.get_json()
         logger.debug(f'Request data: {data}')
+        error = validate_transaction(data)
+        if error:
+            logger.warning(f'Invalid transaction request: {error}')
+            return jsonify({'error': error}), 400
         user_id = data.get('userId')
         book_id = data.get('bookId')
         transaction_type = data.get('transactionType')
 
-        if not all([user_id, book_id, transaction_type]):
-            logger.warning('Missing required fields in request')
-            return jsonify({'error': 'userId, bookId, and transactionType are required'}), 400
-
-        if transaction_type not in ['BORROW', 'PURCHASE']:
-            logger.warning(f'Invalid transactionType: {transaction_type}')
-            return jsonify({'error': 'transactionType must be BORROW or PURCHASE'}), 400
-
         db = get_db_connection()
-        query = """
+        try:
+            # The previous owner's cached listing must be dropped as well
+            previous = db.select_one(queries.GET_TRANSACTION_OWNER, (id,)) if transaction_cache else None
+            query = """
             UPDATE transactions
             SET user_id = %s, book_id = %s, transaction_type = %s
             WHERE id = %s
         """
-        row_count = db.update(query, (user_id, book_id, transaction_type, id))
+            row_count = db.update(query, (user_id, book_id, transaction_type, id))
+        finally:
+            db.close()
 
         if row_count == 0:
-            db.close()
             logger.warning(f'Transaction with ID {id} not found for update')
             return jsonify({'error': 'Transaction not found'}), 404
 
-        db.close()
+        invalidate_cache(id, [user_id, previous['user_id'] if previous else None])
         logger.info(f'Transaction with ID {id} updated successfully')
         return jsonify({'message': 'Transaction updated'}), 200
 
@@ -397,14 +410,17 @@ def delete_transaction(id):
     logger.info(f'Received DELETE request to delete transaction with ID: {id}')
     try:
         db = get_db_connection()
-        row_count = db.delete('DELETE FROM transactions WHERE id = %s', (id,))
+        try:
+            previous = db.select_one(queries.GET_TRANSACTION_OWNER, (id,)) if transaction_cache else None
+            row_count = db.delete('DELETE FROM transactions WHERE id = %s', (id,))
+        finally:
+            db.close()
 
         if row_count == 0:
-            db.close()
             logger.warning(f'Transaction with ID {id} not found for deletion')
             return jsonify({'error': 'Transaction not found'}), 404
 
-        db.close()
+        invalidate_cache(id, [previous['user_id'] if previous else None])
         logger.info(f'Transaction with ID {id} deleted successfully')
         return jsonify({'message': 'Transaction deleted'}), 200
 
@@ -412,6 +428,103 @@ def delete_transaction(id):
         logger.error(f'Server error while deleting transaction {id}: {str(e)}')
         return jsonify({'error': f'Server error: {str(e)}'}), 500
 
+# Most purchased (or borrowed) books, from the in-memory statistics
+@app.route('/transactions/stats/top-books', methods=['GET'])
+def get_top_books():
+    if not messaging.purchase_stats:
+        return jsonify({'error': 'Statistics are disabled'}), 404
+    try:
+        limit = parse_limit(request.args.get('limit'), default=10, maximum=Config.STATS_TOP_SIZE)
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+    by = request.args.get('by', 'purchases')
+    if by not in ORDERINGS:
+        return jsonify({'error': f"by must be one of: {', '.join(ORDERINGS)}"}), 400
+    return jsonify(messaging.purchase_stats.top_books(limit, by)), 200
+
+# Purchase and borrow counts of one user
+@app.route('/transactions/stats/user/<int:user_id>', methods=['GET'])
+def get_user_stats(user_id):
+    if not messaging.purchase_stats:
+        return jsonify({'error': 'Statistics are disabled'}), 404
+    return jsonify(messaging.purchase_stats.user(user_id)), 200
+
+# Purchase and borrow counts per day, most recent first
+@app.route('/transactions/stats/daily', methods=['GET'])
+def get_daily_stats():
+    if not messaging.purchase_stats:
+        return jsonify({'error': 'Statistics are disabled'}), 404
+    try:
+        days = parse_limit(request.args.get('days'), default=30, maximum=366, name='days')
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(messaging.purchase_stats.daily(days)), 200
+
+# Runtime metrics
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    metrics = {'db_pool': get_pool().stats()}
+    if group_committer:
+        metrics['group_commit'] = group_committer.metrics()
+    if transaction_cache:
+        metrics['cache'] = transaction_cache.stats()
+    metrics.update(messaging.metrics())
+    return jsonify(metrics), 200
+
+# Readiness: a worker serves /ready with 503 until its DB pool and messaging
+# are warm, so it only gets traffic once the first requests will not pay for
+# connection setup
+_ready = threading.Event()
+_stopping = threading.Event()
+
+@app.route('/ready', methods=['GET'])
+def get_readiness():
+    status = {
+        'ready': _ready.is_set(),
+        'db_pool': get_pool().stats(),
+        'broker': messaging.producer_conn.breaker.state
+    }
+    return jsonify(status), 200 if status['ready'] else 503
+
+# Open MYSQL_POOL_WARM connections (retrying until the database answers), then
+# start messaging, which loads the statistics rollup and connects to the broker
+def warm_up():
+    started = time.monotonic()
+    while not _stopping.is_set():
+        try:
+            get_pool().warm(Config.MYSQL_POOL_WARM)
+            break
+        except Exception as e:
+            logger.error(f'Database warm-up failed: {str(e)}')
+            _stopping.wait(Config.WARM_UP_RETRY)
+    if _stopping.is_set():
+        return
+    messaging.start()
+    _ready.set()
+    logger.info(f'Worker ready after {time.monotonic() - started:.2f}s of warm-up')
+
+# Per-process initialization for each serving process (see server.py). Returns
+# at once; warm-up runs in the background and flips /ready when done.
+def init_worker():
+    # Pooled sockets inherited from a parent process must not be shared
+    reset_pool()
+    _ready.clear()
+    _stopping.clear()
+    threading.Thread(target=warm_up, name='warm-up', daemon=True).start()
+
+# Per-process shutdown: stop taking traffic, then drain pending events
+def shutdown_worker():
+    _ready.clear()
+    _stopping.set()
+    messaging.stop()
+    get_pool().close()
+
 if __name__ == '__main__':
-    logger.info('Starting transactions-service on port 6000')
-    app.run(host='0.0.0.0', port=6000)
\ No newline at end of file
+    if Config.MIGRATE_ON_STARTUP:
+        migrate()
+    init_worker()
+    logger.info(f'Starting transactions-service on port {Config.PORT}')
+    try:
+        app.run(host='0.0.0.0', port=Config.PORT)
+    finally:
+        shutdown_worker()
@@ -0,0 +1,38 @@
+"""Size and encode/decode rate of book purchase events as JSON versus protobuf.
+
+Run from the service directory:
+    python benchmarks/event_formats.py [events] [repeat]
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from events import encode_book_purchase, decode_event
+
+def make_events(count):
+    return [(str(1000 + i % 500), i % 2000, 'BORROW' if i % 3 else 'PURCHASE') for i in range(count)]
+
+def encode_all(events, event_format):
+    return [encode_book_purchase(user_id, book_id, kind, event_format) for user_id, book_id, kind in events]
+
+def decode_all(messages):
+    return [decode_event(body, content_type) for body, content_type in messages]
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    events = make_events(count)
+
+    print(f'events: {count}')
+    for event_format in ('json', 'protobuf'):
+        messages = encode_all(events, event_format)
+        size = sum(len(body) for body, _ in messages) / count
+        encode_time = min(timeit.repeat(lambda: encode_all(events, event_format), number=1, repeat=repeat))
+        decode_time = min(timeit.repeat(lambda: decode_all(messages), number=1, repeat=repeat))
+        print(f'{event_format:>8}: {size:6.1f} bytes/event  '
+              f'encode {count / encode_time:10,.0f}/sec  decode {count / decode_time:10,.0f}/sec')
+
+if __name__ == '__main__':
+    main()
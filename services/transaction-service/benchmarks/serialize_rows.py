@@ -0,0 +1,54 @@
+"""Rows/sec of the old dict-rename-jsonify path versus serializers.py.
+
+Run from the service directory:
+    python benchmarks/serialize_rows.py [rows] [repeat]
+"""
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, jsonify
+from serializers import serialize_transactions
+
+def make_rows(count):
+    start = datetime(2025, 1, 1)
+    return [
+        (i, 1000 + i % 500, i % 2000, 'BORROW' if i % 3 else 'PURCHASE', start + timedelta(seconds=i))
+        for i in range(1, count + 1)
+    ]
+
+def as_dicts(rows):
+    keys = ('id', 'user_id', 'book_id', 'transaction_type', 'transaction_date')
+    return [dict(zip(keys, row)) for row in rows]
+
+def legacy(app, rows):
+    # What the routes did before: dict cursor rows renamed in Python, then jsonify
+    transactions = as_dicts(rows)
+    with app.app_context():
+        for transaction in transactions:
+            transaction['userId'] = transaction.pop('user_id')
+            transaction['bookId'] = transaction.pop('book_id')
+            transaction['transactionType'] = transaction.pop('transaction_type')
+            transaction['transactionDate'] = transaction['transaction_date'].isoformat()
+        return jsonify(transactions).get_data()
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    rows = make_rows(count)
+    app = Flask(__name__)
+
+    # The dict conversion stands in for the dictionary cursor and is timed with the legacy path
+    legacy_time = min(timeit.repeat(lambda: legacy(app, rows), number=1, repeat=repeat))
+    fast_time = min(timeit.repeat(lambda: serialize_transactions(rows), number=1, repeat=repeat))
+
+    print(f'rows: {count}')
+    print(f'legacy (dict + rename + jsonify): {count / legacy_time:12,.0f} rows/sec')
+    print(f'serializers.serialize_transactions: {count / fast_time:10,.0f} rows/sec')
+    print(f'speedup: {legacy_time / fast_time:.1f}x')
+
+if __name__ == '__main__':
+    main()
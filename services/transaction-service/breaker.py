@@ -0,0 +1,91 @@
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+class CircuitOpenError(Exception):
+    def __init__(self, name, retry_after):
+        super().__init__(f'{name} circuit is open; next attempt in {retry_after:.1f}s')
+        self.retry_after = retry_after
+
+# Circuit breaker for a remote dependency.
+# Closed: calls go through; `threshold` failures in a row open the circuit.
+# Open: calls fail fast with CircuitOpenError until the backoff has elapsed.
+# Half-open: a single probe call is let through; success closes the circuit,
+# failure opens it again with the backoff doubled (up to max_backoff). Each
+# backoff is jittered so that many processes do not probe in lockstep.
+class CircuitBreaker:
+    def __init__(self, name, threshold, base_backoff, max_backoff):
+        self.name = name
+        self.threshold = threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.state = CLOSED
+        self.failures = 0
+        self._opens = 0  # Consecutive opens without a success, drives the backoff
+        self._probe_at = 0.0
+        self._lock = threading.Lock()
+        self.total_opens = 0
+        self.rejected = 0
+
+    def allow(self):
+        # Raises CircuitOpenError unless the call may go ahead
+        if self.state == CLOSED:
+            return
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            now = time.monotonic()
+            if self.state == OPEN and now >= self._probe_at:
+                self.state = HALF_OPEN
+                logger.info(f'{self.name} circuit half-open, probing')
+                return
+            self.rejected += 1
+            # While a probe is in flight, check back after the shortest backoff
+            retry_after = self._probe_at - now if self.state == OPEN else self.base_backoff
+            raise CircuitOpenError(self.name, retry_after)
+
+    def record_success(self):
+        if self.state == CLOSED and not self.failures:
+            return
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info(f'{self.name} circuit closed')
+            self.state = CLOSED
+            self.failures = 0
+            self._opens = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.threshold):
+                self._open()
+
+    def is_closed(self):
+        return self.state == CLOSED
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'failures': self.failures,
+                'opens': self.total_opens,
+                'rejected': self.rejected,
+                'retry_after': max(self._probe_at - time.monotonic(), 0.0) if self.state == OPEN else 0.0
+            }
+
+    def _open(self):
+        backoff = min(self.base_backoff * 2 ** self._opens, self.max_backoff)
+        # Equal jitter: wait at least half the backoff, at most all of it
+        delay = backoff / 2 + random.uniform(0, backoff / 2)
+        self._opens += 1
+        self.total_opens += 1
+        self.state = OPEN
+        self._probe_at = time.monotonic() + delay
+        logger.warning(f'{self.name} circuit open after {self.failures} failures; probing again in {delay:.1f}s')
@@ -0,0 +1,147 @@
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from config import Config
+
+# Interface for cache storage; callers pass each value's size in bytes
+class CacheBackend:
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value, size=None):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def stats(self):
+        return {}
+
+# In-process LRU bounded by entry count and total bytes, with a per-entry TTL
+class LRUCache(CacheBackend):
+    def __init__(self, max_entries=None, max_bytes=None, ttl=None):
+        self.max_entries = max_entries or Config.CACHE_MAX_ENTRIES
+        self.max_bytes = max_bytes or Config.CACHE_MAX_BYTES
+        self.ttl = ttl if ttl is not None else Config.CACHE_TTL
+        self._entries = OrderedDict()  # key -> (value, size, expires_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, _, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, size=None):
+        size = len(value) if size is None else size
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, time.monotonic() + self.ttl)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'entries': len(self._entries),
+                'bytes': self._bytes
+            }
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+# Read-through cache for the transaction read routes.
+# Every key embeds a generation for its scope (one transaction, or all pages of
+# one user). Invalidating a scope moves it to a new generation, so its entries
+# go stale at once without tracking individual page keys. Callers build the key
+# before reading the database and store under that same key afterwards: if a
+# write invalidates the scope in between, the late result lands under the old
+# generation and is never served.
+class TransactionCache:
+    def __init__(self, backend=None, generations=None):
+        self.backend = backend or LRUCache()
+        self.generations = generations or LRUCache(max_entries=self.backend.max_entries * 2)
+        self._counter = itertools.count(1)
+        self._counter_lock = threading.Lock()
+
+    def transaction_key(self, transaction_id):
+        scope = ('transaction', int(transaction_id))
+        return scope + (self._generation(scope),)
+
+    def user_page_key(self, user_id, cursor, limit):
+        scope = ('user', str(user_id))
+        return scope + (self._generation(scope), cursor or '', limit)
+
+    # Cached values are (body, next_cursor, etag) of an already serialized response
+    def get(self, key):
+        return self.backend.get(key)
+
+    def set(self, key, body, next_cursor=None, etag=None):
+        size = len(body) + len(next_cursor or '') + len(etag or '')
+        self.backend.set(key, (body, next_cursor, etag), size=size)
+
+    def invalidate_transaction(self, transaction_id):
+        self.generations.set(('transaction', int(transaction_id)), self._next_generation())
+
+    def invalidate_user(self, user_id):
+        self.generations.set(('user', str(user_id)), self._next_generation())
+
+    def clear(self):
+        self.backend.clear()
+        self.generations.clear()
+
+    def stats(self):
+        return self.backend.stats()
+
+    def _next_generation(self):
+        with self._counter_lock:
+            return str(next(self._counter)).encode()
+
+    def _generation(self, scope):
+        generation = self.generations.get(scope)
+        if generation is None:
+            # Unknown or evicted scope: start a fresh generation, which also
+            # orphans anything cached under an earlier one
+            generation = self._next_generation()
+            self.generations.set(scope, generation)
+        return generation
@@ -7,4 +7,75 @@ class Config:
     MYSQL_HOST = os.getenv('MYSQL_HOST', 'localhost')
     MYSQL_USER = os.getenv('MYSQL_USER', 'springstudent')
     MYSQL_PASSWORD = os.getenv('MYSQL_PASSWORD', 'springstudent')
-    MYSQL_DB = os.getenv('MYSQL_DB', 'Transactions')
\ No newline at end of file
+    MYSQL_DB = os.getenv('MYSQL_DB', 'Transactions')
+
+    # Connection pool
+    MYSQL_POOL_SIZE = int(os.getenv('MYSQL_POOL_SIZE', '10'))
+    MYSQL_POOL_TIMEOUT = float(os.getenv('MYSQL_POOL_TIMEOUT', '5'))  # Seconds to wait for a free connection
+    MYSQL_POOL_RECYCLE = int(os.getenv('MYSQL_POOL_RECYCLE', '1800'))  # Max connection age in seconds
+    MYSQL_POOL_WARM = int(os.getenv('MYSQL_POOL_WARM', '2'))  # Connections opened before a worker reports ready
+
+    # Pagination
+    PAGE_SIZE_DEFAULT = int(os.getenv('PAGE_SIZE_DEFAULT', '50'))
+    PAGE_SIZE_MAX = int(os.getenv('PAGE_SIZE_MAX', '500'))
+
+    # Streaming export
+    EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', '1000'))
+
+    # Batch ingest
+    BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', '1000'))
+
+    # Group commit for single-row inserts (opt-in)
+    GROUP_COMMIT_ENABLED = os.getenv('GROUP_COMMIT_ENABLED', 'false').lower() == 'true'
+    GROUP_COMMIT_WINDOW_MS = float(os.getenv('GROUP_COMMIT_WINDOW_MS', '5'))
+    GROUP_COMMIT_MAX_BATCH = int(os.getenv('GROUP_COMMIT_MAX_BATCH', '100'))
+    GROUP_COMMIT_TIMEOUT = float(os.getenv('GROUP_COMMIT_TIMEOUT', '5'))  # Seconds a request waits for its flush
+
+    # Schema
+    MIGRATE_ON_STARTUP = os.getenv('MIGRATE_ON_STARTUP', 'true').lower() == 'true'
+
+    # Read-through cache for transaction lookups
+    CACHE_ENABLED = os.getenv('CACHE_ENABLED', 'true').lower() == 'true'
+    CACHE_TTL = float(os.getenv('CACHE_TTL', '30'))  # Seconds
+    CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', '10000'))
+    CACHE_MAX_BYTES = int(os.getenv('CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+
+    # Serving
+    PORT = int(os.getenv('PORT', '6000'))
+    WEB_WORKERS = int(os.getenv('WEB_WORKERS', '0'))  # 0 = one per available CPU
+    WEB_THREADS = int(os.getenv('WEB_THREADS', '4'))
+    WEB_TIMEOUT = int(os.getenv('WEB_TIMEOUT', '30'))  # Seconds
+    WEB_MAX_REQUESTS = int(os.getenv('WEB_MAX_REQUESTS', '10000'))  # Recycle a worker after this many requests
+    WEB_MAX_REQUESTS_JITTER = int(os.getenv('WEB_MAX_REQUESTS_JITTER', '1000'))
+    WARM_UP_RETRY = float(os.getenv('WARM_UP_RETRY', '2'))  # Seconds between warm-up attempts
+
+    # On-disk spool for events the broker cannot take
+    MQ_SPOOL_DIR = os.getenv('MQ_SPOOL_DIR', 'spool')
+    MQ_SPOOL_SEGMENT_BYTES = int(os.getenv('MQ_SPOOL_SEGMENT_BYTES', str(16 * 1024 * 1024)))
+    MQ_SPOOL_MAX_BYTES = int(os.getenv('MQ_SPOOL_MAX_BYTES', str(1024 * 1024 * 1024)))
+    MQ_SPOOL_FSYNC_EVERY = int(os.getenv('MQ_SPOOL_FSYNC_EVERY', '100'))  # Records per fsync
+    MQ_SPOOL_FSYNC_MS = float(os.getenv('MQ_SPOOL_FSYNC_MS', '50'))  # Max age of an unsynced record
+
+    # Transactional outbox for purchase events
+    OUTBOX_ENABLED = os.getenv('OUTBOX_ENABLED', 'true').lower() == 'true'
+    OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', '500'))
+    OUTBOX_POLL_MS = float(os.getenv('OUTBOX_POLL_MS', '100'))  # Idle wait between polls
+    OUTBOX_RETENTION = int(os.getenv('OUTBOX_RETENTION', '3600'))  # Seconds to keep sent rows
+
+    # Event consumer; 0 workers handles messages inline, one at a time
+    MQ_CONSUMER_WORKERS = int(os.getenv('MQ_CONSUMER_WORKERS', '4'))
+    MQ_CONSUMER_PREFETCH = int(os.getenv('MQ_CONSUMER_PREFETCH', '200'))  # Unacked messages the broker may push
+    MQ_ACK_BATCH = int(os.getenv('MQ_ACK_BATCH', '50'))
+    MQ_ACK_INTERVAL_MS = float(os.getenv('MQ_ACK_INTERVAL_MS', '20'))
+
+    # Seconds a stopping worker spends publishing queued events; the rest are spooled
+    MQ_DRAIN_TIMEOUT = float(os.getenv('MQ_DRAIN_TIMEOUT', '10'))
+
+    # Purchase statistics built from the event stream
+    STATS_ENABLED = os.getenv('STATS_ENABLED', 'true').lower() == 'true'
+    STATS_FLUSH_INTERVAL = int(os.getenv('STATS_FLUSH_INTERVAL', '10'))  # Seconds per rollup window
+    STATS_TOP_SIZE = int(os.getenv('STATS_TOP_SIZE', '100'))  # Books kept in the top-books ranking
+    STATS_DEDUPE_SIZE = int(os.getenv('STATS_DEDUPE_SIZE', '100000'))  # Recent message ids remembered to drop redeliveries
+
+    # Wire format of published events: json or protobuf (see events.proto)
+    EVENT_FORMAT = os.getenv('EVENT_FORMAT', 'json')
@@ -0,0 +1,123 @@
+import logging
+import threading
+import time
+from queue import Queue, Empty
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Runs message handlers on a pool of worker threads instead of the STOMP
+# receiver thread. Each frame is decoded once with decode(frame) (default: its
+# body), then routed by key_func(event): every message with
+# the same key goes to the same worker, so per-key order is kept while
+# different keys are handled in parallel. Completed messages are acknowledged
+# by a separate thread in batches of up to ack_batch, or after ack_interval_ms.
+# Messages that are still in a worker queue when the connection drops are
+# redelivered by the broker, so handlers must tolerate duplicates.
+class KeyedWorkerPool:
+    def __init__(self, handler, key_func, ack, workers=None, ack_batch=None, ack_interval_ms=None, decode=None):
+        self.handler = handler
+        self.key_func = key_func
+        self.ack = ack
+        self.decode = decode or (lambda frame: frame.body)
+        self.workers = workers or Config.MQ_CONSUMER_WORKERS
+        self.ack_batch = ack_batch or Config.MQ_ACK_BATCH
+        self.ack_interval = (ack_interval_ms if ack_interval_ms is not None else Config.MQ_ACK_INTERVAL_MS) / 1000.0
+        self._queues = [Queue() for _ in range(self.workers)]
+        self._completed = Queue()
+        self._threads = []
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._received = 0
+        self._processed = 0
+        self._failed = 0
+        self._acked = 0
+        self._ack_batches = 0
+        self._ack_failures = 0
+        self._handle_total = 0.0
+
+    def start(self):
+        with self._start_lock:
+            if self._threads:
+                return
+            for index in range(self.workers):
+                self._threads.append(threading.Thread(target=self._work, args=(index,), name=f'consumer-{index}', daemon=True))
+            self._threads.append(threading.Thread(target=self._ack_loop, name='consumer-acks', daemon=True))
+            for thread in self._threads:
+                thread.start()
+
+    def submit(self, frame):
+        # Called on the receiver thread; decodes, picks the worker and hands off
+        with self._stats_lock:
+            self._received += 1
+        try:
+            event = self.decode(frame)
+        except Exception as e:
+            # Undecodable messages are acked straight away; a redelivery would fail again
+            logger.error(f'Could not decode message: {str(e)}')
+            with self._stats_lock:
+                self._processed += 1
+                self._failed += 1
+            self._completed.put(frame)
+            return
+        try:
+            key = self.key_func(event)
+        except Exception as e:
+            logger.warning(f'Could not read the routing key of a message: {str(e)}')
+            key = None
+        self._queues[hash(key) % self.workers].put((frame, event))
+
+    def stats(self):
+        with self._stats_lock:
+            processed = self._processed
+            return {
+                'workers': self.workers,
+                'received': self._received,
+                'processed': processed,
+                'failed': self._failed,
+                'acked': self._acked,
+                'ack_batches': self._ack_batches,
+                'ack_failures': self._ack_failures,
+                'in_flight': self._received - processed,
+                'max_worker_backlog': max(q.qsize() for q in self._queues),
+                'avg_handle_ms': self._handle_total / processed * 1000 if processed else 0.0
+            }
+
+    def _work(self, index):
+        queue = self._queues[index]
+        while True:
+            frame, event = queue.get()
+            started = time.monotonic()
+            failed = False
+            try:
+                self.handler(event)
+            except Exception as e:
+                # Same as the inline listener: log and ack, a redelivery would fail again
+                failed = True
+                logger.error(f'Error processing message: {str(e)}')
+            with self._stats_lock:
+                self._processed += 1
+                self._failed += failed
+                self._handle_total += time.monotonic() - started
+            self._completed.put(frame)
+
+    def _ack_loop(self):
+        while True:
+            batch = [self._completed.get()]
+            deadline = time.monotonic() + self.ack_interval
+            while len(batch) < self.ack_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._completed.get(timeout=remaining) if remaining > 0 else self._completed.get_nowait())
+                except Empty:
+                    break
+            try:
+                self.ack(batch)
+                with self._stats_lock:
+                    self._acked += len(batch)
+                    self._ack_batches += 1
+            except Exception as e:
+                with self._stats_lock:
+                    self._ack_failures += len(batch)
+                # Unacked messages are redelivered once the broker drops the old session
+                logger.error(f'Failed to ack {len(batch)} messages: {str(e)}')
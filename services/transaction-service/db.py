@@ -1,6 +1,10 @@
 import mysql.connector
 from config import Config
 import logging
+import threading
+import time
+from collections import deque, namedtuple
+from contextlib import contextmanager
 
 # Configure logging
 logging.basicConfig(
@@ -13,22 +17,187 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+class PoolTimeoutError(Exception):
+    pass
+
+# A physical connection together with the time it was opened
+PoolEntry = namedtuple('PoolEntry', ['conn', 'created_at'])
+
+def _connect():
+    return mysql.connector.connect(
+        host=Config.MYSQL_HOST,
+        user=Config.MYSQL_USER,
+        password=Config.MYSQL_PASSWORD,
+        database=Config.MYSQL_DB
+    )
+
+# Bounded, thread-safe MySQL connection pool
+class ConnectionPool:
+    def __init__(self, size=None, timeout=None, recycle=None, connect=None):
+        self.size = size or Config.MYSQL_POOL_SIZE
+        self.timeout = timeout if timeout is not None else Config.MYSQL_POOL_TIMEOUT
+        self.recycle = recycle if recycle is not None else Config.MYSQL_POOL_RECYCLE
+        self._connect = connect or _connect
+        self._idle = deque()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        # A slot is held for every checked-out connection, so at most `size` exist at once
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolTimeoutError(f'No database connection available within {self.timeout}s')
+        try:
+            while True:
+                with self._lock:
+                    entry = self._idle.pop() if self._idle else None
+                if entry is None:
+                    return self._open()
+                if time.monotonic() - entry.created_at > self.recycle:
+                    logger.info('Recycling database connection past its max age')
+                    self._discard(entry)
+                    continue
+                if not self._is_alive(entry):
+                    logger.warning('Discarding stale database connection')
+                    self._discard(entry)
+                    continue
+                return entry
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, entry, discard=False):
+        if discard:
+            self._discard(entry)
+            self._slots.release()
+            return
+        try:
+            # Never hand out a connection with someone else's uncommitted work
+            if entry.conn.in_transaction:
+                entry.conn.rollback()
+            with self._lock:
+                self._idle.append(entry)
+        except Exception as e:
+            logger.warning(f'Failed to return connection to pool: {str(e)}')
+            self._discard(entry)
+        finally:
+            self._slots.release()
+
+    def warm(self, count=None):
+        # Pre-open connections so the first requests skip the handshake
+        count = min(count or self.size, self.size)
+        entries = [self.acquire() for _ in range(count)]
+        for entry in entries:
+            self.release(entry)
+        return count
+
+    def close(self):
+        with self._lock:
+            entries = list(self._idle)
+            self._idle.clear()
+        for entry in entries:
+            self._discard(entry)
+
+    def stats(self):
+        with self._lock:
+            idle = len(self._idle)
+        return {'size': self.size, 'idle': idle}
+
+    def _open(self):
+        conn = self._connect()
+        logger.info('Opened new database connection')
+        return PoolEntry(conn, time.monotonic())
+
+    @staticmethod
+    def _is_alive(entry):
+        try:
+            return entry.conn.is_connected()
+        except Exception:
+            return False
+
+    @staticmethod
+    def _discard(entry):
+        try:
+            entry.conn.close()
+        except Exception as e:
+            logger.debug(f'Error closing discarded connection: {str(e)}')
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+    return _pool
+
+def reset_pool():
+    # Drop inherited connections, e.g. in a freshly forked worker
+    global _pool
+    with _pool_lock:
+        _pool = None
+
 class Database:
-    def __init__(self):
-        self.conn = mysql.connector.connect(
-            host=Config.MYSQL_HOST,
-            user=Config.MYSQL_USER,
-            password=Config.MYSQL_PASSWORD,
-            database=Config.MYSQL_DB
-        )
+    def __init__(self, pool=None):
+        self.pool = pool or get_pool()
+        self._entry = self.pool.acquire()
+        self._reusable = True
+        self.conn = self._entry.conn
         self.cursor = self.conn.cursor(dictionary=True)
-        logger.info('Successfully connected to the database')
+        self._row_cursor = None
+        self._in_transaction = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and self._entry is not None:
+            try:
+                self.conn.rollback()
+            except Exception as e:
+                logger.error(f'Rollback failed: {str(e)}')
+        self.close()
+        return False
+
+    @contextmanager
+    def transaction(self):
+        # Writes inside the block are committed together when it exits, or not at all
+        self._in_transaction = True
+        try:
+            yield self
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        finally:
+            self._in_transaction = False
+
+    def _commit(self):
+        if not self._in_transaction:
+            self.conn.commit()
 
     def insert(self, query, params):
         self.cursor.execute(query, params)
-        self.conn.commit()
+        self._commit()
         return self.cursor.lastrowid
 
+    def insert_many(self, query, params_list):
+        # mysql-connector rewrites INSERT ... VALUES into a single multi-row
+        # statement; everything is committed at once
+        self.cursor.executemany(query, params_list)
+        first_id = self.cursor.lastrowid
+        self._commit()
+        # A multi-row insert gets consecutive auto-increment ids starting at
+        # LAST_INSERT_ID() (auto_increment_increment is 1 on our servers)
+        return [first_id + offset for offset in range(len(params_list))]
+
+    def execute_many(self, query, params_list):
+        # Same multi-row rewrite as insert_many, for upserts and other writes without ids
+        self.cursor.executemany(query, params_list)
+        self._commit()
+        return self.cursor.rowcount
+
     def select(self, query, params=None):
         if params:
             self.cursor.execute(query, params)
@@ -40,21 +209,73 @@ class Database:
         self.cursor.execute(query, params)
         return self.cursor.fetchone()
 
+    # Tuple-returning variants for hot read paths: no per-row dict is built
+    def select_rows(self, query, params=None):
+        cursor = self._rows()
+        cursor.execute(query, params or ())
+        return cursor.fetchall()
+
+    def select_row(self, query, params):
+        cursor = self._rows()
+        cursor.execute(query, params)
+        return cursor.fetchone()
+
+    def _rows(self):
+        if self._row_cursor is None:
+            self._row_cursor = self.conn.cursor()
+        return self._row_cursor
+
+    def stream(self, query, params=None, chunk_size=1000):
+        # Unbuffered cursor: rows stay on the server socket until fetched, so
+        # memory is bounded by chunk_size rather than by the size of the result
+        cursor = self.conn.cursor(buffered=False)
+        exhausted = False
+        try:
+            cursor.execute(query, params or ())
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+            exhausted = True
+        finally:
+            if exhausted:
+                cursor.close()
+            else:
+                # Unread rows are still pending on the wire; drop the connection
+                # rather than draining a possibly huge result
+                self._reusable = False
+
     def update(self, query, params):
         self.cursor.execute(query, params)
-        self.conn.commit()
+        self._commit()
         return self.cursor.rowcount
 
     def delete(self, query, params):
         self.cursor.execute(query, params)
-        self.conn.commit()
+        self._commit()
+        return self.cursor.rowcount
+
+    def execute(self, query, params=None):
+        self.cursor.execute(query, params or ())
+        self._commit()
         return self.cursor.rowcount
 
     def close(self):
-        self.cursor.close()
-        self.conn.close()
-        logger.info('Database connection closed')
+        # Return the connection to the pool; safe to call more than once
+        if self._entry is None:
+            return
+        try:
+            if self._reusable:
+                self.cursor.close()
+                if self._row_cursor is not None:
+                    self._row_cursor.close()
+        except Exception as e:
+            logger.debug(f'Error closing cursor: {str(e)}')
+        finally:
+            self.pool.release(self._entry, discard=not self._reusable)
+            self._entry = None
 
 # Factory function to create a database instance
 def get_db_connection():
-    return Database()
\ No newline at end of file
+    return Database()
@@ -0,0 +1,52 @@
+import json
+import time
+from config import Config
+import events_pb2
+
+# Book purchase events travel as JSON (the default, which the other services
+# read) or as the BookPurchase protobuf from events.proto. The STOMP
+# content-type header says which; consumers decode either.
+JSON_CONTENT_TYPE = 'application/json'
+PROTOBUF_CONTENT_TYPE = 'application/x-protobuf'
+
+BOOK_PURCHASES_TOPIC = '/topic/book-purchases'
+
+def encode_book_purchase(user_id, book_id, transaction_type, event_format=None):
+    # Returns (body, content_type); the body is str for JSON and bytes for protobuf
+    if (event_format or Config.EVENT_FORMAT) == 'protobuf':
+        event = events_pb2.BookPurchase(
+            userId=str(user_id),
+            bookId=int(book_id),
+            transactionType=events_pb2.TransactionType.Value(transaction_type),
+            timestamp=int(time.time() * 1000)
+        )
+        return event.SerializeToString(), PROTOBUF_CONTENT_TYPE
+    body = json.dumps({
+        "event": "book_purchase",
+        "userId": user_id,
+        "bookId": book_id,
+        "transactionType": transaction_type,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    })
+    return body, JSON_CONTENT_TYPE
+
+def decode_event(body, content_type=None):
+    # Returns the event as the dict the JSON format carries
+    if content_type and content_type.split(';')[0].strip() == PROTOBUF_CONTENT_TYPE:
+        event = events_pb2.BookPurchase.FromString(body)
+        return {
+            "event": "book_purchase",
+            "userId": event.userId,
+            "bookId": event.bookId,
+            "transactionType": events_pb2.TransactionType.Name(event.transactionType),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(event.timestamp / 1000))
+        }
+    return json.loads(body)
+
+def decode_frame(frame):
+    # Also carries the broker's message-id, which a redelivery keeps, so
+    # handlers can drop duplicates
+    event = decode_event(frame.body, frame.headers.get('content-type'))
+    if isinstance(event, dict) and frame.headers.get('message-id'):
+        event['messageId'] = frame.headers['message-id']
+    return event
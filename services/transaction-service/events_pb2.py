@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# NO CHECKED-IN PROTOBUF GENCODE
+# source: events.proto
+# Protobuf Python Version: 5.27.2
+"""Generated protocol buffer code."""
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import runtime_version as _runtime_version
+from google.protobuf import symbol_database as _symbol_database
+from google.protobuf.internal import builder as _builder
+_runtime_version.ValidateProtobufRuntimeVersion(
+    _runtime_version.Domain.PUBLIC,
+    5,
+    27,
+    2,
+    '',
+    'events.proto'
+)
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0c\x65vents.proto\x12\x06\x65vents\"s\n\x0c\x42ookPurchase\x12\x0e\n\x06userId\x18\x01 \x01(\t\x12\x0e\n\x06\x62ookId\x18\x02 \x01(\x03\x12\x30\n\x0ftransactionType\x18\x03 \x01(\x0e\x32\x17.events.TransactionType\x12\x11\n\ttimestamp\x18\x04 \x01(\x03*M\n\x0fTransactionType\x12 \n\x1cTRANSACTION_TYPE_UNSPECIFIED\x10\x00\x12\n\n\x06\x42ORROW\x10\x01\x12\x0c\n\x08PURCHASE\x10\x02\x62\x06proto3')
+
+_globals = globals()
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'events_pb2', _globals)
+if not _descriptor._USE_C_DESCRIPTORS:
+  DESCRIPTOR._loaded_options = None
+  _globals['_TRANSACTIONTYPE']._serialized_start=141
+  _globals['_TRANSACTIONTYPE']._serialized_end=218
+  _globals['_BOOKPURCHASE']._serialized_start=24
+  _globals['_BOOKPURCHASE']._serialized_end=139
+# @@protoc_insertion_point(module_scope)
@@ -0,0 +1,138 @@
+import logging
+import threading
+import time
+from config import Config
+from db import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+class _Waiter:
+    __slots__ = ('params', 'enqueued_at', 'event', 'result', 'error')
+
+    def __init__(self, params):
+        self.params = params
+        self.enqueued_at = time.monotonic()
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+# Coalesces concurrent single-row inserts into one multi-row INSERT and one commit.
+# The first row to arrive opens a window; the batch is flushed when the window
+# closes or max_batch rows are waiting, whichever comes first. `on_flush(db,
+# rows, ids)`, if given, runs inside the same database transaction.
+# If the combined insert fails, each row is retried in a transaction of its
+# own, so one bad row does not fail the unrelated requests batched with it.
+class GroupCommitter:
+    def __init__(self, query, window_ms=None, max_batch=None, db_factory=None, on_flush=None):
+        self.query = query
+        self.on_flush = on_flush
+        self.window = (window_ms if window_ms is not None else Config.GROUP_COMMIT_WINDOW_MS) / 1000.0
+        self.max_batch = max_batch or Config.GROUP_COMMIT_MAX_BATCH
+        self._db_factory = db_factory or get_db_connection
+        self._pending = []
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._rows = 0
+        self._max_batch_seen = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._flush_total = 0.0
+        self._split_batches = 0
+
+    def submit(self, params, timeout=None):
+        # Blocks until the row is committed and returns its auto-increment id.
+        # On TimeoutError the row may still be committed by a late flush.
+        waiter = _Waiter(params)
+        with self._cond:
+            self._ensure_thread()
+            self._pending.append(waiter)
+            if len(self._pending) == 1 or len(self._pending) >= self.max_batch:
+                self._cond.notify()
+        if not waiter.event.wait(timeout):
+            raise TimeoutError('Timed out waiting for group commit')
+        if waiter.error is not None:
+            raise waiter.error
+        return waiter.result
+
+    def metrics(self):
+        with self._stats_lock:
+            batches = self._batches
+            return {
+                'batches': batches,
+                'rows': self._rows,
+                'avg_batch_size': self._rows / batches if batches else 0.0,
+                'max_batch_size': self._max_batch_seen,
+                'avg_wait_ms': self._wait_total / self._rows * 1000 if self._rows else 0.0,
+                'max_wait_ms': self._wait_max * 1000,
+                'avg_flush_ms': self._flush_total / batches * 1000 if batches else 0.0,
+                'split_batches': self._split_batches
+            }
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='group-commit', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                deadline = self._pending[0].enqueued_at + self.window
+                while len(self._pending) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._pending[:self.max_batch]
+                del self._pending[:self.max_batch]
+            self._flush(batch)
+
+    def _flush(self, batch):
+        started = time.monotonic()
+        try:
+            for waiter, row_id in zip(batch, self._insert([waiter.params for waiter in batch])):
+                waiter.result = row_id
+            logger.debug(f'Group commit flushed {len(batch)} rows')
+        except Exception as e:
+            if len(batch) == 1:
+                logger.error(f'Group commit of 1 row failed: {str(e)}')
+                batch[0].error = e
+            else:
+                logger.warning(f'Group commit of {len(batch)} rows failed, retrying each row: {str(e)}')
+                with self._stats_lock:
+                    self._split_batches += 1
+                for waiter in batch:
+                    try:
+                        waiter.result = self._insert([waiter.params])[0]
+                    except Exception as row_error:
+                        logger.error(f'Group commit row failed: {str(row_error)}')
+                        waiter.error = row_error
+        finally:
+            finished = time.monotonic()
+            self._record(batch, started, finished)
+            for waiter in batch:
+                waiter.event.set()
+
+    def _insert(self, rows):
+        db = self._db_factory()
+        try:
+            with db.transaction():
+                ids = db.insert_many(self.query, rows)
+                if self.on_flush:
+                    self.on_flush(db, rows, ids)
+            return ids
+        finally:
+            db.close()
+
+    def _record(self, batch, started, finished):
+        waits = [started - waiter.enqueued_at for waiter in batch]
+        with self._stats_lock:
+            self._batches += 1
+            self._rows += len(batch)
+            self._max_batch_seen = max(self._max_batch_seen, len(batch))
+            self._wait_total += sum(waits)
+            self._wait_max = max(self._wait_max, max(waits))
+            self._flush_total += finished - started
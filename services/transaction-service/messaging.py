@@ -0,0 +1,575 @@
+import logging
+import os
+import socket
+import threading
+import time
+from queue import Queue, Empty, Full
+from typing import Optional, Callable
+import stomp
+from breaker import CircuitBreaker, CircuitOpenError
+from config import Config
+from consumer import KeyedWorkerPool
+from events import BOOK_PURCHASES_TOPIC, JSON_CONTENT_TYPE, encode_book_purchase, decode_frame
+from outbox import OutboxRelay
+from spool import EventSpool
+from stats import PurchaseStats
+import queries
+
+logger = logging.getLogger(__name__)
+
+# ActiveMQ configuration
+BROKER_HOST = os.getenv("ACTIVEMQ_BROKER", "shared-activemq")
+BROKER_PORT = int(os.getenv("ACTIVEMQ_BROKER_PORT", "61616"))
+USERNAME = os.getenv("ACTIVEMQ_USERNAME", "admin")
+PASSWORD = os.getenv("ACTIVEMQ_PASSWORD", "admin")
+CONNECTION_TIMEOUT = 5  # Seconds
+MAX_RECONNECT_ATTEMPTS = 3
+MQ_BATCH_SIZE = int(os.getenv("MQ_BATCH_SIZE", "100"))  # Max messages per broker transaction
+MQ_LINGER_MS = float(os.getenv("MQ_LINGER_MS", "5"))  # How long to wait for a batch to fill
+MQ_QUEUE_MAX = int(os.getenv("MQ_QUEUE_MAX", "10000"))  # Events held in memory before spilling to disk
+MQ_BREAKER_BASE_BACKOFF = float(os.getenv("MQ_BREAKER_BASE_BACKOFF", "1"))  # Seconds before the first probe
+MQ_BREAKER_MAX_BACKOFF = float(os.getenv("MQ_BREAKER_MAX_BACKOFF", "60"))
+MQ_IDLE_WAIT = 1  # Seconds the sender waits for new events before checking the spool
+
+# Message queue for async sending; overflow goes to the on-disk spool
+message_queue = Queue(maxsize=MQ_QUEUE_MAX)
+event_spool = EventSpool()
+_enqueue_lock = threading.Lock()
+
+# Set by stop(); background loops finish their current step and exit
+_stopping = threading.Event()
+
+# Set by stop() once the drain deadline has passed: the sender takes nothing
+# more from the queue. It holds _take_lock while taking, so stop() can wait it
+# out before spooling what is left.
+_abandoned = threading.Event()
+_take_lock = threading.Lock()
+
+# Whoever finishes last between stop() and the sender closes the spool, since
+# a sender still publishing may have to spool its batch
+_handoff_lock = threading.Lock()
+_sender_done = False
+_spool_handed_off = False
+
+# ActiveMQ Connection Manager. Each instance owns one STOMP connection; the
+# producer and the consumer use separate instances so that neither side's
+# failures or reconnects disturb the other.
+class ActiveMQConnection:
+    def __init__(self, host: str, port: int, username: str, password: str, timeout: int, role: str = 'producer',
+                 auto_decode: bool = True):
+        self.role = role
+        self.auto_decode = auto_decode  # False hands message bodies over as bytes
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.conn = None
+        self.lock = threading.Lock()  # Guards (re)connecting
+        self.send_lock = threading.Lock()  # Guards writing a frame
+        # Fails calls fast while the broker is down and probes it with backoff
+        self.breaker = CircuitBreaker(f'ActiveMQ {role}', MAX_RECONNECT_ATTEMPTS, MQ_BREAKER_BASE_BACKOFF, MQ_BREAKER_MAX_BACKOFF)
+        self.connects = 0
+
+    def client_id(self):
+        # The broker rejects a second connection with the same client-id, so it
+        # names the role and the process (taken at connect time, after any fork)
+        return f'transaction-service-{self.role}-{socket.gethostname()}-{os.getpid()}'
+
+    def connect(self):
+        # Long-lived connection: reuse it while it is up, reconnect lazily once it drops
+        self.breaker.allow()
+        conn = self.conn
+        if not conn or not conn.is_connected():
+            conn = self._reconnect()
+        # Resolves the probe when the caller only connects (e.g. warm_up_broker);
+        # while closed, failures of later sends keep counting towards the threshold
+        if not self.breaker.is_closed():
+            self.breaker.record_success()
+        return conn
+
+    def _reconnect(self):
+        with self.lock:
+            if not self.conn or not self.conn.is_connected():
+                try:
+                    self.conn = stomp.Connection(
+                        [(self.host, self.port)],
+                        timeout=self.timeout,
+                        heartbeats=(10000, 10000),
+                        vhost=None,
+                        auto_decode=self.auto_decode
+                    )
+                    self.conn.set_listener('', ConnectionListener(self.role))
+                    self.conn.connect(
+                        self.username,
+                        self.password,
+                        wait=True,
+                        headers={'client-id': self.client_id()}
+                    )
+                    self.connects += 1
+                    logger.info(f"Connected {self.role} to ActiveMQ at {self.host}:{self.port}")
+                except Exception as e:
+                    logger.error(f"Failed to connect to ActiveMQ at {self.host}:{self.port}: {str(e)}")
+                    self.conn = None
+                    self.breaker.record_failure()
+                    raise
+            return self.conn
+
+    def disconnect(self):
+        with self.lock:
+            if self.conn and self.conn.is_connected():
+                try:
+                    self.conn.disconnect()
+                    logger.info("Disconnected from ActiveMQ")
+                except Exception as e:
+                    logger.error(f"Failed to disconnect from ActiveMQ: {str(e)}")
+                finally:
+                    self.conn = None
+
+    def send_message(self, destination: str, message, content_type: str = JSON_CONTENT_TYPE):
+        conn = self.connect()
+        try:
+            with self.send_lock:
+                conn.send(
+                    body=message,
+                    destination=destination,
+                    content_type=content_type,
+                    headers={'persistent': 'true'}
+                )
+            self.breaker.record_success()
+            logger.debug(f"Sent to {destination}: {message}")
+        except Exception as e:
+            logger.error(f"Failed to send message to {destination}: {str(e)}")
+            self.breaker.record_failure()
+            # Drop the broken connection; the next send reconnects
+            self.disconnect()
+            raise
+
+    def send_batch(self, messages):
+        # Takes (destination, body, content_type) tuples and sends them in one broker
+        # transaction, so the broker persists the batch in a single round
+        conn = self.connect()
+        transaction = None
+        try:
+            with self.send_lock:
+                transaction = conn.begin()
+                for destination, message, content_type in messages:
+                    conn.send(
+                        body=message,
+                        destination=destination,
+                        content_type=content_type,
+                        headers={'persistent': 'true'},
+                        transaction=transaction
+                    )
+                conn.commit(transaction)
+            self.breaker.record_success()
+            logger.debug(f"Sent batch of {len(messages)} messages")
+        except Exception as e:
+            logger.error(f"Failed to send batch of {len(messages)} messages: {str(e)}")
+            self.breaker.record_failure()
+            if transaction:
+                try:
+                    conn.abort(transaction)
+                except Exception:
+                    pass
+            self.disconnect()
+            raise
+
+    def subscribe(self, destination: str, listener: 'MessageListener', prefetch: int = 1):
+        conn = self.connect()
+        try:
+            conn.set_listener("msg_listener", listener)
+            conn.subscribe(
+                destination=destination,
+                id='transaction-service-sub-1',
+                ack='client-individual',
+                headers={'activemq.prefetchSize': str(prefetch)}
+            )
+            self.breaker.record_success()
+            logger.info(f"Subscribed to {destination}")
+        except Exception as e:
+            logger.error(f"Failed to subscribe to {destination}: {str(e)}")
+            self.breaker.record_failure()
+            self.disconnect()
+            raise
+
+    def ack_frames(self, frames):
+        # Each message needs its own ACK in client-individual mode; write them back to back
+        conn = self.conn
+        if not conn or not conn.is_connected():
+            raise Exception("Not connected to ActiveMQ")
+        with self.send_lock:
+            for frame in frames:
+                conn.ack(frame.headers['message-id'], frame.headers['subscription'])
+
+    def stats(self):
+        conn = self.conn
+        return {
+            'connected': bool(conn and conn.is_connected()),
+            'connects': self.connects,
+            'breaker': self.breaker.stats()
+        }
+
+# Connection Listener
+class ConnectionListener(stomp.ConnectionListener):
+    def __init__(self, role: str = 'producer'):
+        self.role = role
+
+    def on_connected(self, frame):
+        logger.info(f"ActiveMQ {self.role} connected: {frame.headers}")
+
+    def on_disconnected(self):
+        logger.warning(f"ActiveMQ {self.role} disconnected")
+
+    def on_error(self, frame):
+        logger.error(f"ActiveMQ {self.role} error: {frame.body}")
+
+    def on_heartbeat_timeout(self):
+        logger.error(f"ActiveMQ {self.role} heartbeat timeout")
+
+# Message Listener
+# Handles decoded events inline on the receiver thread, or hands frames to a KeyedWorkerPool
+class MessageListener(stomp.ConnectionListener):
+    def __init__(self, callback: Optional[Callable[[dict], None]] = None,
+                 ack: Optional[Callable[[list], None]] = None, pool: Optional[KeyedWorkerPool] = None):
+        self.callback = callback
+        self.ack = ack
+        self.pool = pool
+
+    def on_error(self, frame):
+        logger.error(f"ActiveMQ error: {frame.body}")
+
+    def on_message(self, frame):
+        logger.debug(f"Received message: {frame.headers.get('message-id')}")
+        if self.pool:
+            self.pool.submit(frame)
+            return
+        if self.callback:
+            try:
+                self.callback(decode_frame(frame))
+            except Exception as e:
+                logger.error(f"Error processing message: {str(e)}")
+        try:
+            if self.ack:
+                self.ack([frame])
+        except Exception as e:
+            logger.error(f"Failed to ack message: {str(e)}")
+
+    def on_disconnected(self):
+        logger.warning("Disconnected from ActiveMQ")
+
+    def on_connected(self, frame):
+        logger.info(f"Message listener connected: {frame.headers}")
+
+# Global ActiveMQ connections: one for publishing, one for the subscription and its acks
+producer_conn = ActiveMQConnection(BROKER_HOST, BROKER_PORT, USERNAME, PASSWORD, CONNECTION_TIMEOUT, 'producer')
+consumer_conn = ActiveMQConnection(BROKER_HOST, BROKER_PORT, USERNAME, PASSWORD, CONNECTION_TIMEOUT, 'consumer',
+                                   auto_decode=False)
+
+# Publishing statistics of the background sender
+class PublishMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.batches = 0
+        self.messages = 0
+        self.failed_batches = 0
+        self.publish_seconds = 0.0
+        self.max_batch_size = 0
+
+    def record(self, batch_size: int, elapsed: float, succeeded: bool):
+        with self.lock:
+            if not succeeded:
+                self.failed_batches += 1
+                return
+            self.batches += 1
+            self.messages += batch_size
+            self.publish_seconds += elapsed
+            self.max_batch_size = max(self.max_batch_size, batch_size)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'batch_size_limit': MQ_BATCH_SIZE,
+                'linger_ms': MQ_LINGER_MS,
+                'queue_depth': message_queue.qsize(),
+                'queue_capacity': MQ_QUEUE_MAX,
+                'batches': self.batches,
+                'messages': self.messages,
+                'failed_batches': self.failed_batches,
+                'avg_batch_size': self.messages / self.batches if self.batches else 0.0,
+                'max_batch_size': self.max_batch_size,
+                'avg_publish_ms': self.publish_seconds / self.batches * 1000 if self.batches else 0.0,
+                # Messages the broker accepted per second of time spent publishing
+                'publish_rate': self.messages / self.publish_seconds if self.publish_seconds else 0.0
+            }
+
+publish_metrics = PublishMetrics()
+
+# Take up to MQ_BATCH_SIZE queued messages, waiting at most MQ_LINGER_MS after the first.
+# Returns an empty batch if nothing arrives within MQ_IDLE_WAIT.
+def drain_batch():
+    try:
+        batch = [message_queue.get(timeout=MQ_IDLE_WAIT)]
+    except Empty:
+        return []
+    deadline = time.monotonic() + MQ_LINGER_MS / 1000.0
+    while len(batch) < MQ_BATCH_SIZE:
+        remaining = deadline - time.monotonic()
+        try:
+            batch.append(message_queue.get(timeout=remaining) if remaining > 0 else message_queue.get_nowait())
+        except Empty:
+            break
+    return batch
+
+# Publish one batch, retrying until the broker takes it. While the circuit is
+# open the sender waits for the breaker's next probe instead of retrying on a
+# fixed timer; new events go to the spool meanwhile, so memory stays bounded
+# and order is kept. Returns False if the process started stopping before the
+# broker took the batch.
+def publish_batch(batch):
+    while True:
+        started = time.monotonic()
+        try:
+            producer_conn.send_batch(batch)
+            publish_metrics.record(len(batch), time.monotonic() - started, True)
+            return True
+        except CircuitOpenError as e:
+            if _stopping.wait(e.retry_after):
+                return False
+        except Exception as e:
+            publish_metrics.record(len(batch), time.monotonic() - started, False)
+            logger.error(f"Background send failed for batch of {len(batch)}: {str(e)}")
+            if _stopping.is_set():
+                return False
+
+# Background message sender. Events leave in the order they were queued: the
+# batch in hand, then the in-memory queue, then the spool, which takes every
+# new event for as long as it is not empty. Once stop() is called it publishes
+# what is left in memory and exits; the spool is replayed by the next process.
+def message_sender():
+    global _sender_done
+    try:
+        while True:
+            if not _stopping.is_set() and message_queue.empty() and event_spool.pending():
+                records, position = event_spool.read(MQ_BATCH_SIZE)
+                if publish_batch(records):
+                    event_spool.ack(position)
+                continue
+            with _take_lock:
+                if _stopping.is_set() and (message_queue.empty() or _abandoned.is_set()):
+                    break
+                batch = drain_batch()
+            if batch:
+                if not publish_batch(batch):
+                    # Stopping with the broker unavailable: keep the batch on disk
+                    event_spool.append(batch)
+                for _ in batch:
+                    message_queue.task_done()
+            event_spool.sync_if_due()
+        event_spool.sync()
+    finally:
+        with _handoff_lock:
+            _sender_done = True
+            close_spool = _spool_handed_off
+        if close_spool:
+            event_spool.close()
+
+# Queue events for the sender, spilling to disk when the queue is full, the
+# broker is down or the process is stopping
+def enqueue_events(events):
+    with _enqueue_lock:
+        if _stopping.is_set() or not producer_conn.breaker.is_closed() or event_spool.pending():
+            event_spool.append(events)
+            return
+        for i, event in enumerate(events):
+            try:
+                message_queue.put_nowait(event)
+            except Full:
+                logger.warning(f"Event queue is full; spooling {len(events) - i} events to disk")
+                event_spool.append(events[i:])
+                return
+
+# A (destination, body, content_type) message for a book purchase, in EVENT_FORMAT
+def book_purchase_message(user_id: str, book_id: int, transaction_type: str):
+    return (BOOK_PURCHASES_TOPIC,) + encode_book_purchase(user_id, book_id, transaction_type)
+
+# Send book purchase event (async)
+def send_book_purchase_event(user_id: str, book_id: int, transaction_type: str):
+    enqueue_events([book_purchase_message(user_id, book_id, transaction_type)])
+    logger.info(f"Queued book purchase event: userId={user_id}, bookId={book_id}")
+
+# Send several book purchase events (async); takes (user_id, book_id, transaction_type) tuples
+def send_book_purchase_events(events):
+    enqueue_events([
+        book_purchase_message(user_id, book_id, transaction_type)
+        for user_id, book_id, transaction_type in events
+    ])
+    logger.info(f"Queued {len(events)} book purchase events")
+
+# Subscribe to book purchases. With a worker pool, up to MQ_CONSUMER_PREFETCH
+# messages are in flight at once; without one, a single message is.
+def subscribe_to_topic(topic: str, callback: Optional[Callable[[dict], None]] = None,
+                       pool: Optional[KeyedWorkerPool] = None):
+    prefetch = Config.MQ_CONSUMER_PREFETCH if pool else 1
+    if pool:
+        pool.start()
+
+    def run_subscription():
+        # Resubscribes until stop(); the breaker paces the attempts
+        while not _stopping.is_set():
+            try:
+                listener = MessageListener(callback, consumer_conn.ack_frames, pool)
+                consumer_conn.subscribe(topic, listener, prefetch)
+                while consumer_conn.conn and consumer_conn.conn.is_connected():
+                    if _stopping.wait(1):
+                        return
+                logger.warning("Subscription loop exited, reconnecting...")
+            except CircuitOpenError as e:
+                _stopping.wait(e.retry_after)
+            except Exception as e:
+                logger.error(f"Subscription error for {topic}: {str(e)}")
+                _stopping.wait(MQ_BREAKER_BASE_BACKOFF)
+
+    thread = threading.Thread(target=run_subscription, name='mq-subscription', daemon=True)
+    thread.start()
+    return thread
+
+# Handle book purchase events, decoded from either wire format
+def handle_book_purchase_event(event: dict):
+    if event.get("event") == "book_purchase":
+        if purchase_stats:
+            purchase_stats.record(event)
+        logger.debug(f"Processed book purchase: userId={event.get('userId')}, bookId={event.get('bookId')}")
+
+# Purchase statistics maintained from the event stream when STATS_ENABLED is set
+purchase_stats = PurchaseStats() if Config.STATS_ENABLED else None
+
+# Book purchase events for the same book are handled in order
+def book_purchase_key(event: dict):
+    return event.get("bookId")
+
+# Handles book purchase events concurrently when MQ_CONSUMER_WORKERS is set
+consumer_pool = KeyedWorkerPool(
+    handle_book_purchase_event, book_purchase_key, consumer_conn.ack_frames, decode=decode_frame
+) if Config.MQ_CONSUMER_WORKERS else None
+
+# Publishes purchase events committed to the outbox when OUTBOX_ENABLED is set
+outbox_relay = OutboxRelay(producer_conn.send_batch) if Config.OUTBOX_ENABLED else None
+
+# Add purchase events for freshly inserted (user_id, book_id, transaction_type) rows
+# to the outbox; call inside the transaction that inserts them
+def write_outbox(db, rows, ids=None):
+    db.insert_many(queries.INSERT_OUTBOX_EVENT, [
+        book_purchase_message(str(user_id), book_id, transaction_type)
+        for user_id, book_id, transaction_type in rows
+    ])
+
+# Lifecycle. Nothing here runs at import: threads do not survive fork, so
+# every serving process calls start() once it is up and stop() before it exits
+# (see app.init_worker and server.py).
+_lifecycle_lock = threading.Lock()
+_sender = None
+_subscription = None
+
+def start():
+    # Starts the sender, outbox relay and statistics, opens the producer
+    # connection and subscribes. Returns once the broker has been tried; if it
+    # is unreachable the breaker opens and events go to the spool meanwhile.
+    global _sender, _subscription, _sender_done, _spool_handed_off
+    with _lifecycle_lock:
+        if _sender:
+            return
+        _stopping.clear()
+        _abandoned.clear()
+        _sender_done = _spool_handed_off = False
+        # Claim a spool slot first so events left by a previous process are replayed
+        event_spool.open()
+        _sender = threading.Thread(target=message_sender, name='mq-sender', daemon=True)
+        _sender.start()
+        if outbox_relay:
+            outbox_relay.start()
+        if purchase_stats:
+            # Load the rollup before subscribing so no event is counted twice
+            try:
+                purchase_stats.load()
+            except Exception as e:
+                logger.error(f'Failed to load purchase statistics: {str(e)}')
+            purchase_stats.start()
+        warm_up_broker()
+        _subscription = subscribe_to_topic(BOOK_PURCHASES_TOPIC, handle_book_purchase_event, consumer_pool)
+
+def warm_up_broker():
+    # Connect ahead of the first publish so no request pays for the handshake
+    try:
+        producer_conn.connect()
+        return True
+    except Exception as e:
+        logger.warning(f'ActiveMQ not reachable during warm-up: {str(e)}')
+        return False
+
+def stop(timeout=None):
+    # Stops consuming, gives the sender up to `timeout` (MQ_DRAIN_TIMEOUT)
+    # seconds to publish what is queued in memory, spools whatever is left and
+    # releases the spool slot. Events still in memory at the deadline are
+    # spooled after any already on disk. A sender still stuck in a publish
+    # at the deadline closes the spool itself when it returns.
+    global _sender, _subscription, _spool_handed_off
+    timeout = Config.MQ_DRAIN_TIMEOUT if timeout is None else timeout
+    with _lifecycle_lock:
+        if not _sender:
+            # Never started, e.g. stopped during warm-up: keep what was queued
+            if _spool_queued():
+                event_spool.close()
+            return
+        deadline = time.monotonic() + timeout
+        queued = message_queue.qsize()
+        _stopping.set()
+        consumer_conn.disconnect()
+        _subscription.join(max(deadline - time.monotonic(), 0))
+        if outbox_relay:
+            outbox_relay.stop(max(deadline - time.monotonic(), 0))
+        _sender.join(max(deadline - time.monotonic(), 0))
+        if _sender.is_alive():
+            _abandoned.set()
+            # Once the sender has let go of the queue it takes nothing more from it
+            with _take_lock:
+                spooled = _spool_queued()
+            logger.warning(f'Event drain timed out; spooled {spooled} events')
+        if purchase_stats:
+            purchase_stats.stop()
+        with _handoff_lock:
+            close_spool = _sender_done
+            _spool_handed_off = not _sender_done
+        if close_spool:
+            event_spool.close()
+        else:
+            logger.warning('Sender is still publishing; it will close the spool when it returns')
+        producer_conn.disconnect()
+        _sender = _subscription = None
+        logger.info(f'Messaging stopped; drained {queued} queued events')
+
+def _spool_queued():
+    events = []
+    while True:
+        try:
+            events.append(message_queue.get_nowait())
+        except Empty:
+            break
+        message_queue.task_done()
+    if events:
+        event_spool.append(events)
+    return len(events)
+
+def metrics():
+    metrics = {
+        'mq_sender': publish_metrics.snapshot(),
+        'mq_spool': event_spool.stats(),
+        'mq_connections': {'producer': producer_conn.stats(), 'consumer': consumer_conn.stats()}
+    }
+    if purchase_stats:
+        metrics['stats'] = purchase_stats.metrics()
+    if consumer_pool:
+        metrics['mq_consumer'] = consumer_pool.stats()
+    if outbox_relay:
+        metrics['outbox'] = outbox_relay.metrics()
+    return metrics
@@ -0,0 +1,177 @@
+import argparse
+import logging
+import sys
+from datetime import datetime
+from db import Database
+import queries
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_LOCK = 'transaction-service-migrations'
+MIGRATION_LOCK_TIMEOUT = 30  # Seconds
+
+def _create_transactions_table(db):
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            user_id BIGINT NOT NULL,
+            book_id INT NOT NULL,
+            transaction_type ENUM('BORROW', 'PURCHASE') NOT NULL,
+            transaction_date TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB
+    """)
+
+def _add_index(db, table, name, columns):
+    # The table may predate the service owning its schema, so the index can already exist
+    exists = db.select_one(
+        'SELECT 1 AS present FROM information_schema.statistics '
+        'WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s LIMIT 1',
+        (table, name)
+    )
+    if exists:
+        logger.info(f'Index {name} already exists on {table}')
+        return
+    db.execute(f'CREATE INDEX {name} ON {table} ({columns})')
+
+def _add_lookup_indexes(db):
+    # Serve per-user and per-book listings in date order straight from the index
+    _add_index(db, 'transactions', 'idx_transactions_user_date', 'user_id, transaction_date')
+    _add_index(db, 'transactions', 'idx_transactions_book_date', 'book_id, transaction_date')
+
+def _add_updated_at(db):
+    # Row version for ETags; microsecond precision so back-to-back updates differ
+    exists = db.select_one(
+        'SELECT 1 AS present FROM information_schema.columns '
+        'WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s LIMIT 1',
+        ('transactions', 'updated_at')
+    )
+    if not exists:
+        db.execute(
+            'ALTER TABLE transactions ADD COLUMN updated_at TIMESTAMP(6) NOT NULL '
+            'DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)'
+        )
+    _add_index(db, 'transactions', 'idx_transactions_user_updated', 'user_id, updated_at')
+
+def _create_event_outbox(db):
+    # (sent_at, id) serves both the relay's claim of unsent rows in id order and pruning
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS event_outbox (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            destination VARCHAR(255) NOT NULL,
+            payload TEXT NOT NULL,
+            created_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+            sent_at TIMESTAMP(6) NULL DEFAULT NULL,
+            INDEX idx_event_outbox_sent (sent_at, id)
+        ) ENGINE=InnoDB
+    """)
+
+def _create_purchase_stats(db):
+    # Rollup of the event stream; each window is claimed once so it is added once
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS purchase_stats (
+            scope ENUM('book', 'user', 'day') NOT NULL,
+            scope_key VARCHAR(64) NOT NULL,
+            purchases BIGINT NOT NULL DEFAULT 0,
+            borrows BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
+            PRIMARY KEY (scope, scope_key)
+        ) ENGINE=InnoDB
+    """)
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS purchase_stats_windows (
+            window_start BIGINT PRIMARY KEY,
+            flushed_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6)
+        ) ENGINE=InnoDB
+    """)
+
+def _add_outbox_content_type(db):
+    # Payloads may be protobuf, so store bytes and the content type they carry
+    exists = db.select_one(
+        'SELECT 1 AS present FROM information_schema.columns '
+        'WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s LIMIT 1',
+        ('event_outbox', 'content_type')
+    )
+    if not exists:
+        db.execute(
+            "ALTER TABLE event_outbox MODIFY payload MEDIUMBLOB NOT NULL, "
+            "ADD COLUMN content_type VARCHAR(64) NOT NULL DEFAULT 'application/json' AFTER payload"
+        )
+
+# Ordered, append-only list of (version, description, apply)
+MIGRATIONS = [
+    (1, 'create transactions table', _create_transactions_table),
+    (2, 'add user and book lookup indexes', _add_lookup_indexes),
+    (3, 'add updated_at row version', _add_updated_at),
+    (4, 'create event outbox', _create_event_outbox),
+    (5, 'create purchase statistics rollup', _create_purchase_stats),
+    (6, 'add event outbox content type', _add_outbox_content_type),
+]
+
+def migrate(db_factory=Database):
+    with db_factory() as db:
+        acquired = db.select_one('SELECT GET_LOCK(%s, %s) AS acquired', (MIGRATION_LOCK, MIGRATION_LOCK_TIMEOUT))
+        if not acquired or not acquired['acquired']:
+            raise RuntimeError('Timed out waiting for the migration lock')
+        try:
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version INT PRIMARY KEY,
+                    description VARCHAR(255) NOT NULL,
+                    applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+                ) ENGINE=InnoDB
+            """)
+            applied = {row['version'] for row in db.select('SELECT version FROM schema_migrations')}
+            pending = [m for m in MIGRATIONS if m[0] not in applied]
+            for version, description, apply in pending:
+                logger.info(f'Applying migration {version}: {description}')
+                apply(db)
+                db.insert(
+                    'INSERT INTO schema_migrations (version, description) VALUES (%s, %s)',
+                    (version, description)
+                )
+            logger.info(f'Schema is up to date ({len(pending)} migrations applied)')
+            return len(pending)
+        finally:
+            db.select_one('SELECT RELEASE_LOCK(%s) AS released', (MIGRATION_LOCK,))
+
+# Every query the routes and the outbox relay run, with representative parameters.
+# The export is left out on purpose: it reads the whole table by design.
+def _plan_checks():
+    sample_date = datetime(2025, 1, 1)
+    return [
+        ('get transaction', queries.GET_TRANSACTION, (1,)),
+        ('get transaction owner', queries.GET_TRANSACTION_OWNER, (1,)),
+        ('get transaction version', queries.GET_TRANSACTION_VERSION, (1,)),
+        ('user transactions version', queries.USER_TRANSACTIONS_VERSION, (1,)),
+        ('list transactions', queries.LIST_TRANSACTIONS, (51,)),
+        ('list transactions after cursor', queries.LIST_TRANSACTIONS_AFTER, (1, 51)),
+        ('list user transactions', queries.LIST_USER_TRANSACTIONS, (1, 51)),
+        ('list user transactions after cursor', queries.LIST_USER_TRANSACTIONS_AFTER,
+         (1, sample_date, sample_date, 1, 51)),
+        ('claim outbox events', queries.CLAIM_OUTBOX_EVENTS, (500,)),
+    ]
+
+def check_query_plans(db_factory=Database):
+    # Returns a list of problems; empty when no query falls back to a full table scan
+    problems = []
+    with db_factory() as db:
+        for name, query, params in _plan_checks():
+            for row in db.select(f'EXPLAIN {query}', params):
+                if row.get('type') == 'ALL':
+                    problems.append(f'{name}: full scan of {row.get("table")} ({query})')
+    return problems
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Transaction service schema management')
+    parser.add_argument('--check-plans', action='store_true',
+                        help='EXPLAIN the service queries and fail if any does a full table scan')
+    args = parser.parse_args()
+
+    migrate()
+    if args.check_plans:
+        problems = check_query_plans()
+        for problem in problems:
+            logger.error(problem)
+        if problems:
+            sys.exit(1)
+        logger.info('All query plans use an index')
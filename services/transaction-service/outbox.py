@@ -0,0 +1,116 @@
+import logging
+import threading
+import time
+from breaker import CircuitOpenError
+from config import Config
+from db import get_db_connection
+import queries
+
+logger = logging.getLogger(__name__)
+
+PRUNE_INTERVAL = 60  # Seconds between prunes of sent rows
+RETRY_INTERVAL = 2  # Seconds to wait after a failed cycle
+
+# Publishes events written to the event_outbox table by the write routes.
+# Each cycle claims the oldest unsent rows with FOR UPDATE SKIP LOCKED, hands
+# them to `publish` and marks them sent in the same transaction, so any number
+# of relays (one per worker) can run side by side without publishing a row
+# twice. A crash after publishing but before the commit re-publishes the batch:
+# delivery is at least once.
+class OutboxRelay:
+    def __init__(self, publish, batch_size=None, poll_ms=None, retention=None, db_factory=None):
+        self.publish = publish
+        self.batch_size = batch_size or Config.OUTBOX_BATCH_SIZE
+        self.poll = (poll_ms if poll_ms is not None else Config.OUTBOX_POLL_MS) / 1000.0
+        self.retention = retention if retention is not None else Config.OUTBOX_RETENTION
+        self._db_factory = db_factory or get_db_connection
+        self._thread = None
+        self._stop = threading.Event()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._events = 0
+        self._failures = 0
+        self._publish_total = 0.0
+        self._pruned = 0
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='outbox-relay', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        # Lets the current cycle commit or roll back, then ends the relay
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def relay_once(self):
+        # Returns the number of events published
+        db = self._db_factory()
+        try:
+            with db.transaction():
+                rows = db.select_rows(queries.CLAIM_OUTBOX_EVENTS, (self.batch_size,))
+                if not rows:
+                    return 0
+                started = time.monotonic()
+                self.publish([
+                    (destination, bytes(payload), content_type)
+                    for _, destination, payload, content_type in rows
+                ])
+                elapsed = time.monotonic() - started
+                db.update(queries.mark_outbox_sent(len(rows)), [row[0] for row in rows])
+        finally:
+            db.close()
+        with self._stats_lock:
+            self._batches += 1
+            self._events += len(rows)
+            self._publish_total += elapsed
+        logger.debug(f'Relayed {len(rows)} outbox events')
+        return len(rows)
+
+    def prune(self):
+        # Sent rows are kept for `retention` seconds, then deleted one batch at a time
+        db = self._db_factory()
+        try:
+            deleted = db.delete(queries.PRUNE_OUTBOX, (self.retention, self.batch_size))
+        finally:
+            db.close()
+        with self._stats_lock:
+            self._pruned += deleted
+        return deleted
+
+    def metrics(self):
+        with self._stats_lock:
+            batches = self._batches
+            return {
+                'batches': batches,
+                'events': self._events,
+                'failures': self._failures,
+                'pruned': self._pruned,
+                'avg_batch_size': self._events / batches if batches else 0.0,
+                'avg_publish_ms': self._publish_total / batches * 1000 if batches else 0.0
+            }
+
+    def _run(self):
+        last_prune = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                relayed = self.relay_once()
+                if relayed == self.batch_size:
+                    # Backlog: go straight on to the next batch
+                    continue
+                if not relayed and time.monotonic() - last_prune >= PRUNE_INTERVAL:
+                    self.prune()
+                    last_prune = time.monotonic()
+            except CircuitOpenError as e:
+                # Broker is known to be down; the claimed rows were released on rollback
+                self._stop.wait(e.retry_after)
+                continue
+            except Exception as e:
+                with self._stats_lock:
+                    self._failures += 1
+                logger.error(f'Outbox relay cycle failed: {str(e)}')
+                self._stop.wait(RETRY_INTERVAL)
+                continue
+            self._stop.wait(self.poll)
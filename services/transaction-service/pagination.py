@@ -0,0 +1,41 @@
+import base64
+import json
+from datetime import datetime
+from config import Config
+
+class PaginationError(ValueError):
+    pass
+
+def parse_limit(value, default=None, maximum=None, name='limit'):
+    if value is None:
+        return default or Config.PAGE_SIZE_DEFAULT
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise PaginationError(f'{name} must be a positive integer')
+    if limit < 1:
+        raise PaginationError(f'{name} must be a positive integer')
+    return min(limit, maximum or Config.PAGE_SIZE_MAX)
+
+# Cursors are opaque to clients: URL-safe base64 of the last row's sort key
+def encode_cursor(transaction_id, transaction_date=None):
+    key = {'id': transaction_id}
+    if transaction_date is not None:
+        key['date'] = transaction_date.isoformat()
+    raw = json.dumps(key, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        transaction_id = int(key['id'])
+        transaction_date = datetime.fromisoformat(key['date']) if 'date' in key else None
+        return transaction_id, transaction_date
+    except (ValueError, KeyError, TypeError):
+        raise PaginationError('Invalid cursor')
+
+def split_page(rows, limit):
+    # Queries fetch limit + 1 rows; the extra row only signals that a next page exists
+    has_more = len(rows) > limit
+    return rows[:limit], has_more
@@ -0,0 +1,83 @@
+# SQL used by the transaction routes. Listings are keyset paginated:
+# each page continues strictly after the last row of the previous one, so the
+# cost of a page does not depend on how deep into the table it is.
+
+INSERT_TRANSACTION = (
+    'INSERT INTO transactions (user_id, book_id, transaction_type) '
+    'VALUES (%s, %s, %s)'
+)
+
+# Read queries return plain tuples in this column order; the aliases name the
+# JSON keys that serializers.py writes for each position
+TRANSACTION_COLUMNS = (
+    'id, user_id AS userId, book_id AS bookId, '
+    'transaction_type AS transactionType, transaction_date AS transactionDate'
+)
+
+# updated_at trails the serialized columns and only feeds the ETag
+GET_TRANSACTION = f'SELECT {TRANSACTION_COLUMNS}, updated_at FROM transactions WHERE id = %s'
+
+# Row version alone, to check a cached copy with one primary key lookup
+GET_TRANSACTION_VERSION = 'SELECT updated_at FROM transactions WHERE id = %s'
+
+GET_TRANSACTION_OWNER = 'SELECT user_id FROM transactions WHERE id = %s'
+
+# Cheap version of a user's rows for ETags; covered by idx_transactions_user_updated
+USER_TRANSACTIONS_VERSION = (
+    'SELECT COUNT(*) AS row_count, MAX(id) AS max_id, MAX(updated_at) AS max_updated '
+    'FROM transactions WHERE user_id = %s'
+)
+
+LIST_TRANSACTIONS = f'SELECT {TRANSACTION_COLUMNS} FROM transactions ORDER BY id LIMIT %s'
+
+LIST_TRANSACTIONS_AFTER = f'SELECT {TRANSACTION_COLUMNS} FROM transactions WHERE id > %s ORDER BY id LIMIT %s'
+
+LIST_USER_TRANSACTIONS = (
+    f'SELECT {TRANSACTION_COLUMNS} FROM transactions WHERE user_id = %s '
+    'ORDER BY transaction_date, id LIMIT %s'
+)
+
+LIST_USER_TRANSACTIONS_AFTER = (
+    f'SELECT {TRANSACTION_COLUMNS} FROM transactions WHERE user_id = %s '
+    'AND (transaction_date > %s OR (transaction_date = %s AND id > %s)) '
+    'ORDER BY transaction_date, id LIMIT %s'
+)
+
+EXPORT_TRANSACTIONS = f'SELECT {TRANSACTION_COLUMNS} FROM transactions ORDER BY id'
+
+# Transactional outbox: events are inserted in the same commit as the rows they
+# describe and published later by the relay (outbox.py)
+INSERT_OUTBOX_EVENT = 'INSERT INTO event_outbox (destination, payload, content_type) VALUES (%s, %s, %s)'
+
+# Rows another relay has claimed stay locked until it commits; SKIP LOCKED lets
+# concurrent relays take the next unclaimed rows instead of waiting on them
+CLAIM_OUTBOX_EVENTS = (
+    'SELECT id, destination, payload, content_type FROM event_outbox WHERE sent_at IS NULL '
+    'ORDER BY id LIMIT %s FOR UPDATE SKIP LOCKED'
+)
+
+def mark_outbox_sent(count):
+    # The IN list needs one placeholder per claimed row
+    placeholders = ', '.join(['%s'] * count)
+    return f'UPDATE event_outbox SET sent_at = CURRENT_TIMESTAMP(6) WHERE id IN ({placeholders})'
+
+PRUNE_OUTBOX = (
+    'DELETE FROM event_outbox WHERE sent_at IS NOT NULL '
+    'AND sent_at < CURRENT_TIMESTAMP(6) - INTERVAL %s SECOND LIMIT %s'
+)
+
+# Purchase statistics rollup (stats.py). The row alias form keeps a single
+# VALUES clause, which mysql-connector needs to batch executemany into one statement.
+LOAD_PURCHASE_STATS = 'SELECT scope, scope_key, purchases, borrows FROM purchase_stats'
+
+UPSERT_PURCHASE_STATS = (
+    'INSERT INTO purchase_stats (scope, scope_key, purchases, borrows) VALUES (%s, %s, %s, %s) AS new '
+    'ON DUPLICATE KEY UPDATE purchases = purchase_stats.purchases + new.purchases, '
+    'borrows = purchase_stats.borrows + new.borrows'
+)
+
+CLAIM_STATS_WINDOW = 'INSERT IGNORE INTO purchase_stats_windows (window_start) VALUES (%s)'
+
+LOAD_CLAIMED_STATS_WINDOWS = 'SELECT window_start FROM purchase_stats_windows WHERE window_start >= %s'
+
+PRUNE_STATS_WINDOWS = 'DELETE FROM purchase_stats_windows WHERE window_start < %s'
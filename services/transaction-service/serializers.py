@@ -0,0 +1,28 @@
+import json
+
+# Encodes transaction rows straight to JSON bytes. Rows are tuples in the column
+# order of queries.TRANSACTION_COLUMNS:
+#   (id, userId, bookId, transactionType, transactionDate, ...)
+# Key order is fixed in a template, so no intermediate dicts are built and only
+# values that may need escaping go through the json module.
+
+_TEMPLATE = '{"id":%d,"userId":%d,"bookId":%d,"transactionType":%s,"transactionDate":"%s"}'
+
+# transaction_type is an ENUM, so its encodings can be computed up front
+_TYPE_JSON = {value: json.dumps(value) for value in ('BORROW', 'PURCHASE')}
+
+def _encode_type(transaction_type):
+    encoded = _TYPE_JSON.get(transaction_type)
+    return encoded if encoded is not None else json.dumps(transaction_type)
+
+def encode_transaction(row):
+    return _TEMPLATE % (row[0], row[1], row[2], _encode_type(row[3]), row[4].isoformat())
+
+def serialize_transaction(row):
+    return encode_transaction(row).encode()
+
+def serialize_transactions(rows):
+    return ('[' + ','.join([encode_transaction(row) for row in rows]) + ']').encode()
+
+def serialize_ndjson(rows):
+    return ''.join([encode_transaction(row) + '\n' for row in rows]).encode()
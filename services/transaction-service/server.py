@@ -0,0 +1,76 @@
+import logging
+import os
+from gunicorn.app.base import BaseApplication
+from config import Config
+from db import get_pool, reset_pool
+from migrations import migrate
+
+logger = logging.getLogger(__name__)
+
+def available_cpus():
+    # Respects the container's CPU set rather than the host's core count
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def on_starting(server):
+    # Migrate once in the master before any worker serves traffic, then close
+    # the pool so the master holds no connection for the workers to inherit
+    if Config.MIGRATE_ON_STARTUP:
+        try:
+            migrate()
+        finally:
+            get_pool().close()
+            reset_pool()
+
+def post_fork(server, worker):
+    # The app is preloaded in the master; DB connections and background
+    # threads must be created again inside every forked worker
+    from app import init_worker
+    init_worker()
+    logger.info(f'Worker {worker.pid} initialized')
+
+def worker_exit(server, worker):
+    # Runs in the worker once it has stopped accepting requests
+    from app import shutdown_worker
+    shutdown_worker()
+    logger.info(f'Worker {worker.pid} shut down')
+
+# Pre-fork launcher: a gunicorn master preloads the app and forks threaded workers.
+# Workers are recycled after WEB_MAX_REQUESTS (+ jitter) requests and finish
+# in-flight requests within WEB_TIMEOUT before being replaced.
+class TransactionServer(BaseApplication):
+    def __init__(self, options=None):
+        self.options = options or {}
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            if key in self.cfg.settings and value is not None:
+                self.cfg.set(key, value)
+
+    def load(self):
+        from app import app
+        return app
+
+def default_options():
+    return {
+        'bind': f'0.0.0.0:{Config.PORT}',
+        'workers': Config.WEB_WORKERS or available_cpus(),
+        'worker_class': 'gthread',
+        'threads': Config.WEB_THREADS,
+        'timeout': Config.WEB_TIMEOUT,
+        'graceful_timeout': Config.WEB_TIMEOUT,
+        'max_requests': Config.WEB_MAX_REQUESTS,
+        'max_requests_jitter': Config.WEB_MAX_REQUESTS_JITTER,
+        'preload_app': True,
+        'on_starting': on_starting,
+        'post_fork': post_fork,
+        'worker_exit': worker_exit,
+    }
+
+if __name__ == '__main__':
+    options = default_options()
+    logger.info(f"Starting transactions-service with {options['workers']} workers x {options['threads']} threads on port {Config.PORT}")
+    TransactionServer(options).run()
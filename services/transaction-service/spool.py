@@ -0,0 +1,263 @@
+import base64
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from config import Config
+from events import JSON_CONTENT_TYPE
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_SUFFIX = '.log'
+CURSOR_FILE = 'cursor'
+LOCK_FILE = 'lock'
+
+# Append-only on-disk queue for events the broker cannot take right now.
+# Records are JSON lines of [destination, body, content_type] written to
+# numbered segment files; bytes bodies are base64 encoded and flagged by a
+# fourth element. Appends are fsynced in batches (every fsync_every records or after
+# fsync_ms), and the read position is saved in a cursor file only after a
+# batch was published, so a crash replays events rather than losing them.
+# Each process claims its own slot directory under the spool root with an
+# exclusive flock; a slot left behind by a dead worker is claimed and drained
+# by its replacement.
+class EventSpool:
+    def __init__(self, directory=None, segment_bytes=None, max_bytes=None, fsync_every=None, fsync_ms=None):
+        self.root = directory or Config.MQ_SPOOL_DIR
+        self.segment_bytes = segment_bytes or Config.MQ_SPOOL_SEGMENT_BYTES
+        self.max_bytes = max_bytes or Config.MQ_SPOOL_MAX_BYTES
+        self.fsync_every = fsync_every or Config.MQ_SPOOL_FSYNC_EVERY
+        self.fsync_ms = fsync_ms if fsync_ms is not None else Config.MQ_SPOOL_FSYNC_MS
+        self.directory = None
+        self._lock = threading.Lock()
+        self._lock_file = None
+        self._segments = []  # Segment numbers, oldest first
+        self._writer = None
+        self._write_bytes = 0
+        self._read_segment = None
+        self._read_offset = 0
+        self._pending = 0
+        self._bytes = 0
+        self._unsynced = 0
+        self._unsynced_since = None
+        self.spooled = 0
+        self.replayed = 0
+        self.dropped = 0
+        self.fsyncs = 0
+
+    def open(self):
+        # Claims a slot and loads whatever a previous owner left unpublished
+        with self._lock:
+            self._open()
+
+    def append(self, records):
+        # Returns False when the spool is full and the records were dropped
+        data = b''.join(_encode_record(record) for record in records)
+        with self._lock:
+            self._open()
+            if self._bytes + len(data) > self.max_bytes:
+                self.dropped += len(records)
+                logger.error(f'Event spool is full ({self._bytes} bytes); dropping {len(records)} events')
+                return False
+            writer = self._active_writer()
+            writer.write(data)
+            writer.flush()
+            if self._read_segment is None:
+                self._read_segment, self._read_offset = self._segments[-1], 0
+            self._write_bytes += len(data)
+            self._bytes += len(data)
+            self._pending += len(records)
+            self.spooled += len(records)
+            if self._unsynced == 0:
+                self._unsynced_since = time.monotonic()
+            self._unsynced += len(records)
+            self._sync_if_due()
+            return True
+
+    def read(self, max_records):
+        # Returns the oldest unpublished records and a position to pass to ack()
+        with self._lock:
+            records = []
+            segment, offset = self._read_segment, self._read_offset
+            while segment is not None and len(records) < max_records:
+                with open(self._segment_path(segment), 'rb') as f:
+                    f.seek(offset)
+                    for line in f:
+                        records.append(_decode_record(line))
+                        offset += len(line)
+                        if len(records) == max_records:
+                            break
+                if len(records) == max_records or segment == self._segments[-1]:
+                    break
+                segment, offset = self._segments[self._segments.index(segment) + 1], 0
+            return records, (segment, offset, len(records))
+
+    def ack(self, position):
+        # Marks records up to position as published and removes spent segments
+        segment, offset, count = position
+        with self._lock:
+            self._read_segment, self._read_offset = segment, offset
+            self._pending -= count
+            self.replayed += count
+            while self._segments and self._segments[0] != segment:
+                self._remove_segment(self._segments.pop(0))
+            self._write_cursor()
+
+    def pending(self):
+        with self._lock:
+            return self._pending
+
+    def sync(self):
+        with self._lock:
+            self._sync()
+
+    def sync_if_due(self):
+        with self._lock:
+            self._sync_if_due()
+
+    def close(self):
+        with self._lock:
+            self._sync()
+            if self._writer:
+                self._writer.close()
+                self._writer = None
+            if self._lock_file:
+                self._lock_file.close()
+                self._lock_file = None
+            self.directory = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'directory': self.directory,
+                'pending': self._pending,
+                'bytes': self._bytes,
+                'segments': len(self._segments),
+                'spooled': self.spooled,
+                'replayed': self.replayed,
+                'dropped': self.dropped,
+                'fsyncs': self.fsyncs
+            }
+
+    def _open(self):
+        if self.directory:
+            return
+        slot = 0
+        while True:
+            directory = os.path.join(self.root, str(slot))
+            os.makedirs(directory, exist_ok=True)
+            lock_file = open(os.path.join(directory, LOCK_FILE), 'a')
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                lock_file.close()
+                slot += 1
+        self.directory = directory
+        self._lock_file = lock_file
+        self._load()
+
+    def _load(self):
+        self._segments = sorted(
+            int(name[:-len(SEGMENT_SUFFIX)]) for name in os.listdir(self.directory) if name.endswith(SEGMENT_SUFFIX)
+        )
+        cursor = self._read_cursor()
+        if cursor and cursor[0] in self._segments:
+            while self._segments[0] != cursor[0]:
+                self._remove_segment(self._segments.pop(0), count=False)
+            self._read_segment, self._read_offset = cursor
+        elif self._segments:
+            self._read_segment, self._read_offset = self._segments[0], 0
+        if self._segments:
+            self._drop_torn_tail(self._segments[-1])
+        self._bytes = sum(os.path.getsize(self._segment_path(segment)) for segment in self._segments)
+        self._pending = 0
+        for segment in self._segments:
+            with open(self._segment_path(segment), 'rb') as f:
+                if segment == self._read_segment:
+                    f.seek(self._read_offset)
+                self._pending += sum(1 for _ in f)
+        if self._pending:
+            logger.info(f'Event spool {self.directory} has {self._pending} events to replay')
+
+    def _drop_torn_tail(self, segment):
+        # A crash mid-append can leave a partial last line; cut it off
+        path = self._segment_path(segment)
+        with open(path, 'rb+') as f:
+            data = f.read()
+            end = data.rfind(b'\n') + 1
+            if end != len(data):
+                logger.warning(f'Truncating {len(data) - end} bytes of a torn record in {path}')
+                f.truncate(end)
+
+    def _active_writer(self):
+        if self._writer is None or self._write_bytes >= self.segment_bytes:
+            if self._writer:
+                self._sync()
+                self._writer.close()
+            # Never append to a segment left by a previous owner
+            segment = self._segments[-1] + 1 if self._segments else 1
+            self._segments.append(segment)
+            self._writer = open(self._segment_path(segment), 'ab')
+            self._write_bytes = 0
+        return self._writer
+
+    def _sync_if_due(self):
+        if not self._unsynced:
+            return
+        if self._unsynced >= self.fsync_every or (time.monotonic() - self._unsynced_since) * 1000 >= self.fsync_ms:
+            self._sync()
+
+    def _sync(self):
+        if self._unsynced and self._writer:
+            os.fsync(self._writer.fileno())
+            self.fsyncs += 1
+        self._unsynced = 0
+
+    def _read_cursor(self):
+        try:
+            with open(os.path.join(self.directory, CURSOR_FILE)) as f:
+                segment, offset = json.load(f)
+            return segment, offset
+        except FileNotFoundError:
+            return None
+        except (ValueError, TypeError) as e:
+            logger.warning(f'Ignoring unreadable spool cursor: {str(e)}')
+            return None
+
+    def _write_cursor(self):
+        # Not fsynced: losing it only replays already published events again
+        path = os.path.join(self.directory, CURSOR_FILE)
+        with open(path + '.tmp', 'w') as f:
+            json.dump([self._read_segment, self._read_offset], f)
+        os.replace(path + '.tmp', path)
+
+    def _remove_segment(self, segment, count=True):
+        path = self._segment_path(segment)
+        if count:
+            self._bytes -= os.path.getsize(path)
+        os.remove(path)
+
+    def _segment_path(self, segment):
+        return os.path.join(self.directory, f'{segment:010d}{SEGMENT_SUFFIX}')
+
+
+def _encode_record(record):
+    destination, body, content_type = record
+    if isinstance(body, (bytes, bytearray)):
+        fields = [destination, base64.b64encode(body).decode('ascii'), content_type, 'base64']
+    else:
+        fields = [destination, body, content_type]
+    return json.dumps(fields).encode() + b'\n'
+
+def _decode_record(line):
+    # Returns (destination, body, content_type); records written before content
+    # types were spooled are [destination, message] and always JSON
+    fields = json.loads(line)
+    if len(fields) == 2:
+        return fields[0], fields[1], JSON_CONTENT_TYPE
+    if len(fields) == 4:
+        return fields[0], base64.b64decode(fields[1]), fields[2]
+    return tuple(fields)
@@ -0,0 +1,245 @@
+import calendar
+import heapq
+import logging
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from config import Config
+from db import get_db_connection
+import queries
+
+logger = logging.getLogger(__name__)
+
+SCOPES = ('book', 'user', 'day')
+COUNTERS = {'PURCHASE': 0, 'BORROW': 1}
+ORDERINGS = {'purchases': 0, 'borrows': 1}
+WINDOW_RETENTION = 86400  # Seconds to remember claimed windows
+
+def _counts():
+    return [0, 0]  # purchases, borrows
+
+# Purchase and borrow counts per book, per user and per day, kept up to date
+# from the book purchase event stream.
+#
+# /topic/book-purchases is a topic, so every process receives every event and
+# keeps its totals in memory: the rollup table, read again after every flush,
+# plus the windows it holds that are not in the rollup yet. Reads never touch
+# the database. A process that starts partway through a window misses what
+# the others received in it before then, until they write that window.
+#
+# Events are also bucketed into windows of `window` seconds by their own
+# timestamp, so every process puts an event in the same window however late it
+# arrives. A window is written one window after it closes, leaving time for
+# late events. Each process then tries to claim it in purchase_stats_windows;
+# the one that succeeds adds its compacted bucket (one row per counter key) to
+# the purchase_stats rollup in the same transaction, the rest drop theirs. A
+# bucket is kept until then, so a failed write is tried again. On stop a
+# process writes every window it still holds.
+#
+# A process only saw part of the windows that began before it started
+# consuming, so it claims those one window later still, after any process that
+# saw them whole. Events later than the grace period go to the window they are
+# received in. Redeliveries are dropped by message id.
+class PurchaseStats:
+    def __init__(self, window=None, top_size=None, db_factory=None, dedupe_size=None):
+        self.window = window or Config.STATS_FLUSH_INTERVAL
+        self.top_size = top_size or Config.STATS_TOP_SIZE
+        self.dedupe_size = dedupe_size or Config.STATS_DEDUPE_SIZE
+        self._db_factory = db_factory or get_db_connection
+        self._lock = threading.Lock()
+        self._totals = {scope: defaultdict(_counts) for scope in SCOPES}
+        self._buckets = {}  # window start -> {(scope, key): counts}
+        self._top = {ordering: [] for ordering in ORDERINGS}
+        self._seen = OrderedDict()  # recent message ids
+        self.consuming_since = None  # Windows starting earlier were only partly seen
+        self._thread = None
+        self._stop = threading.Event()
+        self.events = 0
+        self.ignored = 0
+        self.duplicates = 0
+        self.late_events = 0
+        self.windows_flushed = 0
+        self.windows_skipped = 0
+
+    def load(self):
+        # Rebuild the totals from the rollup table and the windows not yet in it.
+        # The rollup and the claimed windows are read in one transaction, so a
+        # window is either in the rollup or not claimed at all
+        with self._lock:
+            starts = list(self._buckets)
+        with self._db_factory() as db:
+            with db.transaction():
+                rows = db.select_rows(queries.LOAD_PURCHASE_STATS)
+                claimed = {
+                    row[0] for row in db.select_rows(queries.LOAD_CLAIMED_STATS_WINDOWS, (min(starts),))
+                } if starts else set()
+        totals = {scope: defaultdict(_counts) for scope in SCOPES}
+        for scope, key, purchases, borrows in rows:
+            counts = totals[scope][key]
+            counts[0] += purchases
+            counts[1] += borrows
+        with self._lock:
+            for start in claimed & self._buckets.keys():
+                # Written by another process
+                del self._buckets[start]
+                self.windows_skipped += 1
+            for bucket in self._buckets.values():
+                for (scope, key), counts in bucket.items():
+                    total = totals[scope][key]
+                    total[0] += counts[0]
+                    total[1] += counts[1]
+            self._totals = totals
+            self._refresh_top()
+        logger.debug(f'Loaded {len(rows)} purchase statistics rows')
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            if self.consuming_since is None:
+                self.consuming_since = time.time()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='purchase-stats', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        # Writes every window still held; one already claimed is not counted twice
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        try:
+            self.flush(now=float('inf'))
+        except Exception as e:
+            logger.error(f'Failed to flush purchase statistics: {str(e)}')
+
+    def record(self, event, received_at=None):
+        counter = COUNTERS.get(event.get('transactionType'))
+        if counter is None or event.get('bookId') is None or event.get('userId') is None:
+            with self._lock:
+                self.ignored += 1
+            return
+        received_at = received_at or time.time()
+        occurred_at = _event_time(event)
+        day = time.strftime('%Y-%m-%d', time.gmtime(occurred_at if occurred_at is not None else received_at))
+        keys = (('book', str(event['bookId'])), ('user', str(event['userId'])), ('day', day))
+        window_start = self._window_start(occurred_at if occurred_at is not None else received_at)
+        late = window_start + 2 * self.window <= received_at
+        if late:
+            # Its window may already be written
+            window_start = self._window_start(received_at)
+        message_id = event.get('messageId')
+        with self._lock:
+            if message_id is not None:
+                if message_id in self._seen:
+                    self.duplicates += 1
+                    return
+                self._seen[message_id] = True
+                if len(self._seen) > self.dedupe_size:
+                    self._seen.popitem(last=False)
+            self.late_events += late
+            bucket = self._buckets.setdefault(window_start, defaultdict(_counts))
+            for scope, key in keys:
+                self._totals[scope][key][counter] += 1
+                bucket[(scope, key)][counter] += 1
+            self.events += 1
+
+    def user(self, user_id):
+        with self._lock:
+            counts = self._totals['user'].get(str(user_id))
+            purchases, borrows = counts if counts else (0, 0)
+        return {'userId': user_id, 'purchases': purchases, 'borrows': borrows}
+
+    def top_books(self, limit, by='purchases'):
+        # Served from the ranking refreshed once per window
+        with self._lock:
+            top = self._top[by][:limit]
+        return [{'bookId': _book_id(key), 'purchases': counts[0], 'borrows': counts[1]} for key, counts in top]
+
+    def daily(self, days):
+        with self._lock:
+            daily = self._totals['day']
+            dates = sorted(daily, reverse=True)[:days]
+            return [{'date': date, 'purchases': daily[date][0], 'borrows': daily[date][1]} for date in dates]
+
+    def flush(self, now=None):
+        # Write every window that is due; returns the number this process claimed
+        now = now or time.time()
+        with self._lock:
+            due = sorted(start for start in self._buckets if self._due_at(start) <= now)
+            windows = [
+                (start, [(scope, key, counts[0], counts[1]) for (scope, key), counts in self._buckets[start].items()])
+                for start in due
+            ]
+            self._refresh_top()
+        claimed = 0
+        for start, rows in windows:
+            if self._write_window(start, rows):
+                claimed += 1
+        return claimed
+
+    def metrics(self):
+        with self._lock:
+            return {
+                'events': self.events,
+                'ignored': self.ignored,
+                'duplicates': self.duplicates,
+                'late_events': self.late_events,
+                'books': len(self._totals['book']),
+                'users': len(self._totals['user']),
+                'open_windows': len(self._buckets),
+                'windows_flushed': self.windows_flushed,
+                'windows_skipped': self.windows_skipped
+            }
+
+    def _window_start(self, at):
+        return int(at // self.window * self.window)
+
+    def _due_at(self, start):
+        # One window after it closes, or two if this process missed its beginning
+        due_at = start + 2 * self.window
+        if self.consuming_since is not None and start < self.consuming_since:
+            due_at += self.window
+        return due_at
+
+    def _write_window(self, start, rows):
+        with self._db_factory() as db:
+            with db.transaction():
+                # Whoever inserts the window row first writes it; the claim and
+                # the counts commit together
+                claimed = db.execute(queries.CLAIM_STATS_WINDOW, (start,))
+                if claimed:
+                    db.execute_many(queries.UPSERT_PURCHASE_STATS, rows)
+                    db.execute(queries.PRUNE_STATS_WINDOWS, (start - WINDOW_RETENTION,))
+        # Only now is the window safe to forget; the totals keep counting it until the next load
+        with self._lock:
+            self._buckets.pop(start, None)
+            if not claimed:
+                self.windows_skipped += 1
+                return False
+            self.windows_flushed += 1
+        logger.debug(f'Flushed purchase statistics window {start} ({len(rows)} rows)')
+        return True
+
+    def _refresh_top(self):
+        books = self._totals['book'].items()
+        for ordering, index in ORDERINGS.items():
+            self._top[ordering] = [
+                (key, list(counts)) for key, counts in heapq.nlargest(self.top_size, books, key=lambda item: item[1][index])
+            ]
+
+    def _run(self):
+        while not self._stop.wait(self.window):
+            try:
+                self.flush()
+                # Pick up the windows the other processes wrote
+                self.load()
+            except Exception as e:
+                logger.error(f'Failed to flush purchase statistics: {str(e)}')
+
+def _event_time(event):
+    # Epoch seconds of the event's ISO 8601 UTC timestamp, or None
+    try:
+        return calendar.timegm(time.strptime(str(event.get('timestamp'))[:19], '%Y-%m-%dT%H:%M:%S'))
+    except ValueError:
+        return None
+
+def _book_id(key):
+    return int(key) if key.isdigit() else key
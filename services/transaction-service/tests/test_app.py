@@ -1,7 +1,13 @@
 import unittest
 from unittest.mock import MagicMock, patch
-from app import app
+from app import app, transaction_cache
+import app as app_module
+import messaging
+from stats import PurchaseStats
+import queries
+from pagination import encode_cursor
 import json
+import time
 from datetime import datetime
 
 class TransactionsServiceTestCase(unittest.TestCase):
@@ -15,8 +21,9 @@ class TransactionsServiceTestCase(unittest.TestCase):
         self.patcher = patch('app.get_db_connection', return_value=self.mock_db)
         self.patcher.start()
 
-        # Reset the mock before each test
+        # Reset the mock and the read cache before each test
         self.mock_db.reset_mock()
+        transaction_cache.clear()
 
     def tearDown(self):
         # Stop the patcher
@@ -44,12 +51,26 @@ class TransactionsServiceTestCase(unittest.TestCase):
         self.assertEqual(data['message'], 'Transaction created')
 
         # Verify the database interaction
-        self.mock_db.insert.assert_called_once_with(
-            '\n            INSERT INTO transactions (user_id, book_id, transaction_type)\n            VALUES (%s, %s, %s)\n        ',
-            (123, 1, 'BORROW')
-        )
+        self.mock_db.insert.assert_called_once_with(queries.INSERT_TRANSACTION, (123, 1, 'BORROW'))
         self.mock_db.close.assert_called_once()
 
+    def test_create_transaction_writes_outbox_event_in_same_transaction(self):
+        self.mock_db.insert.return_value = 1
+
+        self.app.post('/transactions',
+            data=json.dumps({'userId': 123, 'bookId': 1, 'transactionType': 'PURCHASE'}),
+            content_type='application/json'
+        )
+
+        # Both inserts happen inside one db.transaction() block
+        self.mock_db.transaction.assert_called_once()
+        query, events = self.mock_db.insert_many.call_args.args
+        self.assertEqual(query, queries.INSERT_OUTBOX_EVENT)
+        destination, payload, content_type = events[0]
+        self.assertEqual(destination, '/topic/book-purchases')
+        self.assertEqual(content_type, 'application/json')
+        self.assertEqual(json.loads(payload)['userId'], '123')
+
     def test_create_transaction_missing_fields(self):
         # Test creating a transaction with missing fields
         response = self.app.post('/transactions',
@@ -86,9 +107,106 @@ class TransactionsServiceTestCase(unittest.TestCase):
         self.mock_db.insert.assert_not_called()
         self.mock_db.close.assert_not_called()
 
+    def test_create_transaction_group_commit_timeout(self):
+        # A stuck flusher answers 503 instead of holding the request thread
+        committer = MagicMock()
+        committer.submit.side_effect = TimeoutError('Timed out waiting for group commit')
+        with patch('app.group_committer', committer):
+            response = self.app.post('/transactions',
+                data=json.dumps({'userId': 123, 'bookId': 1, 'transactionType': 'BORROW'}),
+                content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 503)
+        self.assertIsNotNone(committer.submit.call_args.kwargs['timeout'])
+
+    def test_create_transactions_batch_success(self):
+        # Mock the multi-row insert to return consecutive IDs
+        self.mock_db.insert_many.return_value = [10, 11]
+
+        # Test creating two transactions in one request
+        response = self.app.post('/transactions/batch',
+            data=json.dumps([
+                {'userId': 123, 'bookId': 1, 'transactionType': 'BORROW'},
+                {'userId': 456, 'bookId': 2, 'transactionType': 'PURCHASE'}
+            ]),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 201)
+        data = json.loads(response.data)
+        self.assertEqual(data['created'], 2)
+        self.assertEqual([r['id'] for r in data['results']], [10, 11])
+
+        # Verify a single multi-row insert was issued, with one outbox event per row
+        transactions_call, outbox_call = self.mock_db.insert_many.call_args_list
+        self.assertEqual(transactions_call.args, (queries.INSERT_TRANSACTION, [(123, 1, 'BORROW'), (456, 2, 'PURCHASE')]))
+        self.assertEqual(outbox_call.args[0], queries.INSERT_OUTBOX_EVENT)
+        self.assertEqual(len(outbox_call.args[1]), 2)
+        self.mock_db.transaction.assert_called_once()
+        self.mock_db.close.assert_called_once()
+
+    def test_create_transactions_batch_partial_failure(self):
+        self.mock_db.insert_many.return_value = [10]
+
+        # Test a batch where the second item is invalid
+        response = self.app.post('/transactions/batch',
+            data=json.dumps([
+                {'userId': 123, 'bookId': 1, 'transactionType': 'BORROW'},
+                {'userId': 456, 'bookId': 2, 'transactionType': 'INVALID'}
+            ]),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 207)
+        data = json.loads(response.data)
+        self.assertEqual(data['created'], 1)
+        self.assertEqual(data['failed'], 1)
+        self.assertEqual(data['results'][0]['id'], 10)
+        self.assertEqual(data['results'][1]['error'], 'transactionType must be BORROW or PURCHASE')
+        self.assertEqual(
+            self.mock_db.insert_many.call_args_list[0].args,
+            (queries.INSERT_TRANSACTION, [(123, 1, 'BORROW')])
+        )
+
+    def test_create_transactions_batch_all_invalid(self):
+        # Test a batch where nothing can be inserted
+        response = self.app.post('/transactions/batch',
+            data=json.dumps([{'userId': 123}]),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+        # Verify no database interaction occurred
+        self.mock_db.insert_many.assert_not_called()
+        self.mock_db.close.assert_not_called()
+
+    def test_create_transactions_batch_rejects_non_integer_ids(self):
+        self.mock_db.insert_many.return_value = [10]
+
+        # Values MySQL would reject must fail their own row, not the whole insert
+        response = self.app.post('/transactions/batch',
+            data=json.dumps([
+                {'userId': 123, 'bookId': 1, 'transactionType': 'BORROW'},
+                {'userId': 'abc', 'bookId': 2, 'transactionType': 'BORROW'},
+                {'userId': 456, 'bookId': 1.5, 'transactionType': 'BORROW'},
+                {'userId': {}, 'bookId': 2, 'transactionType': 'BORROW'},
+                {'userId': True, 'bookId': 2, 'transactionType': 'BORROW'},
+                {'userId': 456, 'bookId': -2, 'transactionType': 'BORROW'}
+            ]),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 207)
+        data = json.loads(response.data)
+        self.assertEqual(data['created'], 1)
+        self.assertEqual([r['status'] for r in data['results']], [201, 400, 400, 400, 400, 400])
+        self.assertEqual(data['results'][1]['error'], 'userId must be a positive integer')
+        self.assertEqual(data['results'][2]['error'], 'bookId must be a positive integer')
+        self.assertEqual(
+            self.mock_db.insert_many.call_args_list[0].args,
+            (queries.INSERT_TRANSACTION, [(123, 1, 'BORROW')])
+        )
+
     def test_get_all_transactions_empty(self):
-        # Mock the select method to return an empty list
-        self.mock_db.select.return_value = []
+        # Mock the select_rows method to return an empty list
+        self.mock_db.select_rows.return_value = []
 
         # Test fetching all transactions when the database is empty
         response = self.app.get('/transactions')
@@ -97,21 +215,15 @@ class TransactionsServiceTestCase(unittest.TestCase):
         self.assertEqual(data, [])
 
         # Verify the database interaction
-        self.mock_db.select.assert_called_once_with('SELECT * FROM transactions')
+        self.mock_db.select_rows.assert_called_once_with(queries.LIST_TRANSACTIONS, (51,))
         self.mock_db.close.assert_called_once()
 
     def test_get_all_transactions_with_data(self):
-        # Mock the select method to return a list of transactions
+        # Mock the select_rows method to return a list of transactions
         mock_transactions = [
-            {
-                'id': 1,
-                'user_id': 123,
-                'book_id': 1,
-                'transaction_type': 'BORROW',
-                'transaction_date': datetime(2025, 4, 3, 12, 0, 0)
-            }
+            (1, 123, 1, 'BORROW', datetime(2025, 4, 3, 12, 0, 0))
         ]
-        self.mock_db.select.return_value = mock_transactions
+        self.mock_db.select_rows.return_value = mock_transactions
 
         # Test fetching all transactions
         response = self.app.get('/transactions')
@@ -124,19 +236,78 @@ class TransactionsServiceTestCase(unittest.TestCase):
         self.assertEqual(data[0]['transactionDate'], '2025-04-03T12:00:00')
 
         # Verify the database interaction
-        self.mock_db.select.assert_called_once_with('SELECT * FROM transactions')
+        self.mock_db.select_rows.assert_called_once_with(queries.LIST_TRANSACTIONS, (51,))
+        self.mock_db.close.assert_called_once()
+
+    def test_get_all_transactions_next_page(self):
+        # Mock one row more than the requested page size
+        self.mock_db.select_rows.return_value = [
+            (i, 123, 1, 'BORROW', datetime(2025, 4, 3, 12, 0, i))
+            for i in (1, 2, 3)
+        ]
+
+        # Test fetching the first page of two transactions
+        response = self.app.get('/transactions?limit=2')
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual([t['id'] for t in data], [1, 2])
+        self.assertEqual(response.headers['X-Next-Cursor'], encode_cursor(2))
+        self.assertIn('rel="next"', response.headers['Link'])
+        self.mock_db.select_rows.assert_called_once_with(queries.LIST_TRANSACTIONS, (3,))
+
+    def test_get_all_transactions_after_cursor(self):
+        self.mock_db.select_rows.return_value = []
+
+        # Test fetching the page that follows transaction 2
+        response = self.app.get(f'/transactions?limit=2&cursor={encode_cursor(2)}')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Next-Cursor', response.headers)
+        self.mock_db.select_rows.assert_called_once_with(queries.LIST_TRANSACTIONS_AFTER, (2, 3))
+
+    def test_get_all_transactions_limit_is_capped(self):
+        self.mock_db.select_rows.return_value = []
+
+        response = self.app.get('/transactions?limit=100000')
+        self.assertEqual(response.status_code, 200)
+        self.mock_db.select_rows.assert_called_once_with(queries.LIST_TRANSACTIONS, (501,))
+
+    def test_get_all_transactions_invalid_pagination(self):
+        response = self.app.get('/transactions?limit=0')
+        self.assertEqual(response.status_code, 400)
+
+        response = self.app.get('/transactions?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 400)
+        data = json.loads(response.data)
+        self.assertEqual(data['error'], 'Invalid cursor')
+
+        # Verify no database interaction occurred
+        self.mock_db.select_rows.assert_not_called()
+
+    def test_export_transactions_streams_ndjson(self):
+        # Mock the streaming cursor to return two chunks of row tuples
+        self.mock_db.stream.return_value = iter([
+            [(1, 123, 1, 'BORROW', datetime(2025, 4, 3, 12, 0, 0))],
+            [(2, 456, 2, 'PURCHASE', datetime(2025, 4, 3, 12, 1, 0))]
+        ])
+
+        # Test exporting all transactions
+        response = self.app.get('/transactions/export')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        lines = [json.loads(line) for line in response.data.decode().splitlines()]
+        self.assertEqual([t['id'] for t in lines], [1, 2])
+        self.assertEqual(lines[1]['userId'], 456)
+        self.assertEqual(lines[1]['transactionDate'], '2025-04-03T12:01:00')
+
+        # Verify the database interaction and that closing the response releases the connection
+        response.close()
+        self.mock_db.stream.assert_called_once_with(queries.EXPORT_TRANSACTIONS, chunk_size=1000)
         self.mock_db.close.assert_called_once()
 
     def test_get_transaction_by_id_success(self):
-        # Mock the select_one method to return a transaction
-        mock_transaction = {
-            'id': 1,
-            'user_id': 123,
-            'book_id': 1,
-            'transaction_type': 'BORROW',
-            'transaction_date': datetime(2025, 4, 3, 12, 0, 0)
-        }
-        self.mock_db.select_one.return_value = mock_transaction
+        # Mock the select_row method to return a transaction
+        mock_transaction = (1, 123, 1, 'BORROW', datetime(2025, 4, 3, 12, 0, 0), None)
+        self.mock_db.select_row.return_value = mock_transaction
 
         # Test fetching the transaction by ID
         response = self.app.get('/transactions/1')
@@ -149,12 +320,78 @@ class TransactionsServiceTestCase(unittest.TestCase):
         self.assertEqual(data['transactionDate'], '2025-04-03T12:00:00')
 
         # Verify the database interaction
-        self.mock_db.select_one.assert_called_once_with('SELECT * FROM transactions WHERE id = %s', (1,))
+        self.mock_db.select_row.assert_called_once_with(queries.GET_TRANSACTION, (1,))
         self.mock_db.close.assert_called_once()
 
-    def test_get_transaction_by_id_not_found(self):
-        # Mock the select_one method to return None
+    def test_get_transaction_by_id_served_from_cache(self):
+        updated_at = datetime(2025, 4, 3, 12, 0, 0)
+        self.mock_db.select_row.return_value = (1, 123, 1, 'BORROW', datetime(2025, 4, 3, 12, 0, 0), updated_at)
+        self.mock_db.select_one.return_value = {'updated_at': updated_at}
+
+        # Test that a repeated lookup only checks the row version
+        first = self.app.get('/transactions/1')
+        second = self.app.get('/transactions/1')
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.data, first.data)
+        self.mock_db.select_row.assert_called_once_with(queries.GET_TRANSACTION, (1,))
+        self.mock_db.select_one.assert_called_once_with(queries.GET_TRANSACTION_VERSION, (1,))
+
+    def test_get_transaction_by_id_cache_sees_other_workers_writes(self):
+        self.mock_db.select_row.return_value = (1, 123, 1, 'BORROW', datetime(2025, 4, 3, 12, 0, 0), datetime(2025, 4, 3, 12, 0, 0))
+        first = self.app.get('/transactions/1')
+        etag = first.headers['ETag']
+
+        # Another worker updated the row: neither the cached body nor a 304 may be served
+        self.mock_db.select_row.return_value = (1, 123, 1, 'PURCHASE', datetime(2025, 4, 3, 12, 0, 0), datetime(2025, 4, 3, 12, 5, 0))
+        self.mock_db.select_one.return_value = {'updated_at': datetime(2025, 4, 3, 12, 5, 0)}
+        second = self.app.get('/transactions/1', headers={'If-None-Match': etag})
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(json.loads(second.data)['transactionType'], 'PURCHASE')
+        self.assertNotEqual(second.headers['ETag'], etag)
+
+        # A row deleted elsewhere is a 404, not a cached body
         self.mock_db.select_one.return_value = None
+        self.mock_db.select_row.return_value = None
+        self.assertEqual(self.app.get('/transactions/1').status_code, 404)
+
+    def test_get_transactions_by_user_cache_sees_other_workers_writes(self):
+        self.mock_db.select_one.return_value = {'row_count': 1, 'max_id': 1, 'max_updated': datetime(2025, 4, 3, 12, 0, 0)}
+        self.mock_db.select_rows.return_value = [(1, 123, 1, 'BORROW', datetime(2025, 4, 3, 12, 0, 0))]
+
+        # Unchanged version: the page comes from the cache
+        self.app.get('/transactions/user/123')
+        self.app.get('/transactions/user/123')
+        self.assertEqual(self.mock_db.select_rows.call_count, 1)
+
+        # Another worker inserted a row: the page is read again
+        self.mock_db.select_one.return_value = {'row_count': 2, 'max_id': 2, 'max_updated': datetime(2025, 4, 3, 12, 1, 0)}
+        self.mock_db.select_rows.return_value = [
+            (1, 123, 1, 'BORROW', datetime(2025, 4, 3, 12, 0, 0)),
+            (2, 123, 2, 'PURCHASE', datetime(2025, 4, 3, 12, 1, 0))
+        ]
+        response = self.app.get('/transactions/user/123')
+        self.assertEqual(len(json.loads(response.data)), 2)
+        self.assertEqual(self.mock_db.select_rows.call_count, 2)
+
+    def test_update_transaction_invalidates_cache(self):
+        self.mock_db.select_rows.return_value = []
+        self.mock_db.select_one.return_value = {'user_id': 123, 'row_count': 0, 'max_id': None, 'max_updated': None}
+        self.mock_db.update.return_value = 1
+
+        # Cache the listing of user 123, then move one of their transactions to user 456
+        self.app.get('/transactions/user/123')
+        self.app.put('/transactions/1',
+            data=json.dumps({'userId': 456, 'bookId': 2, 'transactionType': 'PURCHASE'}),
+            content_type='application/json'
+        )
+        self.app.get('/transactions/user/123')
+
+        # Verify the previous owner's listing was read again after the write
+        self.assertEqual(self.mock_db.select_rows.call_count, 2)
+
+    def test_get_transaction_by_id_not_found(self):
+        # Mock the select_row method to return None
+        self.mock_db.select_row.return_value = None
 
         # Test fetching a non-existent transaction
         response = self.app.get('/transactions/999')
@@ -163,28 +400,16 @@ class TransactionsServiceTestCase(unittest.TestCase):
         self.assertEqual(data['error'], 'Transaction not found')
 
         # Verify the database interaction
-        self.mock_db.select_one.assert_called_once_with('SELECT * FROM transactions WHERE id = %s', (999,))
+        self.mock_db.select_row.assert_called_once_with(queries.GET_TRANSACTION, (999,))
         self.mock_db.close.assert_called_once()
 
     def test_get_transactions_by_user_success(self):
-        # Mock the select method to return a list of transactions
+        # Mock the select_rows method to return a list of transactions
         mock_transactions = [
-            {
-                'id': 1,
-                'user_id': 123,
-                'book_id': 1,
-                'transaction_type': 'BORROW',
-                'transaction_date': datetime(2025, 4, 3, 12, 0, 0)
-            },
-            {
-                'id': 2,
-                'user_id': 123,
-                'book_id': 2,
-                'transaction_type': 'PURCHASE',
-                'transaction_date': datetime(2025, 4, 3, 12, 1, 0)
-            }
+            (1, 123, 1, 'BORROW', datetime(2025, 4, 3, 12, 0, 0)),
+            (2, 123, 2, 'PURCHASE', datetime(2025, 4, 3, 12, 1, 0))
         ]
-        self.mock_db.select.return_value = mock_transactions
+        self.mock_db.select_rows.return_value = mock_transactions
 
         # Test fetching transactions for user 123
         response = self.app.get('/transactions/user/123')
@@ -195,12 +420,12 @@ class TransactionsServiceTestCase(unittest.TestCase):
         self.assertEqual(data[1]['userId'], 123)
 
         # Verify the database interaction
-        self.mock_db.select.assert_called_once_with('SELECT * FROM transactions WHERE user_id = %s', (123,))
+        self.mock_db.select_rows.assert_called_once_with(queries.LIST_USER_TRANSACTIONS, (123, 51))
         self.mock_db.close.assert_called_once()
 
     def test_get_transactions_by_user_no_transactions(self):
-        # Mock the select method to return an empty list
-        self.mock_db.select.return_value = []
+        # Mock the select_rows method to return an empty list
+        self.mock_db.select_rows.return_value = []
 
         # Test fetching transactions for a user with no transactions
         response = self.app.get('/transactions/user/999')
@@ -209,9 +434,77 @@ class TransactionsServiceTestCase(unittest.TestCase):
         self.assertEqual(data, [])
 
         # Verify the database interaction
-        self.mock_db.select.assert_called_once_with('SELECT * FROM transactions WHERE user_id = %s', (999,))
+        self.mock_db.select_rows.assert_called_once_with(queries.LIST_USER_TRANSACTIONS, (999, 51))
         self.mock_db.close.assert_called_once()
 
+    def test_get_transactions_by_user_after_cursor(self):
+        self.mock_db.select_rows.return_value = []
+        cursor = encode_cursor(2, datetime(2025, 4, 3, 12, 1, 0))
+
+        # Test fetching the page that follows the cursor row
+        response = self.app.get(f'/transactions/user/123?limit=10&cursor={cursor}')
+        self.assertEqual(response.status_code, 200)
+        date = datetime(2025, 4, 3, 12, 1, 0)
+        self.mock_db.select_rows.assert_called_once_with(
+            queries.LIST_USER_TRANSACTIONS_AFTER,
+            (123, date, date, 2, 11)
+        )
+
+    def test_get_transactions_by_user_not_modified(self):
+        # Mock the per-user version query
+        self.mock_db.select_one.return_value = {
+            'row_count': 2,
+            'max_id': 7,
+            'max_updated': datetime(2025, 4, 3, 12, 0, 0)
+        }
+
+        # Test a poll with the current ETag of user 123
+        response = self.app.get('/transactions/user/123',
+            headers={'If-None-Match': '"u123-2-7-20250403120000000000"'}
+        )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b'')
+        self.assertEqual(response.headers['ETag'], '"u123-2-7-20250403120000000000"')
+
+        # Verify only the version query ran
+        self.mock_db.select_one.assert_called_once_with(queries.USER_TRANSACTIONS_VERSION, (123,))
+        self.mock_db.select_rows.assert_not_called()
+
+    def test_get_transactions_by_user_etag_changes_after_write(self):
+        self.mock_db.select_one.return_value = {'row_count': 1, 'max_id': 8, 'max_updated': None}
+        self.mock_db.select_rows.return_value = []
+
+        # Test a poll with an outdated ETag
+        response = self.app.get('/transactions/user/123',
+            headers={'If-None-Match': '"u123-0-0-0"'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['ETag'], '"u123-1-8-0"')
+
+    def test_get_transactions_by_user_stale_etag_after_other_workers_write(self):
+        self.mock_db.select_one.return_value = {'row_count': 1, 'max_id': 1, 'max_updated': datetime(2025, 4, 3, 12, 0, 0)}
+        self.mock_db.select_rows.return_value = [(1, 123, 1, 'BORROW', datetime(2025, 4, 3, 12, 0, 0))]
+        etag = self.app.get('/transactions/user/123').headers['ETag']
+
+        # The page is cached here, but another worker deleted the row: the old ETag must not get a 304
+        self.mock_db.select_one.return_value = {'row_count': 0, 'max_id': None, 'max_updated': None}
+        self.mock_db.select_rows.return_value = []
+        response = self.app.get('/transactions/user/123', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data), [])
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_get_transaction_by_id_not_modified(self):
+        self.mock_db.select_row.return_value = (
+            1, 123, 1, 'BORROW', datetime(2025, 4, 3, 12, 0, 0), datetime(2025, 4, 3, 12, 5, 0, 123456)
+        )
+
+        # Fetch once for the ETag, then poll with it
+        first = self.app.get('/transactions/1')
+        self.assertEqual(first.headers['ETag'], '"t1-20250403120500123456"')
+        second = self.app.get('/transactions/1', headers={'If-None-Match': first.headers['ETag']})
+        self.assertEqual(second.status_code, 304)
+
     def test_update_transaction_success(self):
         # Mock the update method to return 1 (indicating 1 row affected)
         self.mock_db.update.return_value = 1
@@ -288,5 +581,36 @@ class TransactionsServiceTestCase(unittest.TestCase):
         self.mock_db.delete.assert_called_once_with('DELETE FROM transactions WHERE id = %s', (999,))
         self.mock_db.close.assert_called_once()
 
+    def test_ready_only_after_warm_up(self):
+        self.addCleanup(app_module._ready.clear)
+        with patch('app.get_pool') as get_pool, patch('messaging.start') as start:
+            get_pool.return_value.stats.return_value = {'size': 10, 'idle': 0}
+            before = self.app.get('/ready')
+            app_module.warm_up()
+            after = self.app.get('/ready')
+
+        self.assertEqual(before.status_code, 503)
+        get_pool.return_value.warm.assert_called_once_with(app_module.Config.MYSQL_POOL_WARM)
+        start.assert_called_once()
+        self.assertEqual(after.status_code, 200)
+        self.assertTrue(json.loads(after.data)['ready'])
+
+    def test_stats_routes_serve_from_memory(self):
+        stats = PurchaseStats(db_factory=lambda: self.mock_db)
+        with patch('messaging.purchase_stats', stats):
+            messaging.handle_book_purchase_event({
+                'event': 'book_purchase', 'userId': '5', 'bookId': 3, 'transactionType': 'PURCHASE'
+            })
+            stats.flush(now=time.time() + stats.window)
+
+            user = json.loads(self.app.get('/transactions/stats/user/5').data)
+            top = self.app.get('/transactions/stats/top-books?limit=5')
+            invalid = self.app.get('/transactions/stats/top-books?by=returns')
+
+        self.assertEqual(user['purchases'], 1)
+        self.assertEqual(json.loads(top.data)[0]['bookId'], 3)
+        self.assertEqual(invalid.status_code, 400)
+        self.mock_db.select.assert_not_called()
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,62 @@
+import unittest
+from unittest.mock import patch
+from breaker import CircuitBreaker, CircuitOpenError, CLOSED, OPEN, HALF_OPEN
+
+class CircuitBreakerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.now = 100.0
+        patcher = patch('breaker.time.monotonic', side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker('test', threshold=2, base_backoff=1, max_backoff=8)
+
+    def trip(self):
+        for _ in range(self.breaker.threshold):
+            self.breaker.record_failure()
+
+    def test_opens_after_threshold_failures(self):
+        self.breaker.record_failure()
+        self.breaker.allow()
+        self.breaker.record_failure()
+
+        self.assertEqual(self.breaker.state, OPEN)
+        with self.assertRaises(CircuitOpenError) as raised:
+            self.breaker.allow()
+        self.assertGreater(raised.exception.retry_after, 0)
+
+    def test_success_resets_failure_count(self):
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_half_open_lets_a_single_probe_through(self):
+        self.trip()
+        self.now += 1
+
+        self.breaker.allow()
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.allow()
+
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.breaker.allow()
+
+    def test_failed_probe_doubles_jittered_backoff(self):
+        delays = []
+        self.trip()
+        for _ in range(5):
+            delays.append(self.breaker._probe_at - self.now)
+            self.now = self.breaker._probe_at
+            self.breaker.allow()
+            self.breaker.record_failure()
+
+        # Each delay lies between half and all of min(base * 2^n, max)
+        for opens, delay in enumerate(delays):
+            backoff = min(2 ** opens, 8)
+            self.assertGreaterEqual(delay, backoff / 2)
+            self.assertLessEqual(delay, backoff)
+
+if __name__ == '__main__':
+    unittest.main()
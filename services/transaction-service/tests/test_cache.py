@@ -0,0 +1,61 @@
+import unittest
+from unittest.mock import patch
+from cache import LRUCache, TransactionCache
+
+class LRUCacheTestCase(unittest.TestCase):
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = LRUCache(max_entries=2, max_bytes=1024, ttl=60)
+        cache.set('a', b'1')
+        cache.set('b', b'2')
+        cache.get('a')
+        cache.set('c', b'3')
+
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), b'1')
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_memory_bound_is_enforced(self):
+        cache = LRUCache(max_entries=100, max_bytes=10, ttl=60)
+        cache.set('a', b'12345')
+        cache.set('b', b'12345')
+        cache.set('c', b'12345')
+
+        self.assertIsNone(cache.get('a'))
+        self.assertLessEqual(cache.stats()['bytes'], 10)
+
+    def test_entries_expire(self):
+        cache = LRUCache(max_entries=10, max_bytes=1024, ttl=30)
+        with patch('cache.time.monotonic', return_value=100.0):
+            cache.set('a', b'1')
+        with patch('cache.time.monotonic', return_value=131.0):
+            self.assertIsNone(cache.get('a'))
+
+        stats = cache.stats()
+        self.assertEqual(stats['expirations'], 1)
+        self.assertEqual(stats['misses'], 1)
+
+class TransactionCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.cache = TransactionCache(LRUCache(max_entries=100, max_bytes=1024, ttl=60))
+
+    def test_invalidating_a_user_drops_only_their_pages(self):
+        first = self.cache.user_page_key(1, None, 50)
+        other = self.cache.user_page_key(2, None, 50)
+        self.cache.set(first, b'[]')
+        self.cache.set(other, b'[]')
+
+        self.cache.invalidate_user(1)
+
+        self.assertIsNone(self.cache.get(self.cache.user_page_key(1, None, 50)))
+        self.assertEqual(self.cache.get(self.cache.user_page_key(2, None, 50)), (b'[]', None, None))
+
+    def test_result_read_before_invalidation_is_never_served(self):
+        # A reader builds its key, a writer invalidates, then the reader stores a stale body
+        key = self.cache.transaction_key(7)
+        self.cache.invalidate_transaction(7)
+        self.cache.set(key, b'{"stale": true}')
+
+        self.assertIsNone(self.cache.get(self.cache.transaction_key(7)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+from consumer import KeyedWorkerPool
+
+def frame(key, seq):
+    message = MagicMock()
+    message.body = f'{key}:{seq}'
+    message.headers = {'message-id': f'id-{key}-{seq}', 'subscription': 'sub-1'}
+    return message
+
+class KeyedWorkerPoolTestCase(unittest.TestCase):
+    def setUp(self):
+        self.handled = []
+        self.handled_lock = threading.Lock()
+        self.acked = []
+        self.all_acked = threading.Event()
+        self.expected = 0
+
+    def handler(self, body):
+        time.sleep(0.001)
+        with self.handled_lock:
+            self.handled.append(body)
+
+    def ack(self, frames):
+        self.acked.append(list(frames))
+        if sum(len(batch) for batch in self.acked) >= self.expected:
+            self.all_acked.set()
+
+    def run_pool(self, frames, **options):
+        self.expected = len(frames)
+        options.setdefault('decode', lambda message: message.body)
+        pool = KeyedWorkerPool(self.handler, lambda body: body.split(':')[0], self.ack, **options)
+        pool.start()
+        for f in frames:
+            pool.submit(f)
+        self.assertTrue(self.all_acked.wait(5))
+        return pool
+
+    def test_order_is_kept_per_key(self):
+        frames = [frame(key, seq) for seq in range(20) for key in 'abcd']
+
+        self.run_pool(frames, workers=3, ack_batch=10, ack_interval_ms=5)
+
+        for key in 'abcd':
+            seqs = [int(body.split(':')[1]) for body in self.handled if body.startswith(key)]
+            self.assertEqual(seqs, list(range(20)))
+
+    def test_acks_are_batched(self):
+        frames = [frame('a', seq) for seq in range(30)]
+
+        pool = self.run_pool(frames, workers=2, ack_batch=10, ack_interval_ms=50)
+
+        self.assertLess(len(self.acked), 30)
+        self.assertTrue(all(len(batch) <= 10 for batch in self.acked))
+        stats = pool.stats()
+        self.assertEqual(stats['acked'], 30)
+        self.assertEqual(stats['in_flight'], 0)
+
+    def test_failed_handler_still_acks(self):
+        self.handler = MagicMock(side_effect=ValueError('bad message'))
+
+        pool = self.run_pool([frame('a', 0)], workers=1, ack_batch=1, ack_interval_ms=0)
+
+        self.assertEqual(pool.stats()['failed'], 1)
+
+    def test_undecodable_message_is_acked_without_handling(self):
+        self.handler = MagicMock()
+
+        pool = self.run_pool([frame('a', 0)], workers=1, ack_batch=1, ack_interval_ms=0,
+                             decode=MagicMock(side_effect=ValueError('not protobuf')))
+
+        self.handler.assert_not_called()
+        self.assertEqual(pool.stats()['failed'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
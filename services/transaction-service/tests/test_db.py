@@ -0,0 +1,105 @@
+import unittest
+from unittest.mock import MagicMock
+from db import ConnectionPool, Database, PoolTimeoutError
+
+class ConnectionPoolTestCase(unittest.TestCase):
+    def setUp(self):
+        # Every call to connect returns a fresh mock connection
+        self.connect = MagicMock(side_effect=self.new_connection)
+        self.pool = ConnectionPool(size=2, timeout=0.05, recycle=60, connect=self.connect)
+
+    @staticmethod
+    def new_connection():
+        conn = MagicMock()
+        conn.is_connected.return_value = True
+        conn.in_transaction = False
+        return conn
+
+    def test_connection_is_reused(self):
+        entry = self.pool.acquire()
+        self.pool.release(entry)
+        self.assertIs(self.pool.acquire().conn, entry.conn)
+        self.assertEqual(self.connect.call_count, 1)
+
+    def test_stale_connection_is_replaced(self):
+        entry = self.pool.acquire()
+        self.pool.release(entry)
+        entry.conn.is_connected.return_value = False
+
+        fresh = self.pool.acquire()
+        self.assertIsNot(fresh.conn, entry.conn)
+        entry.conn.close.assert_called_once()
+
+    def test_connection_is_recycled_by_age(self):
+        self.pool.recycle = 0
+        entry = self.pool.acquire()
+        self.pool.release(entry)
+
+        self.assertIsNot(self.pool.acquire().conn, entry.conn)
+        entry.conn.close.assert_called_once()
+
+    def test_pool_is_bounded(self):
+        self.pool.acquire()
+        self.pool.acquire()
+        with self.assertRaises(PoolTimeoutError):
+            self.pool.acquire()
+
+    def test_open_transaction_is_rolled_back_on_release(self):
+        entry = self.pool.acquire()
+        entry.conn.in_transaction = True
+        self.pool.release(entry)
+        entry.conn.rollback.assert_called_once()
+
+    def test_abandoned_stream_discards_connection(self):
+        db = Database(self.pool)
+        conn = db.conn
+        conn.cursor.return_value.fetchmany.side_effect = [[(1,)], [(2,)], []]
+
+        # Stop reading after the first chunk, as a disconnected client would
+        chunks = db.stream('SELECT id FROM transactions', chunk_size=1)
+        self.assertEqual(next(chunks), [(1,)])
+        chunks.close()
+        db.close()
+
+        conn.close.assert_called_once()
+        self.assertEqual(self.pool.stats()['idle'], 0)
+
+    def test_database_context_manager_returns_connection_on_error(self):
+        with self.assertRaises(RuntimeError):
+            with Database(self.pool) as db:
+                conn = db.conn
+                raise RuntimeError('boom')
+
+        conn.rollback.assert_called()
+        self.assertEqual(self.pool.stats()['idle'], 1)
+
+        # Closing twice must not release the slot twice
+        db.close()
+        self.pool.acquire()
+        self.pool.acquire()
+        with self.assertRaises(PoolTimeoutError):
+            self.pool.acquire()
+
+    def test_transaction_commits_writes_once(self):
+        db = Database(self.pool)
+        with db.transaction():
+            db.insert('INSERT INTO transactions VALUES (%s)', (1,))
+            db.insert_many('INSERT INTO event_outbox VALUES (%s)', [(1,)])
+            db.conn.commit.assert_not_called()
+        db.conn.commit.assert_called_once()
+
+    def test_transaction_rolls_back_on_error(self):
+        db = Database(self.pool)
+        with self.assertRaises(RuntimeError):
+            with db.transaction():
+                db.insert('INSERT INTO transactions VALUES (%s)', (1,))
+                raise RuntimeError('boom')
+        db.conn.commit.assert_not_called()
+        db.conn.rollback.assert_called_once()
+
+        # Outside the block every write commits on its own again
+        db.insert('INSERT INTO transactions VALUES (%s)', (2,))
+        db.conn.commit.assert_called_once()
+
+if __name__ == '__main__':
+    unittest.main()
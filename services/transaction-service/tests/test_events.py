@@ -0,0 +1,40 @@
+import json
+import unittest
+from unittest.mock import MagicMock
+import events
+
+class EventsTestCase(unittest.TestCase):
+    def test_json_round_trip(self):
+        body, content_type = events.encode_book_purchase('7', 3, 'PURCHASE', event_format='json')
+
+        self.assertEqual(content_type, events.JSON_CONTENT_TYPE)
+        self.assertEqual(json.loads(body)['bookId'], 3)
+        self.assertEqual(events.decode_event(body, content_type)['userId'], '7')
+
+    def test_protobuf_round_trip_matches_json_shape(self):
+        body, content_type = events.encode_book_purchase('7', 3, 'BORROW', event_format='protobuf')
+        json_body, _ = events.encode_book_purchase('7', 3, 'BORROW', event_format='json')
+
+        self.assertEqual(content_type, events.PROTOBUF_CONTENT_TYPE)
+        self.assertIsInstance(body, bytes)
+        self.assertLess(len(body), len(json_body))
+        decoded = events.decode_event(body, content_type)
+        self.assertEqual(decoded.keys(), json.loads(json_body).keys())
+        self.assertEqual((decoded['userId'], decoded['bookId'], decoded['transactionType']), ('7', 3, 'BORROW'))
+
+    def test_frames_without_content_type_are_json(self):
+        frame = MagicMock()
+        frame.body = b'{"event": "book_purchase", "bookId": 1}'
+        frame.headers = {}
+
+        self.assertEqual(events.decode_frame(frame)['bookId'], 1)
+
+    def test_frames_carry_their_message_id(self):
+        frame = MagicMock()
+        frame.body = b'{"event": "book_purchase", "bookId": 1}'
+        frame.headers = {'message-id': 'ID:host-1:1:1:1:7'}
+
+        self.assertEqual(events.decode_frame(frame)['messageId'], 'ID:host-1:1:1:1:7')
+
+if __name__ == '__main__':
+    unittest.main()
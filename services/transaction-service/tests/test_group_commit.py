@@ -0,0 +1,99 @@
+import threading
+import unittest
+from unittest.mock import MagicMock
+from group_commit import GroupCommitter, _Waiter
+
+class GroupCommitterTestCase(unittest.TestCase):
+    def setUp(self):
+        # Hand out consecutive ids for every multi-row insert
+        self.next_id = 1
+        self.mock_db = MagicMock()
+        self.mock_db.insert_many.side_effect = self.insert_many
+
+    def insert_many(self, query, rows):
+        ids = list(range(self.next_id, self.next_id + len(rows)))
+        self.next_id += len(rows)
+        return ids
+
+    def submit_concurrently(self, committer, count):
+        results = [None] * count
+
+        def worker(index):
+            results[index] = committer.submit((index,), timeout=5)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_concurrent_inserts_are_coalesced(self):
+        committer = GroupCommitter('INSERT', window_ms=200, max_batch=4, db_factory=lambda: self.mock_db)
+
+        results = self.submit_concurrently(committer, 4)
+
+        # Every caller gets its own id from a single multi-row insert
+        self.assertEqual(sorted(results), [1, 2, 3, 4])
+        self.mock_db.insert_many.assert_called_once()
+        self.mock_db.close.assert_called_once()
+        metrics = committer.metrics()
+        self.assertEqual(metrics['batches'], 1)
+        self.assertEqual(metrics['max_batch_size'], 4)
+
+    def test_batches_are_capped_at_max_batch(self):
+        committer = GroupCommitter('INSERT', window_ms=50, max_batch=2, db_factory=lambda: self.mock_db)
+
+        results = self.submit_concurrently(committer, 5)
+
+        self.assertEqual(sorted(results), [1, 2, 3, 4, 5])
+        for call in self.mock_db.insert_many.call_args_list:
+            self.assertLessEqual(len(call.args[1]), 2)
+
+    def test_failure_is_reported_to_every_waiter(self):
+        self.mock_db.insert_many.side_effect = RuntimeError('deadlock')
+        committer = GroupCommitter('INSERT', window_ms=1, max_batch=10, db_factory=lambda: self.mock_db)
+
+        with self.assertRaises(RuntimeError):
+            committer.submit((1,), timeout=5)
+        self.mock_db.close.assert_called_once()
+
+    def test_failed_batch_is_retried_row_by_row(self):
+        # Any insert containing the bad row fails; the others succeed
+        def insert_many(query, rows):
+            if ('bad',) in rows:
+                raise RuntimeError('Incorrect integer value')
+            return self.insert_many(query, rows)
+        self.mock_db.insert_many.side_effect = insert_many
+        committer = GroupCommitter('INSERT', window_ms=1, max_batch=10, db_factory=lambda: self.mock_db)
+        batch = [_Waiter((1,)), _Waiter(('bad',)), _Waiter((2,))]
+
+        committer._flush(batch)
+
+        self.assertEqual([w.result for w in batch], [1, None, 2])
+        self.assertIsInstance(batch[1].error, RuntimeError)
+        self.assertIsNone(batch[0].error)
+        self.assertTrue(all(w.event.is_set() for w in batch))
+        self.assertEqual(committer.metrics()['split_batches'], 1)
+
+    def test_submit_times_out_when_the_flush_is_stuck(self):
+        release = threading.Event()
+        self.mock_db.insert_many.side_effect = lambda query, rows: release.wait() and [1]
+        committer = GroupCommitter('INSERT', window_ms=1, max_batch=10, db_factory=lambda: self.mock_db)
+
+        with self.assertRaises(TimeoutError):
+            committer.submit((1,), timeout=0.05)
+        release.set()
+
+    def test_on_flush_runs_in_the_insert_transaction(self):
+        on_flush = MagicMock()
+        committer = GroupCommitter('INSERT', window_ms=1, max_batch=10,
+                                   db_factory=lambda: self.mock_db, on_flush=on_flush)
+
+        self.assertEqual(committer.submit((1,), timeout=5), 1)
+
+        on_flush.assert_called_once_with(self.mock_db, [(1,)], [1])
+        self.mock_db.transaction.assert_called_once()
+
+if __name__ == '__main__':
+    unittest.main()
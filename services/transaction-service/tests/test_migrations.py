@@ -0,0 +1,61 @@
+import unittest
+from unittest.mock import MagicMock
+import migrations
+
+class MigrationsTestCase(unittest.TestCase):
+    def setUp(self):
+        # The mock database also acts as its own context manager
+        self.mock_db = MagicMock()
+        self.mock_db.__enter__.return_value = self.mock_db
+        self.lock_acquired = 1
+        self.mock_db.select_one.side_effect = self.select_one
+        self.db_factory = MagicMock(return_value=self.mock_db)
+
+    def select_one(self, query, params):
+        # Grant the migration lock; report every index as missing
+        if 'GET_LOCK' in query:
+            return {'acquired': self.lock_acquired}
+        return None
+
+    def recorded_versions(self):
+        return [
+            call.args[1][0] for call in self.mock_db.insert.call_args_list
+            if 'schema_migrations' in call.args[0]
+        ]
+
+    def test_migrate_applies_pending_versions_in_order(self):
+        self.mock_db.select.return_value = [{'version': 1}]
+
+        applied = migrations.migrate(self.db_factory)
+
+        self.assertEqual(applied, len(migrations.MIGRATIONS) - 1)
+        self.assertEqual(self.recorded_versions(), [m[0] for m in migrations.MIGRATIONS[1:]])
+        executed = ' '.join(call.args[0] for call in self.mock_db.execute.call_args_list)
+        self.assertIn('idx_transactions_user_date', executed)
+        self.assertIn('idx_transactions_book_date', executed)
+
+    def test_migrate_is_noop_when_up_to_date(self):
+        self.mock_db.select.return_value = [{'version': m[0]} for m in migrations.MIGRATIONS]
+
+        self.assertEqual(migrations.migrate(self.db_factory), 0)
+        self.assertEqual(self.recorded_versions(), [])
+
+    def test_migrate_fails_without_lock(self):
+        self.lock_acquired = 0
+
+        with self.assertRaises(RuntimeError):
+            migrations.migrate(self.db_factory)
+        self.mock_db.execute.assert_not_called()
+
+    def test_check_query_plans_reports_full_scans(self):
+        self.mock_db.select.side_effect = lambda query, params: [
+            {'table': 'transactions', 'type': 'ALL' if 'WHERE user_id' in query else 'ref'}
+        ]
+
+        problems = migrations.check_query_plans(self.db_factory)
+
+        self.assertEqual(len(problems), 3)
+        self.assertTrue(all('user transactions' in p for p in problems))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,270 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from queue import Queue
+from unittest.mock import MagicMock, patch
+import messaging
+from messaging import ActiveMQConnection
+from spool import EventSpool
+from breaker import CircuitOpenError
+
+class ActiveMQConnectionTestCase(unittest.TestCase):
+    def setUp(self):
+        self.stomp_conn = MagicMock()
+        self.stomp_conn.is_connected.return_value = True
+        self.patcher = patch('messaging.stomp.Connection', return_value=self.stomp_conn)
+        self.connection_factory = self.patcher.start()
+        self.mq = ActiveMQConnection('broker', 61613, 'user', 'secret', 5)
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def test_connection_is_kept_open_across_sends(self):
+        for i in range(3):
+            self.mq.send_message('/topic/test', f'message {i}')
+
+        self.connection_factory.assert_called_once()
+        self.stomp_conn.connect.assert_called_once()
+        self.assertEqual(self.stomp_conn.send.call_count, 3)
+        self.stomp_conn.disconnect.assert_not_called()
+
+    def test_failed_send_reconnects_lazily(self):
+        self.stomp_conn.send.side_effect = [OSError('broken pipe'), None]
+
+        with self.assertRaises(OSError):
+            self.mq.send_message('/topic/test', 'lost')
+        self.stomp_conn.disconnect.assert_called_once()
+
+        self.mq.send_message('/topic/test', 'delivered')
+        self.assertEqual(self.connection_factory.call_count, 2)
+
+    def test_batch_is_sent_in_one_transaction(self):
+        self.stomp_conn.begin.return_value = 'tx-1'
+        messages = [('/topic/test', f'message {i}', 'application/json') for i in range(3)]
+
+        self.mq.send_batch(messages)
+
+        self.stomp_conn.begin.assert_called_once()
+        self.assertEqual(self.stomp_conn.send.call_count, 3)
+        for call in self.stomp_conn.send.call_args_list:
+            self.assertEqual(call.kwargs['transaction'], 'tx-1')
+            self.assertEqual(call.kwargs['content_type'], 'application/json')
+        self.stomp_conn.commit.assert_called_once_with('tx-1')
+
+    def test_failed_batch_is_aborted(self):
+        self.stomp_conn.begin.return_value = 'tx-1'
+        self.stomp_conn.send.side_effect = [None, OSError('broken pipe')]
+
+        with self.assertRaises(OSError):
+            self.mq.send_batch([('/topic/test', 'a', 'application/json'), ('/topic/test', 'b', 'application/json')])
+
+        self.stomp_conn.abort.assert_called_once_with('tx-1')
+        self.stomp_conn.commit.assert_not_called()
+        self.stomp_conn.disconnect.assert_called_once()
+
+    def test_broker_outage_opens_circuit_and_probe_closes_it(self):
+        self.connection_factory.side_effect = ConnectionRefusedError('broker down')
+        for _ in range(self.mq.breaker.threshold):
+            with self.assertRaises(ConnectionRefusedError):
+                self.mq.send_message('/topic/test', 'lost')
+
+        # Open: fail fast without touching the network
+        with self.assertRaises(CircuitOpenError):
+            self.mq.send_message('/topic/test', 'rejected')
+        self.assertEqual(self.connection_factory.call_count, self.mq.breaker.threshold)
+
+        # Once the backoff has passed a probe goes through and closes the circuit
+        self.connection_factory.side_effect = None
+        self.mq.breaker._probe_at = 0
+        self.mq.send_message('/topic/test', 'delivered')
+        self.assertTrue(self.mq.breaker.is_closed())
+
+    def test_probe_that_only_connects_closes_the_circuit(self):
+        self.connection_factory.side_effect = ConnectionRefusedError('broker down')
+        for _ in range(self.mq.breaker.threshold):
+            with self.assertRaises(ConnectionRefusedError):
+                self.mq.connect()
+
+        # A warm-up connect is the probe; it must not leave the circuit half-open
+        self.connection_factory.side_effect = None
+        self.mq.breaker._probe_at = 0
+        self.mq.connect()
+        self.assertTrue(self.mq.breaker.is_closed())
+        self.mq.send_message('/topic/test', 'delivered')
+        self.stomp_conn.send.assert_called_once()
+
+    def test_acks_use_message_and_subscription_ids(self):
+        self.mq.connect()
+        message = MagicMock()
+        message.headers = {'message-id': 'ID:1', 'subscription': 'sub-1'}
+
+        self.mq.ack_frames([message])
+
+        self.stomp_conn.ack.assert_called_once_with('ID:1', 'sub-1')
+
+    def test_subscription_prefetch_is_configurable(self):
+        self.mq.subscribe('/topic/test', messaging.MessageListener(), prefetch=200)
+
+        headers = self.stomp_conn.subscribe.call_args.kwargs['headers']
+        self.assertEqual(headers['activemq.prefetchSize'], '200')
+
+    def test_client_id_is_unique_per_role_and_process(self):
+        consumer = ActiveMQConnection('broker', 61613, 'user', 'secret', 5, role='consumer')
+        self.assertNotEqual(self.mq.client_id(), consumer.client_id())
+        self.assertIn(str(os.getpid()), consumer.client_id())
+
+    def test_producer_failures_leave_consumer_connected(self):
+        consumer = ActiveMQConnection('broker', 61613, 'user', 'secret', 5, role='consumer')
+        consumer.connect()
+        producer_stomp = MagicMock()
+        producer_stomp.send.side_effect = OSError('broken pipe')
+        self.connection_factory.return_value = producer_stomp
+
+        for _ in range(self.mq.breaker.threshold):
+            with self.assertRaises(OSError):
+                self.mq.send_message('/topic/test', 'lost')
+
+        self.assertFalse(self.mq.breaker.is_closed())
+        self.assertTrue(consumer.breaker.is_closed())
+        self.stomp_conn.disconnect.assert_not_called()
+        self.assertEqual(consumer.connects, 1)
+
+class DrainBatchTestCase(unittest.TestCase):
+    def setUp(self):
+        self.empty_queue()
+        self.addCleanup(self.empty_queue)
+
+    @staticmethod
+    def empty_queue():
+        while not messaging.message_queue.empty():
+            messaging.message_queue.get_nowait()
+            messaging.message_queue.task_done()
+
+    def test_drains_up_to_batch_size(self):
+        for i in range(messaging.MQ_BATCH_SIZE + 5):
+            messaging.message_queue.put(('/topic/test', str(i)))
+
+        batch = messaging.drain_batch()
+        self.assertEqual(len(batch), messaging.MQ_BATCH_SIZE)
+        self.assertEqual(batch[0], ('/topic/test', '0'))
+        self.assertEqual(messaging.message_queue.qsize(), 5)
+
+    def test_returns_partial_batch_after_linger(self):
+        messaging.message_queue.put(('/topic/test', 'only'))
+        with patch('messaging.MQ_LINGER_MS', 1):
+            self.assertEqual(messaging.drain_batch(), [('/topic/test', 'only')])
+
+class EnqueueEventsTestCase(unittest.TestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        self.spool = EventSpool(root, fsync_every=1)
+        self.addCleanup(self.spool.close)
+        self.queue = Queue(maxsize=2)
+        for target, value in (('messaging.message_queue', self.queue), ('messaging.event_spool', self.spool)):
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(messaging.producer_conn.breaker.record_success)
+
+    def test_overflow_spills_to_spool(self):
+        messaging.enqueue_events([('/topic/test', str(i), 'application/json') for i in range(3)])
+        self.assertEqual(self.queue.qsize(), 2)
+        self.assertEqual(self.spool.read(10)[0], [('/topic/test', '2', 'application/json')])
+
+    def test_events_follow_spooled_ones_until_spool_drains(self):
+        messaging.enqueue_events([('/topic/test', str(i), 'application/json') for i in range(3)])
+        self.queue.get_nowait()
+        messaging.enqueue_events([('/topic/test', '3', 'application/json')])
+
+        # Room in memory again, but older events are still on disk
+        self.assertEqual(self.queue.qsize(), 1)
+        self.assertEqual(self.spool.pending(), 2)
+
+    def test_events_are_spooled_while_broker_is_down(self):
+        for _ in range(messaging.producer_conn.breaker.threshold):
+            messaging.producer_conn.breaker.record_failure()
+        messaging.enqueue_events([('/topic/test', 'kept', 'application/json')])
+        self.assertTrue(self.queue.empty())
+        self.assertEqual(self.spool.pending(), 1)
+
+class SenderShutdownTestCase(unittest.TestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        self.spool = EventSpool(root, fsync_every=1)
+        self.addCleanup(self.spool.close)
+        self.queue = Queue()
+        self.send_batch = MagicMock()
+        for target, value in (('messaging.message_queue', self.queue), ('messaging.event_spool', self.spool),
+                              ('messaging.producer_conn.send_batch', self.send_batch)):
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(messaging._stopping.clear)
+        for i in range(3):
+            self.queue.put(('/topic/test', str(i), 'application/json'))
+
+    def test_stopping_sender_publishes_queued_events_then_exits(self):
+        messaging._stopping.set()
+
+        messaging.message_sender()
+
+        self.assertEqual(len(self.send_batch.call_args.args[0]), 3)
+        self.assertEqual(self.spool.pending(), 0)
+
+    def test_stopping_sender_spools_events_the_broker_cannot_take(self):
+        self.send_batch.side_effect = CircuitOpenError('ActiveMQ producer', 30)
+        messaging._stopping.set()
+
+        messaging.message_sender()
+
+        self.assertEqual(self.spool.pending(), 3)
+        self.assertTrue(self.queue.empty())
+
+    def test_stop_leaves_the_spool_to_a_sender_stuck_in_publish(self):
+        sending, release = threading.Event(), threading.Event()
+
+        def send_batch(batch):
+            sending.set()
+            release.wait(5)
+            raise OSError('broker went away')
+        self.send_batch.side_effect = send_batch
+        self.spool.open()
+        sender = threading.Thread(target=messaging.message_sender, daemon=True)
+        subscription = threading.Thread(target=lambda: None)
+        subscription.start()
+        for target, value in (('messaging._sender', sender), ('messaging._subscription', subscription),
+                              ('messaging.outbox_relay', None), ('messaging.purchase_stats', None),
+                              ('messaging.consumer_conn', MagicMock()), ('messaging.producer_conn.disconnect', MagicMock())):
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(messaging._abandoned.clear)
+        sender.start()
+        self.assertTrue(sending.wait(5))
+        self.queue.put(('/topic/test', '3', 'application/json'))
+
+        messaging.stop(timeout=0.1)
+
+        # Only what the sender had not taken is spooled, and the spool stays open for its batch
+        self.assertEqual(self.spool.pending(), 1)
+        self.assertIsNotNone(self.spool.directory)
+        release.set()
+        sender.join(5)
+        self.assertFalse(sender.is_alive())
+        self.assertIsNone(self.spool.directory)
+        # Nothing was lost: the next owner of the spool finds all four events
+        self.spool.open()
+        self.assertEqual(self.spool.pending(), 4)
+
+    def test_events_queued_while_stopping_go_to_spool(self):
+        messaging._stopping.set()
+        messaging.enqueue_events([('/topic/test', 'late', 'application/json')])
+        self.assertEqual(self.queue.qsize(), 3)
+        self.assertEqual(self.spool.pending(), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+from unittest.mock import MagicMock
+from outbox import OutboxRelay
+import queries
+
+class OutboxRelayTestCase(unittest.TestCase):
+    def setUp(self):
+        self.mock_db = MagicMock()
+        self.publish = MagicMock()
+        self.relay = OutboxRelay(self.publish, batch_size=2, poll_ms=0, retention=60,
+                                 db_factory=lambda: self.mock_db)
+
+    def test_claimed_rows_are_published_and_marked_sent(self):
+        self.mock_db.select_rows.return_value = [
+            (7, '/topic/a', bytearray(b'one'), 'application/json'),
+            (8, '/topic/a', bytearray(b'\x08\x01'), 'application/x-protobuf')
+        ]
+
+        self.assertEqual(self.relay.relay_once(), 2)
+
+        self.mock_db.select_rows.assert_called_once_with(queries.CLAIM_OUTBOX_EVENTS, (2,))
+        self.publish.assert_called_once_with([
+            ('/topic/a', b'one', 'application/json'),
+            ('/topic/a', b'\x08\x01', 'application/x-protobuf')
+        ])
+        self.mock_db.update.assert_called_once_with(queries.mark_outbox_sent(2), [7, 8])
+        self.mock_db.transaction.assert_called_once()
+        self.mock_db.close.assert_called_once()
+        self.assertEqual(self.relay.metrics()['events'], 2)
+
+    def test_failed_publish_leaves_rows_unsent(self):
+        self.mock_db.select_rows.return_value = [(7, '/topic/a', b'one', 'application/json')]
+        self.publish.side_effect = OSError('broker down')
+
+        with self.assertRaises(OSError):
+            self.relay.relay_once()
+
+        # The exception escapes the transaction block, which rolls back and releases the claim
+        self.mock_db.update.assert_not_called()
+        self.mock_db.transaction.return_value.__exit__.assert_called_once()
+        self.mock_db.close.assert_called_once()
+
+    def test_nothing_to_relay(self):
+        self.mock_db.select_rows.return_value = []
+        self.assertEqual(self.relay.relay_once(), 0)
+        self.publish.assert_not_called()
+
+    def test_prune_deletes_old_sent_rows(self):
+        self.mock_db.delete.return_value = 3
+        self.assertEqual(self.relay.prune(), 3)
+        self.mock_db.delete.assert_called_once_with(queries.PRUNE_OUTBOX, (60, 2))
+        self.assertEqual(self.relay.metrics()['pruned'], 3)
+
+    def test_stop_ends_the_relay_thread(self):
+        self.mock_db.select_rows.return_value = []
+        self.relay.poll = 60
+        self.relay.start()
+
+        self.relay.stop(timeout=5)
+
+        self.assertFalse(self.relay._thread.is_alive())
+
+if __name__ == '__main__':
+    unittest.main()
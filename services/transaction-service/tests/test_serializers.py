@@ -0,0 +1,31 @@
+import json
+import unittest
+from datetime import datetime
+from serializers import serialize_transaction, serialize_transactions, serialize_ndjson
+
+ROW = (1, 123, 7, 'BORROW', datetime(2025, 4, 3, 12, 0, 0))
+
+class SerializersTestCase(unittest.TestCase):
+    def test_transaction_keys_and_values(self):
+        self.assertEqual(json.loads(serialize_transaction(ROW)), {
+            'id': 1,
+            'userId': 123,
+            'bookId': 7,
+            'transactionType': 'BORROW',
+            'transactionDate': '2025-04-03T12:00:00'
+        })
+
+    def test_extra_columns_are_ignored(self):
+        self.assertEqual(serialize_transaction(ROW + (datetime(2025, 4, 4),)), serialize_transaction(ROW))
+
+    def test_unexpected_type_is_escaped(self):
+        row = (2, 1, 1, 'RE"TURN', datetime(2025, 4, 3))
+        self.assertEqual(json.loads(serialize_transaction(row))['transactionType'], 'RE"TURN')
+
+    def test_list_and_ndjson(self):
+        self.assertEqual(json.loads(serialize_transactions([])), [])
+        self.assertEqual(len(json.loads(serialize_transactions([ROW, ROW]))), 2)
+        self.assertEqual(serialize_ndjson([ROW, ROW]).count(b'\n'), 2)
+
+if __name__ == '__main__':
+    unittest.main()
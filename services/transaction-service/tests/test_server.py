@@ -0,0 +1,32 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import db
+import server
+
+class OnStartingTestCase(unittest.TestCase):
+    def setUp(self):
+        self.pool = MagicMock()
+        patcher = patch.object(db, '_pool', self.pool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch.object(server.Config, 'MIGRATE_ON_STARTUP', True)
+    @patch('server.migrate')
+    def test_master_closes_its_pool_after_migrating(self, migrate):
+        server.on_starting(MagicMock())
+
+        migrate.assert_called_once()
+        self.pool.close.assert_called_once()
+        self.assertIsNone(db._pool)
+
+    @patch.object(server.Config, 'MIGRATE_ON_STARTUP', True)
+    @patch('server.migrate', side_effect=RuntimeError('Timed out waiting for the migration lock'))
+    def test_pool_is_closed_when_migration_fails(self, migrate):
+        with self.assertRaises(RuntimeError):
+            server.on_starting(MagicMock())
+
+        self.pool.close.assert_called_once()
+        self.assertIsNone(db._pool)
+
+if __name__ == '__main__':
+    unittest.main()
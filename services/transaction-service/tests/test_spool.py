@@ -0,0 +1,108 @@
+import os
+import shutil
+import tempfile
+import unittest
+from spool import EventSpool
+
+def events(start, stop):
+    return [('/topic/test', f'message {i}', 'application/json') for i in range(start, stop)]
+
+class EventSpoolTestCase(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.spool = self.new_spool()
+        self.addCleanup(self.spool.close)
+
+    def new_spool(self, **options):
+        options.setdefault('segment_bytes', 64)
+        options.setdefault('max_bytes', 1024 * 1024)
+        options.setdefault('fsync_every', 2)
+        options.setdefault('fsync_ms', 1000)
+        return EventSpool(self.root, **options)
+
+    def test_records_replay_in_order_across_segments(self):
+        for i in range(5):
+            self.spool.append(events(i, i + 1))
+        self.assertGreater(self.spool.stats()['segments'], 1)
+
+        replayed = []
+        while self.spool.pending():
+            records, position = self.spool.read(2)
+            replayed.extend(records)
+            self.spool.ack(position)
+
+        self.assertEqual(replayed, events(0, 5))
+        # Fully read segments are removed, only the one being written remains
+        self.assertEqual(self.spool.stats()['segments'], 1)
+
+    def test_unacked_records_are_read_again(self):
+        self.spool.append(events(0, 3))
+        first, _ = self.spool.read(2)
+        again, _ = self.spool.read(2)
+        self.assertEqual(first, again)
+        self.assertEqual(self.spool.pending(), 3)
+
+    def test_appends_are_fsynced_in_batches(self):
+        self.spool.append(events(0, 1))
+        self.assertEqual(self.spool.stats()['fsyncs'], 0)
+        self.spool.append(events(1, 2))
+        self.assertEqual(self.spool.stats()['fsyncs'], 1)
+
+    def test_reopened_spool_resumes_after_last_ack(self):
+        self.spool.append(events(0, 4))
+        records, position = self.spool.read(3)
+        self.spool.ack(position)
+        self.spool.close()
+
+        reopened = self.new_spool()
+        self.addCleanup(reopened.close)
+        reopened.open()
+        self.assertEqual(reopened.pending(), 1)
+        self.assertEqual(reopened.read(10)[0], events(3, 4))
+
+    def test_torn_record_is_dropped_on_open(self):
+        self.spool.append(events(0, 1))
+        directory = self.spool.directory
+        self.spool.close()
+        segment = os.path.join(directory, sorted(n for n in os.listdir(directory) if n.endswith('.log'))[-1])
+        with open(segment, 'ab') as f:
+            f.write(b'["/topic/test", "half')
+
+        reopened = self.new_spool()
+        self.addCleanup(reopened.close)
+        reopened.open()
+        self.assertEqual(reopened.read(10)[0], events(0, 1))
+
+    def test_binary_bodies_round_trip(self):
+        records = [('/topic/test', b'\x08\x96\x01\n', 'application/x-protobuf')]
+        self.spool.append(records)
+        self.assertEqual(self.spool.read(10)[0], records)
+
+    def test_records_without_content_type_read_as_json(self):
+        self.spool.open()
+        with open(os.path.join(self.spool.directory, '0000000001.log'), 'wb') as f:
+            f.write(b'["/topic/test", "message 0"]\n')
+        self.spool.close()
+
+        reopened = self.new_spool()
+        self.addCleanup(reopened.close)
+        reopened.open()
+        self.assertEqual(reopened.read(10)[0], events(0, 1))
+
+    def test_each_process_claims_its_own_slot(self):
+        self.spool.open()
+        other = self.new_spool()
+        self.addCleanup(other.close)
+        other.open()
+        self.assertNotEqual(self.spool.directory, other.directory)
+
+    def test_full_spool_drops_events(self):
+        spool = self.new_spool(max_bytes=80)
+        self.addCleanup(spool.close)
+        self.assertTrue(spool.append(events(0, 1)))
+        self.assertFalse(spool.append(events(1, 2)))
+        self.assertEqual(spool.stats()['dropped'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,228 @@
+import time
+import unittest
+from contextlib import contextmanager
+from unittest.mock import MagicMock
+from stats import PurchaseStats
+import queries
+
+DAY = 86400
+
+def event(user_id, book_id, transaction_type='PURCHASE', at=100, message_id=None):
+    event = {
+        'event': 'book_purchase',
+        'userId': str(user_id),
+        'bookId': book_id,
+        'transactionType': transaction_type,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(at))
+    }
+    if message_id:
+        event['messageId'] = message_id
+    return event
+
+# The rollup and window claims in memory, shared by several PurchaseStats
+class FakeStatsDb:
+    def __init__(self):
+        self.rollup = {}
+        self.windows = set()
+
+    def __call__(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    @contextmanager
+    def transaction(self):
+        yield self
+
+    def select_rows(self, query, params=None):
+        if query == queries.LOAD_PURCHASE_STATS:
+            return [(scope, key, purchases, borrows) for (scope, key), (purchases, borrows) in self.rollup.items()]
+        return [(start,) for start in self.windows if start >= params[0]]
+
+    def execute(self, query, params=None):
+        if query == queries.CLAIM_STATS_WINDOW:
+            if params[0] in self.windows:
+                return 0
+            self.windows.add(params[0])
+            return 1
+        return 0
+
+    def execute_many(self, query, rows):
+        for scope, key, purchases, borrows in rows:
+            counts = self.rollup.setdefault((scope, key), [0, 0])
+            counts[0] += purchases
+            counts[1] += borrows
+
+class PurchaseStatsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.mock_db = MagicMock()
+        self.mock_db.__enter__.return_value = self.mock_db
+        self.mock_db.execute.return_value = 1
+        self.stats = PurchaseStats(window=10, top_size=3, db_factory=lambda: self.mock_db)
+
+    def test_counts_per_user_book_and_day(self):
+        self.stats.record(event(1, 7), received_at=100)
+        self.stats.record(event(1, 8, 'BORROW'), received_at=101)
+        self.stats.record(event(2, 7, at=DAY + 100), received_at=DAY + 102)
+
+        self.assertEqual(self.stats.user(1), {'userId': 1, 'purchases': 1, 'borrows': 1})
+        self.assertEqual(self.stats.user(99), {'userId': 99, 'purchases': 0, 'borrows': 0})
+        self.assertEqual(self.stats.daily(1), [{'date': '1970-01-02', 'purchases': 1, 'borrows': 0}])
+
+    def test_top_books_are_ranked_at_flush(self):
+        for book_id, count in ((7, 3), (8, 1), (9, 2)):
+            for _ in range(count):
+                self.stats.record(event(1, book_id), received_at=100)
+        self.stats.flush(now=200)
+
+        top = self.stats.top_books(2)
+        self.assertEqual([book['bookId'] for book in top], [7, 9])
+        self.assertEqual(top[0]['purchases'], 3)
+
+    def test_closed_window_is_compacted_into_one_upsert(self):
+        for _ in range(5):
+            self.stats.record(event(1, 7), received_at=100)
+        self.stats.record(event(1, 7, at=115), received_at=115)
+
+        # A window is written one window after it closes
+        self.assertEqual(self.stats.flush(now=119), 0)
+        self.assertEqual(self.stats.flush(now=125), 1)
+
+        self.mock_db.execute.assert_any_call(queries.CLAIM_STATS_WINDOW, (100,))
+        query, rows = self.mock_db.execute_many.call_args.args
+        self.assertEqual(query, queries.UPSERT_PURCHASE_STATS)
+        self.assertIn(('book', '7', 5, 0), rows)
+        self.assertEqual(len(rows), 3)
+        # The open window stays in memory
+        self.assertEqual(self.stats.metrics()['open_windows'], 1)
+
+    def test_window_claimed_elsewhere_is_not_written(self):
+        self.mock_db.execute.return_value = 0
+        self.stats.record(event(1, 7), received_at=100)
+
+        self.assertEqual(self.stats.flush(now=200), 0)
+
+        self.mock_db.execute_many.assert_not_called()
+        self.assertEqual(self.stats.metrics()['windows_skipped'], 1)
+
+    def test_windows_follow_the_event_timestamp(self):
+        # Received in the next window, but it happened in the first one
+        self.stats.record(event(1, 7, at=105), received_at=112)
+        self.stats.flush(now=120)
+
+        self.mock_db.execute.assert_any_call(queries.CLAIM_STATS_WINDOW, (100,))
+
+    def test_events_later_than_the_grace_go_to_the_receiving_window(self):
+        self.stats.record(event(1, 7, at=105), received_at=125)
+
+        self.assertEqual(self.stats.metrics()['late_events'], 1)
+        self.stats.flush(now=140)
+        self.mock_db.execute.assert_any_call(queries.CLAIM_STATS_WINDOW, (120,))
+
+    def test_partly_seen_windows_are_claimed_last(self):
+        # Started consuming halfway through the window at 100
+        self.stats.consuming_since = 105
+        self.stats.record(event(1, 7, at=106), received_at=106)
+        self.stats.record(event(1, 7, at=112), received_at=112)
+
+        # A process that saw all of window 100 writes it at 120; this one leaves it a window longer
+        self.assertEqual(self.stats.flush(now=120), 0)
+        self.assertEqual(self.stats.flush(now=130), 2)
+
+    def test_redelivered_messages_are_counted_once(self):
+        self.stats.record(event(1, 7, message_id='ID:1'), received_at=100)
+        self.stats.record(event(1, 7, message_id='ID:1'), received_at=101)
+        self.stats.record(event(1, 7, message_id='ID:2'), received_at=101)
+
+        self.assertEqual(self.stats.user(1)['purchases'], 2)
+        self.assertEqual(self.stats.metrics()['duplicates'], 1)
+
+    def test_load_seeds_totals_from_rollup(self):
+        self.mock_db.select_rows.return_value = [('user', '1', 4, 2), ('book', '7', 4, 0)]
+
+        self.stats.load()
+        self.stats.record(event(1, 7), received_at=100)
+
+        self.assertEqual(self.stats.user(1)['purchases'], 5)
+        self.assertEqual(self.stats.top_books(1)[0], {'bookId': 7, 'purchases': 4, 'borrows': 0})
+
+    def test_stop_writes_windows_that_are_not_due(self):
+        now = int(time.time())
+        self.stats.record(event(1, 7, at=now), received_at=now)
+
+        self.stats.stop()
+
+        self.mock_db.execute.assert_any_call(queries.CLAIM_STATS_WINDOW, (now // 10 * 10,))
+        query, rows = self.mock_db.execute_many.call_args.args
+        self.assertIn(('book', '7', 1, 0), rows)
+        self.assertEqual(self.stats.metrics()['open_windows'], 0)
+
+    def test_failed_write_keeps_the_window(self):
+        calls = []
+
+        def db_factory():
+            calls.append(1)
+            if len(calls) == 1:
+                raise RuntimeError('Lost connection to MySQL server')
+            return self.mock_db
+
+        stats = PurchaseStats(window=10, top_size=3, db_factory=db_factory)
+        stats.record(event(1, 7), received_at=100)
+
+        with self.assertRaises(RuntimeError):
+            stats.flush(now=200)
+        self.assertEqual(stats.metrics()['open_windows'], 1)
+
+        self.assertEqual(stats.flush(now=210), 1)
+        query, rows = self.mock_db.execute_many.call_args.args
+        self.assertIn(('book', '7', 1, 0), rows)
+        self.assertEqual(stats.metrics()['open_windows'], 0)
+
+    def test_process_started_mid_window_catches_up_once_it_is_written(self):
+        db = FakeStatsDb()
+        first = PurchaseStats(window=10, top_size=3, db_factory=db)
+        first.consuming_since = 0
+        first.load()
+        first.record(event(1, 7, at=100, message_id='ID:1'), received_at=100)
+        first.record(event(1, 7, at=101, message_id='ID:2'), received_at=101)
+
+        # Starts halfway through window 100 and only sees what follows
+        second = PurchaseStats(window=10, top_size=3, db_factory=db)
+        second.consuming_since = 105
+        second.load()
+        for stats in (first, second):
+            stats.record(event(1, 7, at=106, message_id='ID:3'), received_at=106)
+        self.assertEqual((first.user(1)['purchases'], second.user(1)['purchases']), (3, 1))
+
+        # One flush cycle each: the first process writes window 100, the second reads it back
+        for stats in (first, second):
+            stats.flush(now=120)
+            stats.load()
+
+        self.assertEqual(first.user(1)['purchases'], 3)
+        self.assertEqual(second.user(1)['purchases'], 3)
+        self.assertEqual(second.top_books(1)[0]['purchases'], 3)
+        self.assertEqual((second.metrics()['open_windows'], second.metrics()['windows_skipped']), (0, 1))
+
+    def test_load_keeps_windows_not_yet_written(self):
+        db = FakeStatsDb()
+        db.rollup[('user', '1')] = [4, 0]
+        stats = PurchaseStats(window=10, top_size=3, db_factory=db)
+        stats.record(event(1, 7), received_at=100)
+
+        stats.load()
+
+        self.assertEqual(stats.user(1)['purchases'], 5)
+        self.assertEqual(stats.metrics()['open_windows'], 1)
+
+    def test_unknown_events_are_ignored(self):
+        self.stats.record({'event': 'book_purchase', 'userId': '1', 'bookId': 7, 'transactionType': 'RETURN'})
+        self.assertEqual(self.stats.metrics()['ignored'], 1)
+        self.assertEqual(self.stats.metrics()['events'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -20,7 +20,7 @@ axiosRetry(axios, {
 
 const app = express();
 app.use(express.json());
-app.use(cors());
+app.use(cors({ exposedHeaders: ['X-Next-Cursor'] }));
 
 const PROTO_PATH = './book.proto';
 const packageDefinition = protoLoader.loadSync(PROTO_PATH, {
@@ -56,6 +56,22 @@ const USER_SERVICE_URL = process.env.USER_SERVICE_URL || 'http://user-service-it
 const TRANSACTION_SERVICE_URL = process.env.TRANSACTION_SERVICE_URL || 'http://transaction-service-ita:6000';
 const JWT_SECRET_ENCODED = process.env.JWT_SECRET || 'GD01pc7/7BmRWmWtY71dIUjR1G+we3N5d9EKYWmzuFI6o6eRCsetl/9KruFclnFwmb7B9I62hhDfjUAl3IUDUw==';
 const JWT_SECRET = Buffer.from(JWT_SECRET_ENCODED, 'base64');
+const TRANSACTION_PAGE_SIZE = parseInt(process.env.TRANSACTION_PAGE_SIZE || '500', 10);
+
+// Transaction listings are keyset paginated; follow X-Next-Cursor to collect every page
+const fetchAllTransactions = async (url, headers) => {
+  const transactions = [];
+  let cursor;
+  do {
+    const response = await axios.get(url, {
+      headers,
+      params: { limit: TRANSACTION_PAGE_SIZE, ...(cursor && { cursor }) }
+    });
+    transactions.push(...response.data);
+    cursor = response.headers['x-next-cursor'];
+  } while (cursor);
+  return transactions;
+};
 
 const authenticateJWT = (req, res, next) => {
   const authHeader = req.headers.authorization;
@@ -198,12 +214,16 @@ app.post('/api/web/users/register', async (req, res) => {
 });
 
 app.get('/api/web/transactions', async (req, res) => {
-  const { page = 1, limit = 10 } = req.query;
-  logger.info('Fetching transactions', { page, limit });
+  const { limit = 10, cursor } = req.query;
+  logger.info('Fetching transactions', { limit, cursor });
   try {
     const response = await axios.get(`${TRANSACTION_SERVICE_URL}/transactions`, {
-      params: { page, limit }
+      params: { limit, ...(cursor && { cursor }) }
     });
+    // One page per call; the client passes the cursor back for the next one
+    if (response.headers['x-next-cursor']) {
+      res.set('X-Next-Cursor', response.headers['x-next-cursor']);
+    }
     res.json(response.data);
   } catch (error) {
     logger.error('Error fetching transactions', { error: error.message, status: error.response?.status, responseData: error.response?.data });
@@ -261,14 +281,14 @@ app.get('/api/web/dashboard/:userId', authenticateJWT, async (req, res) => {
     });
 
     logger.info('Fetching transactions data', { userId: requestedUserId });
-    const transactionsResponse = await axios.get(`${TRANSACTION_SERVICE_URL}/transactions/user/${requestedUserId}`, {
-      headers: { Authorization: req.headers.authorization }
+    const transactions = await fetchAllTransactions(`${TRANSACTION_SERVICE_URL}/transactions/user/${requestedUserId}`, {
+      Authorization: req.headers.authorization
     });
 
     const dashboardData = {
       user: user || null,
       books: booksResponse.books || [],
-      transactions: transactionsResponse.data || []
+      transactions
     };
 
     logger.info('Dashboard data fetched successfully', { userId: requestedUserId });